@@ -0,0 +1,181 @@
+"""
+Merge benchmark for PDF Telegram Bot.
+Compares the pikepdf (qpdf) and PyPDF2 merge backends on generated inputs.
+
+Each input is made of pages with JPEG-like (already compressed) image data and link
+annotations (small objects, like text-heavy documents have), plus a logo image and
+font program shared by all inputs, so deduplication has something to find.
+Every backend runs in its own process to measure its peak memory.
+
+Usage:
+    python benchmark_merge.py                       # 20 inputs of 50 MB
+    python benchmark_merge.py --files 5 --size-mb 10
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import resource
+import subprocess
+from pathlib import Path
+
+import pikepdf
+
+BACKENDS = ("pikepdf", "pypdf2")
+PAGE_IMAGE_KB = 512  # Size of each page's unique image
+
+
+def make_input(path: Path, size_mb: int, index: int, objects_per_page: int) -> None:
+    """
+    Write a PDF of roughly size_mb megabytes.
+    
+    Args:
+        path: Output path
+        size_mb: Approximate file size in MB
+        index: Input number (varies the page content)
+        objects_per_page: Link annotations per page
+    """
+    pdf = pikepdf.new()
+    
+    def image_stream(data: bytes) -> pikepdf.Stream:
+        # Random bytes labelled as JPEG: merging never decodes them
+        image = pikepdf.Stream(pdf, data)
+        image.Type, image.Subtype = pikepdf.Name.XObject, pikepdf.Name.Image
+        image.Width, image.Height = 1024, 768
+        image.ColorSpace, image.BitsPerComponent = pikepdf.Name.DeviceRGB, 8
+        image.Filter = pikepdf.Name.DCTDecode
+        return image
+    
+    # Identical in every input: a logo and an embedded font program
+    shared = random.Random(0)
+    logo = image_stream(shared.randbytes(256 * 1024))
+    font_program = pikepdf.Stream(pdf, shared.randbytes(128 * 1024))
+    font_program.Filter = pikepdf.Name.FlateDecode
+    font = pdf.make_indirect(pikepdf.Dictionary(
+        Type=pikepdf.Name.Font,
+        Subtype=pikepdf.Name.TrueType,
+        BaseFont=pikepdf.Name("/BenchFont"),
+        FontDescriptor=pikepdf.Dictionary(
+            Type=pikepdf.Name.FontDescriptor,
+            FontName=pikepdf.Name("/BenchFont"),
+            Flags=32,
+            FontFile2=font_program
+        )
+    ))
+    
+    for page_number in range(max(1, size_mb * 1024 // PAGE_IMAGE_KB)):
+        image = image_stream(os.urandom(PAGE_IMAGE_KB * 1024))
+        
+        content = f"BT /F1 12 Tf 72 760 Td (Input {index} page {page_number + 1}) Tj ET " \
+                  "q 468 0 0 468 72 200 cm /Im0 Do Q q 72 0 0 72 72 72 cm /Logo Do Q"
+        page = pikepdf.Dictionary(
+            Type=pikepdf.Name.Page,
+            MediaBox=[0, 0, 612, 792],
+            Resources=pikepdf.Dictionary(
+                XObject=pikepdf.Dictionary(Im0=image, Logo=logo),
+                Font=pikepdf.Dictionary(F1=font)
+            ),
+            Contents=pikepdf.Stream(pdf, content.encode()),
+            Annots=pikepdf.Array([
+                pdf.make_indirect(pikepdf.Dictionary(
+                    Type=pikepdf.Name.Annot,
+                    Subtype=pikepdf.Name.Link,
+                    Rect=[72, 700 - 10 * n, 300, 710 - 10 * n],
+                    Border=[0, 0, 0],
+                    A=pikepdf.Dictionary(S=pikepdf.Name.URI, URI=f"https://example.com/{index}/{page_number}/{n}")
+                ))
+                for n in range(objects_per_page)
+            ])
+        )
+        pdf.pages.append(pikepdf.Page(page))
+    
+    with pdf.open_outline() as outline:
+        outline.root.append(pikepdf.OutlineItem(f"Input {index}", 0))
+    
+    pdf.save(path)
+
+
+def run_backend(backend: str, inputs: list, output: Path) -> dict:
+    """
+    Merge inputs with one backend (in this process) and measure it.
+    
+    Args:
+        backend: "pikepdf" or "pypdf2"
+        inputs: Input paths
+        output: Output path
+    
+    Returns:
+        dict: Seconds, peak memory in MB and output size in MB
+    """
+    os.environ["MERGE_BACKEND"] = backend
+    sys.path.insert(0, str(Path(__file__).parent))
+    from utils.pdf_operations import PDFOperations
+    
+    started = time.perf_counter()
+    PDFOperations.merge_pdfs([Path(p) for p in inputs], output)
+    elapsed = time.perf_counter() - started
+    
+    return {
+        'seconds': elapsed,
+        'peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'output_mb': output.stat().st_size / (1024 * 1024)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF merge backends")
+    parser.add_argument("--files", type=int, default=20, help="Number of input PDFs (max 20)")
+    parser.add_argument("--size-mb", type=int, default=50, help="Approximate size of each input")
+    parser.add_argument("--objects-per-page", type=int, default=40, help="Small objects per page")
+    parser.add_argument("--workdir", type=Path, default=Path("/tmp/pdf_bot_merge_benchmark"))
+    parser.add_argument("--keep", action="store_true", help="Keep generated files")
+    parser.add_argument("--run", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("inputs", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    # Child process: run one backend and report as JSON
+    if args.run:
+        print(json.dumps(run_backend(args.run, args.inputs, args.workdir / f"merged_{args.run}.pdf")))
+        return
+    
+    args.workdir.mkdir(parents=True, exist_ok=True)
+    print(f"📄 Generating {args.files} inputs of ~{args.size_mb} MB in {args.workdir}...")
+    inputs = []
+    for index in range(args.files):
+        path = args.workdir / f"input_{index + 1:02d}.pdf"
+        make_input(path, args.size_mb, index + 1, args.objects_per_page)
+        inputs.append(str(path))
+    total_mb = sum(Path(p).stat().st_size for p in inputs) / (1024 * 1024)
+    print(f"   {total_mb:.0f} MB total\n")
+    
+    results = {}
+    for backend in BACKENDS:
+        print(f"⏱️  Merging with {backend}...")
+        completed = subprocess.run(
+            [sys.executable, __file__, "--run", backend, "--workdir", str(args.workdir), *inputs],
+            capture_output=True,
+            text=True
+        )
+        if completed.returncode != 0:
+            print(f"   ❌ Failed: {completed.stderr.strip().splitlines()[-1]}")
+            continue
+        results[backend] = json.loads(completed.stdout.strip().splitlines()[-1])
+    
+    print(f"\n{'Backend':<10} {'Time (s)':>10} {'Peak RSS (MB)':>15} {'Output (MB)':>13}")
+    for backend, result in results.items():
+        print(f"{backend:<10} {result['seconds']:>10.2f} {result['peak_mb']:>15.0f} {result['output_mb']:>13.1f}")
+    
+    if len(results) == 2:
+        speedup = results['pypdf2']['seconds'] / results['pikepdf']['seconds']
+        print(f"\n🚀 pikepdf is {speedup:.1f}x faster")
+    
+    if not args.keep:
+        shutil.rmtree(args.workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
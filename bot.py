@@ -43,8 +43,14 @@ from handlers import (
     protect_command,
     unlock_command
 )
-from handlers.start import daily_stats_command, weekly_stats_command
-from utils import cleanup_scheduler
+from handlers.start import daily_stats_command, weekly_stats_command, queue_stats_command
+from utils import (
+    cleanup_scheduler,
+    pdf_executor,
+    analytics,
+    bot_persistence,
+    UserSerialUpdateProcessor
+)
 
 # Import system check
 try:
@@ -98,7 +104,7 @@ async def post_init(application: Application) -> None:
         application: Telegram application object
     """
     # Set bot commands for better UX in Telegram
-    # Note: Admin commands (dailystats, weeklystats) are intentionally excluded
+    # Note: Admin commands (dailystats, weeklystats, queuestats) are intentionally excluded
     commands = [
         ("start", "Start the bot and see welcome message"),
         ("help", "Show detailed help and usage guide"),
@@ -119,6 +125,28 @@ async def post_init(application: Application) -> None:
     # Start cleanup scheduler
     asyncio.create_task(cleanup_scheduler())
     logger.info("Cleanup scheduler started")
+    
+    # Start batched analytics writer
+    asyncio.create_task(analytics.run_writer())
+    logger.info("Analytics writer started")
+    
+    # Spawn PDF workers now so the first user doesn't wait for them
+    await pdf_executor.warm_up()
+    logger.info(f"PDF worker pool ready ({pdf_executor.queue_depth()['pool_type']}, {pdf_executor.max_workers} workers)")
+
+
+async def post_shutdown(application: Application) -> None:
+    """
+    Shutdown function to flush analytics and stop the PDF worker pool.
+    
+    Args:
+        application: Telegram application object
+    """
+    analytics.flush()
+    logger.info("Analytics events flushed")
+    
+    pdf_executor.shutdown(wait=False)
+    logger.info("PDF worker pool stopped")
 
 
 def main() -> None:
@@ -141,10 +169,16 @@ def main() -> None:
     logger.info(f"Starting {config.BOT_NAME} v{config.BOT_VERSION}...")
     
     # Create the Application
+    api_base_url = config.TELEGRAM_API_BASE_URL.rstrip('/')
     application = (
         Application.builder()
         .token(config.BOT_TOKEN)
+        .base_url(f"{api_base_url}/bot")
+        .base_file_url(f"{api_base_url}/file/bot")
+        .concurrent_updates(UserSerialUpdateProcessor(max(1, config.CONCURRENT_UPDATES)))
+        .persistence(bot_persistence)  # None keeps sessions in memory only
         .post_init(post_init)
+        .post_shutdown(post_shutdown)
         .build()
     )
     
@@ -157,6 +191,7 @@ def main() -> None:
     # Admin commands (hidden from command list)
     application.add_handler(CommandHandler("dailystats", daily_stats_command))
     application.add_handler(CommandHandler("weeklystats", weekly_stats_command))
+    application.add_handler(CommandHandler("queuestats", queue_stats_command))
     
     # PDF operation handlers
     application.add_handler(CommandHandler("merge", merge_command))
@@ -196,11 +231,17 @@ def main() -> None:
     logger.info(f"Bot name: {config.BOT_NAME}")
     logger.info(f"Version: {config.BOT_VERSION}")
     
+    logger.info(f"Mode: {config.BOT_MODE}")
+    
     # Run the bot until Ctrl+C
-    application.run_polling(
-        allowed_updates=Update.ALL_TYPES,
-        drop_pending_updates=True  # Ignore old updates on restart
-    )
+    if config.BOT_MODE == "webhook":
+        from utils.webhook_server import WebhookServer
+        WebhookServer(application).run()
+    else:
+        application.run_polling(
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=bot_persistence is None  # Keep them when sessions survive restarts
+        )
     
     logger.info("Bot stopped.")
 
@@ -11,6 +11,27 @@ from typing import Final
 # Bot Configuration
 BOT_TOKEN: Final[str] = os.getenv("BOT_TOKEN", "")
 
+# Update Delivery
+# "polling" asks Telegram for updates; "webhook" runs an HTTP server Telegram pushes updates to
+BOT_MODE: Final[str] = os.getenv("BOT_MODE", "polling").lower()
+# Updates handled at once across users; each user's updates are still handled one at a time
+CONCURRENT_UPDATES: Final[int] = int(os.getenv("CONCURRENT_UPDATES", "64"))
+
+# Webhook Server (BOT_MODE=webhook)
+WEBHOOK_URL: Final[str] = os.getenv("WEBHOOK_URL", "")  # Public base URL, e.g. https://pdfbot.example.com
+WEBHOOK_PATH: Final[str] = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_LISTEN: Final[str] = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT: Final[int] = int(os.getenv("PORT", os.getenv("WEBHOOK_PORT", "8080")))
+WEBHOOK_SECRET_TOKEN: Final[str] = os.getenv("WEBHOOK_SECRET_TOKEN", "")
+WEBHOOK_MAX_CONNECTIONS: Final[int] = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+# With several replicas behind one URL, let only one of them register the webhook
+WEBHOOK_REGISTER: Final[bool] = os.getenv("WEBHOOK_REGISTER", "true").lower() == "true"
+# Let several processes on one host bind the same port (Linux SO_REUSEPORT)
+WEBHOOK_REUSE_PORT: Final[bool] = os.getenv("WEBHOOK_REUSE_PORT", "false").lower() == "true"
+
+# Bot API server (override to use a self-hosted or local stand-in Bot API server)
+TELEGRAM_API_BASE_URL: Final[str] = os.getenv("TELEGRAM_API_BASE_URL", "https://api.telegram.org")
+
 # Admin User IDs (comma-separated in environment variable)
 ADMIN_USER_IDS: Final[set] = set(
     int(uid.strip()) 
@@ -27,10 +48,16 @@ ADMIN_USER_IDS: Final[set] = set(
 # - Or set to empty string to disable analytics
 DATABASE_URL: Final[str] = os.getenv("DATABASE_URL", "")
 
+# Analytics Writer (events are buffered in memory and written in batches)
+ANALYTICS_QUEUE_SIZE: Final[int] = 10000    # Max buffered events before the oldest are dropped
+ANALYTICS_BATCH_SIZE: Final[int] = 100      # Flush as soon as this many events are buffered
+ANALYTICS_FLUSH_INTERVAL: Final[int] = 5    # ...or after this many seconds
+
 # File Size Limits (in bytes)
 MAX_FILE_SIZE: Final[int] = 50 * 1024 * 1024  # 50MB (Telegram limit)
 MAX_MERGE_FILES: Final[int] = 20  # Maximum files to merge at once
 MAX_IMAGE_FILES: Final[int] = 50  # Maximum images to convert at once
+MAX_IMAGE_PIXELS: Final[int] = int(os.getenv("MAX_IMAGE_PIXELS", "90000000"))  # Bigger images are rejected before decoding (~270 MB as RGB)
 
 # Compression Quality Settings
 COMPRESSION_LEVELS: Final[dict] = {
@@ -39,14 +66,113 @@ COMPRESSION_LEVELS: Final[dict] = {
     "high": "/printer"     # Minimal compression (300 dpi)
 }
 
+# Run all quality levels of a target-size compression as concurrent Ghostscript processes
+PARALLEL_COMPRESSION: Final[bool] = os.getenv("PARALLEL_COMPRESSION", "true").lower() == "true"
+
+# Target-size planner: trial-compress a few sample pages, then run one full Ghostscript pass
+COMPRESSION_PLANNER: Final[bool] = os.getenv("COMPRESSION_PLANNER", "true").lower() == "true"
+COMPRESSION_SAMPLE_PAGES: Final[int] = 3
+COMPRESSION_PLAN_POINTS: Final[tuple] = (  # (image DPI, JPEG quality), best quality first
+    (300, 90),
+    (200, 80),
+    (150, 70),
+    (100, 55),
+    (72, 40),
+)
+
+# Merging
+# "pikepdf" copies page trees with qpdf (C++); "pypdf2" is the original pure-Python merger
+MERGE_BACKEND: Final[str] = os.getenv("MERGE_BACKEND", "pikepdf").lower()
+MERGE_DEDUPLICATE: Final[bool] = True  # Store images/fonts that appear in several inputs only once
+
+# Multi-part Split (/split 1-10;11-20;21-end or /split every 5)
+MAX_SPLIT_PARTS: Final[int] = 100     # Parts one /split may produce
+SPLIT_WRITE_THREADS: Final[int] = 4   # Parts written to disk concurrently
+MEDIA_GROUP_LIMIT: Final[int] = 10    # Telegram's maximum files per album; more parts are sent as a ZIP
+
+# Images to PDF
+# JPEGs are embedded unchanged; only images that have to be decoded are re-encoded
+IMAGE_JPEG_QUALITY: Final[int] = 85  # Photos from PNG/WebP/etc. (few-color images are stored losslessly)
+IMAGE_PREPARE_THREADS: Final[int] = 4  # Images decoded/encoded concurrently while the PDF is written in order
+# Memory images being decoded may take at once, per process (JPEGs embedded unchanged need none)
+IMAGE_DECODE_MEMORY: Final[int] = int(os.getenv("IMAGE_DECODE_MEMORY_MB", "512")) * 1024 * 1024
+# "a4" or "letter" center each image on a paper-sized page; "fit" makes the page the image (at most A4-sized)
+IMAGE_PAGE_SIZE: Final[str] = os.getenv("IMAGE_PAGE_SIZE", "fit").lower()
+IMAGE_MAX_DPI: Final[int] = int(os.getenv("IMAGE_MAX_DPI", "150"))  # Sharper images are downscaled on the way in (0 = never)
+
+# PDF to Images Rendering
+RENDER_DPI: Final[int] = 150          # Good quality while keeping rendering fast
+RENDER_CHUNK_PAGES: Final[int] = 10   # Pages rendered per poppler call (bounds peak memory/disk churn)
+
 # Temporary Storage
 TEMP_DIR: Final[Path] = Path("/tmp/pdf_bot_temp")
 TEMP_DIR.mkdir(parents=True, exist_ok=True)
 
+# Result Cache (outputs of repeated operations on identical files are reused)
+# Lives outside TEMP_DIR so the hourly temp cleanup doesn't wipe it
+ENABLE_RESULT_CACHE: Final[bool] = os.getenv("ENABLE_RESULT_CACHE", "true").lower() == "true"
+CACHE_DIR: Final[Path] = Path(os.getenv("CACHE_DIR", "/tmp/pdf_bot_cache"))
+CACHE_MAX_SIZE: Final[int] = int(os.getenv("CACHE_MAX_SIZE_MB", "500")) * 1024 * 1024  # LRU eviction above this
+PDF_INFO_MEMO_SIZE: Final[int] = 500  # get_pdf_info results kept in memory (keyed by path, size and mtime)
+
+# Album Ingestion (files sent together as one media group are handled as a batch)
+ALBUM_COLLECT_DELAY: Final[float] = 1.0     # Seconds to wait for the rest of an album
+MAX_CONCURRENT_DOWNLOADS: Final[int] = 4    # Parallel downloads per user
+DOWNLOAD_PROGRESS_INTERVAL: Final[int] = 2  # Min seconds between progress message edits
+
+# Telegram File Reuse
+# Recently received files are kept by file_unique_id so resent files skip the download,
+# and file_ids of sent results are remembered so identical results skip the upload
+DOWNLOAD_CACHE_DIR: Final[Path] = Path(os.getenv("DOWNLOAD_CACHE_DIR", "/tmp/pdf_bot_downloads"))
+DOWNLOAD_CACHE_MAX_SIZE: Final[int] = int(os.getenv("DOWNLOAD_CACHE_MAX_SIZE_MB", "200")) * 1024 * 1024
+SENT_FILE_ID_CACHE_SIZE: Final[int] = 5000  # Remembered (content hash, filename) -> file_id pairs
+
 # Operation Timeouts (in seconds)
 OPERATION_TIMEOUT: Final[int] = 300  # 5 minutes max per operation
 CLEANUP_INTERVAL: Final[int] = 3600  # Clean temp files every hour
 
+# Worker Pool (blocking PDF work runs here instead of on the event loop)
+# Process workers sidestep the GIL for PyPDF2/Pillow/pikepdf work and scale with cores
+WORKER_POOL_TYPE: Final[str] = os.getenv("WORKER_POOL_TYPE", "process")  # "thread" or "process"
+WORKER_POOL_SIZE: Final[int] = int(os.getenv("WORKER_POOL_SIZE", str(os.cpu_count() or 1)))
+WORKER_MAX_JOBS: Final[int] = int(os.getenv("WORKER_MAX_JOBS", "50"))  # Replace each process worker after N jobs (0 = never)
+
+# Maximum concurrent jobs per PDFOperations method (others default to WORKER_POOL_SIZE)
+OPERATION_CONCURRENCY: Final[dict] = {
+    "compress_pdf": 2,           # Ghostscript is CPU and memory heavy
+    "compress_pdf_advanced": 2,
+    "pdf_to_images": 2,          # poppler rendering
+    "images_to_pdf": 2,          # Pillow decoding
+}
+
+# Job Broker (run PDF jobs in separate worker processes/nodes - see pdf_worker.py)
+# "" keeps jobs on the local worker pool; "sqlite", "redis" or "postgres" sends them through a broker.
+# Workers must see the same TEMP_DIR (shared volume), since jobs carry file paths, not file contents.
+JOB_BROKER: Final[str] = os.getenv("JOB_BROKER", "").lower()
+JOB_BROKER_SQLITE_PATH: Final[Path] = Path(os.getenv("JOB_BROKER_SQLITE_PATH", "/tmp/pdf_bot_jobs.db"))
+JOB_BROKER_REDIS_URL: Final[str] = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+JOB_BROKER_POSTGRES_URL: Final[str] = os.getenv("JOB_BROKER_POSTGRES_URL", DATABASE_URL)
+JOB_POLL_INTERVAL: Final[float] = 0.2     # Seconds between result checks / empty-queue polls
+JOB_LEASE_TIMEOUT: Final[int] = 600       # Requeue jobs whose worker went silent for this long
+LOCAL_OPERATIONS: Final[tuple] = ("get_pdf_info",)  # Quick calls run on a thread in the bot process, never through the broker or process pool
+
+# Session Persistence (uploaded files and temp dirs survive restarts and are shared by replicas)
+# "" keeps sessions in memory only; "sqlite" for a single host, "redis" or "postgres" for several.
+PERSISTENCE: Final[str] = os.getenv("PERSISTENCE", "").lower()
+PERSISTENCE_SQLITE_PATH: Final[Path] = Path(os.getenv("PERSISTENCE_SQLITE_PATH", "/tmp/pdf_bot_state.db"))
+PERSISTENCE_REDIS_URL: Final[str] = os.getenv("PERSISTENCE_REDIS_URL", JOB_BROKER_REDIS_URL)
+PERSISTENCE_POSTGRES_URL: Final[str] = os.getenv("PERSISTENCE_POSTGRES_URL", DATABASE_URL)
+PERSISTENCE_INTERVAL: Final[float] = float(os.getenv("PERSISTENCE_INTERVAL", "5"))     # Write-behind: seconds between batched writes
+PERSISTENCE_CACHE_TTL: Final[float] = float(os.getenv("PERSISTENCE_CACHE_TTL", "30"))  # Re-read a user's session from the store after this long (0 = never)
+
+# Job Queue (admission control between handlers and the worker pool)
+MAX_QUEUED_JOBS: Final[int] = int(os.getenv("MAX_QUEUED_JOBS", "100"))  # Queued + running jobs, all users
+MAX_QUEUED_PER_OPERATION: Final[dict] = {
+    "compress_pdf_advanced": 20,  # Ghostscript jobs are the most memory hungry
+    "pdf_to_images": 20,
+}
+QUEUE_POSITION_UPDATE_INTERVAL: Final[int] = 5  # Seconds between queue position updates
+
 # Rate Limiting (basic)
 MAX_OPERATIONS_PER_MINUTE: Final[int] = 10
 
@@ -78,6 +204,19 @@ def validate_config() -> bool:
         print("Please set BOT_TOKEN in your .env file or environment.")
         return False
     
+    if BOT_MODE not in ("polling", "webhook"):
+        print(f"❌ ERROR: Invalid BOT_MODE: {BOT_MODE}. Use: polling, webhook")
+        return False
+    
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL and WEBHOOK_REGISTER:
+            print("❌ ERROR: WEBHOOK_URL is required in webhook mode!")
+            print("Set it to the public HTTPS address Telegram should send updates to.")
+            return False
+        
+        if not WEBHOOK_SECRET_TOKEN:
+            print("⚠️  WARNING: WEBHOOK_SECRET_TOKEN not set. Anyone who finds the URL can post fake updates.")
+    
     if not TEMP_DIR.exists():
         try:
             TEMP_DIR.mkdir(parents=True, exist_ok=True)
@@ -8,7 +8,14 @@ from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.constants import ChatAction
 
-from utils import file_manager, pdf_ops, analytics
+from utils import (
+    file_manager,
+    pdf_executor,
+    job_scheduler,
+    queue_position_updater,
+    SchedulerError,
+    analytics
+)
 import config
 
 
@@ -141,11 +148,16 @@ async def compress_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         )
         return
     
-    pdf_path = pdf_files[0]
+    # Download the PDF now that it's needed
+    pdf_paths = await file_manager.fetch_files(update, context, 'pdf_files')
+    if pdf_paths is None:
+        return
+    
+    pdf_path = pdf_paths[0]
     
     # Get original PDF info
     original_size = file_manager.get_file_size_mb(pdf_path)
-    pdf_info = pdf_ops.get_pdf_info(pdf_path)
+    pdf_info = await pdf_executor.run('get_pdf_info', pdf_path)
     
     # Validate target size vs original size
     if target['type'] == 'size' and target['value'] >= original_size:
@@ -194,10 +206,13 @@ async def compress_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         output_path = user_dir / "compressed.pdf"
         
         # Compress PDF based on target type
-        success, original_size_mb, compressed_size_mb = pdf_ops.compress_pdf_advanced(
+        success, original_size_mb, compressed_size_mb = await job_scheduler.run(
+            user_id,
+            'compress_pdf_advanced',
             pdf_path,
             output_path,
-            target
+            target,
+            on_position=queue_position_updater(processing_msg)
         )
         
         # Calculate compression ratio
@@ -233,14 +248,14 @@ async def compress_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
                 result_path = pdf_path
                 result_msg = f"Original (already optimized): {original_size_mb:.2f} MB"
             
-            with open(result_path, 'rb') as pdf_file:
-                await update.message.reply_document(
-                    document=pdf_file,
-                    filename="optimized.pdf",
-                    caption=f"📄 {result_msg}\n"
-                           f"📚 Pages: {pdf_info['pages']}",
-                    parse_mode='Markdown'
-                )
+            await file_manager.send_document(
+                update.message,
+                result_path,
+                filename="optimized.pdf",
+                caption=f"📄 {result_msg}\n"
+                       f"📚 Pages: {pdf_info['pages']}",
+                parse_mode='Markdown'
+            )
         else:
             # Successful compression
             # Check if target was met
@@ -272,18 +287,18 @@ async def compress_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             )
             
             # Send compressed PDF
-            with open(output_path, 'rb') as pdf_file:
-                await update.message.reply_document(
-                    document=pdf_file,
-                    filename="compressed.pdf",
-                    caption=f"✨ **Compressed PDF Ready!**\n\n"
-                           f"📉 Reduced by {compression_ratio:.1f}%\n"
-                           f"📊 Before: {original_size_mb:.2f} MB\n"
-                           f"📊 After: {compressed_size_mb:.2f} MB\n"
-                           f"💾 Saved: {size_saved:.2f} MB\n"
-                           f"📚 Pages: {pdf_info['pages']}",
-                    parse_mode='Markdown'
-                )
+            await file_manager.send_document(
+                update.message,
+                output_path,
+                filename="compressed.pdf",
+                caption=f"✨ **Compressed PDF Ready!**\n\n"
+                       f"📉 Reduced by {compression_ratio:.1f}%\n"
+                       f"📊 Before: {original_size_mb:.2f} MB\n"
+                       f"📊 After: {compressed_size_mb:.2f} MB\n"
+                       f"💾 Saved: {size_saved:.2f} MB\n"
+                       f"📚 Pages: {pdf_info['pages']}",
+                parse_mode='Markdown'
+            )
         
         # Delete processing message
         await processing_msg.delete()
@@ -304,6 +319,10 @@ async def compress_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             parse_mode='Markdown'
         )
     
+    except SchedulerError as e:
+        # Queue full or rate limited - keep files so the user can retry
+        await processing_msg.edit_text(str(e), parse_mode='Markdown')
+    
     except Exception as e:
         # Handle errors
         error_message = str(e)
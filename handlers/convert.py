@@ -4,14 +4,26 @@ Handles PDF to images and images to PDF conversions.
 Optimized for faster processing with better timeout handling.
 """
 
-import zipfile
 import asyncio
 from pathlib import Path
-from telegram import Update
+from typing import Any, List, Optional, Tuple
+from telegram import Update, Message, InputMediaPhoto, PhotoSize
 from telegram.ext import ContextTypes
 from telegram.constants import ChatAction
 
-from utils import file_manager, pdf_ops, analytics
+from utils import (
+    file_manager,
+    pdf_executor,
+    job_scheduler,
+    queue_position_updater,
+    SchedulerError,
+    StreamingZipWriter,
+    PendingFile,
+    PageSpec,
+    image_encoder,
+    media_groups,
+    analytics
+)
 import config
 
 
@@ -54,17 +66,47 @@ async def pdf_to_images_command(update: Update, context: ContextTypes.DEFAULT_TY
         )
         return
     
-    pdf_path = pdf_files[0]
+    # Download the PDF now that it's needed
+    pdf_paths = await file_manager.fetch_files(update, context, 'pdf_files')
+    if pdf_paths is None:
+        return
+    
+    pdf_path = pdf_paths[0]
     
     # Get PDF info
-    pdf_info = pdf_ops.get_pdf_info(pdf_path)
+    pdf_info = await pdf_executor.run('get_pdf_info', pdf_path)
     page_count = pdf_info['pages']
     
+    # Determine image format from command
+    command = update.message.text.lower()
+    image_format = "PNG"  # Default
+    
+    if "jpg" in command or "jpeg" in command:
+        image_format = "JPEG"
+    
+    # Optional page selection, e.g. /toimage 1-5,9 or /tojpg odd
+    spec_text = ' '.join(
+        word for word in command.split()[1:] if word not in ('png', 'jpg', 'jpeg')
+    )
+    try:
+        pages = PageSpec.parse(spec_text, page_count) if spec_text else PageSpec.all(page_count)
+    except ValueError as e:
+        await update.message.reply_text(
+            f"❌ **Invalid page selection!**\n\n"
+            f"Error: {str(e)}\n\n"
+            f"**Examples:**\n"
+            f"• `/toimage 1-5` - Pages 1 to 5\n"
+            f"• `/tojpg 2,7,-1` - Pages 2, 7 and the last page\n"
+            f"• `/toimage odd` - Every odd page",
+            parse_mode='Markdown'
+        )
+        return
+    
     # Warn if too many pages
-    if page_count > 20:
+    if len(pages) > 20:
         await update.message.reply_text(
             f"⚠️ **Large PDF detected!**\n\n"
-            f"📚 Your PDF has {page_count} pages.\n\n"
+            f"📚 Converting {len(pages)} of {page_count} pages.\n\n"
             f"Converting many pages may take time and produce many files.\n\n"
             f"**Options:**\n"
             f"• Proceed with conversion (images will be sent as zip)\n"
@@ -74,18 +116,11 @@ async def pdf_to_images_command(update: Update, context: ContextTypes.DEFAULT_TY
             parse_mode='Markdown'
         )
     
-    # Determine image format from command
-    command = update.message.text.lower()
-    image_format = "PNG"  # Default
-    
-    if "jpg" in command or "jpeg" in command:
-        image_format = "JPEG"
-    
     # Show processing message with estimated time
-    estimated_time = max(5, page_count * 3)  # Roughly 3 seconds per page
+    estimated_time = max(5, len(pages) * 3)  # Roughly 3 seconds per page
     processing_msg = await update.message.reply_text(
         f"🔄 **Converting PDF to images...**\n\n"
-        f"📄 Pages: {page_count}\n"
+        f"📄 Pages: {len(pages)}\n"
         f"🖼️ Format: {image_format}\n"
         f"⏱️ Estimated time: ~{estimated_time} seconds\n\n"
         f"⏳ Please wait, processing in progress...\n"
@@ -105,52 +140,40 @@ async def pdf_to_images_command(update: Update, context: ContextTypes.DEFAULT_TY
         images_dir = user_dir / "images"
         images_dir.mkdir(exist_ok=True)
         
-        # Convert PDF to images with timeout protection
-        # Run conversion in executor to avoid blocking
-        loop = asyncio.get_event_loop()
-        image_paths = await loop.run_in_executor(
-            None,
-            pdf_ops.pdf_to_images,
-            pdf_path,
-            images_dir,
-            image_format
-        )
-        
-        # Update processing message
-        await processing_msg.edit_text(
-            f"✅ **Conversion completed!**\n\n"
-            f"🖼️ Generated {len(image_paths)} images\n\n"
-            f"📤 Sending images...",
-            parse_mode='Markdown'
-        )
-        
-        # If few pages, send as individual images
-        if len(image_paths) <= 10:
-            for i, img_path in enumerate(image_paths, 1):
-                with open(img_path, 'rb') as img_file:
-                    await update.message.reply_photo(
-                        photo=img_file,
-                        caption=f"📄 Page {i} of {len(image_paths)}"
-                    )
-        else:
-            # Many pages - create zip file
-            zip_path = user_dir / "pdf_images.zip"
-            
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for img_path in image_paths:
-                    zipf.write(img_path, img_path.name)
-            
-            zip_size = file_manager.get_file_size_mb(zip_path)
+        async with job_scheduler.slot(
+            user_id,
+            'pdf_to_images',
+            on_position=queue_position_updater(processing_msg)
+        ):
+            if page_count < 1:
+                raise ValueError("Could not read pages from PDF")
             
-            # Send zip file
-            with open(zip_path, 'rb') as zip_file:
-                await update.message.reply_document(
-                    document=zip_file,
-                    filename="pdf_images.zip",
-                    caption=f"📦 **All images in one ZIP file!**\n\n"
-                           f"🖼️ Total images: {len(image_paths)}\n"
-                           f"📊 Size: {zip_size:.2f} MB\n"
-                           f"📄 Format: {image_format}",
+            # If few pages, send each page as soon as it is rendered
+            if len(pages) <= 10:
+                await processing_msg.edit_text(
+                    f"🔄 **Converting PDF to images...**\n\n"
+                    f"📄 Pages: {len(pages)}\n"
+                    f"🖼️ Format: {image_format}\n\n"
+                    f"📤 Sending pages as they're ready...",
+                    parse_mode='Markdown'
+                )
+                
+                await _render_and_send_photos(update, pdf_path, images_dir, image_format, pages)
+            else:
+                # Many pages - render in chunks and stream them into ZIP volumes
+                volume_count = await _render_and_send_zip(
+                    update,
+                    pdf_path,
+                    images_dir,
+                    user_dir,
+                    image_format,
+                    pages
+                )
+                
+                await processing_msg.edit_text(
+                    f"✅ **Conversion completed!**\n\n"
+                    f"🖼️ Generated {len(pages)} images\n"
+                    f"📦 Sent in {volume_count} ZIP file(s)",
                     parse_mode='Markdown'
                 )
         
@@ -169,6 +192,10 @@ async def pdf_to_images_command(update: Update, context: ContextTypes.DEFAULT_TY
             parse_mode='Markdown'
         )
     
+    except SchedulerError as e:
+        # Queue full or rate limited - keep files so the user can retry
+        await processing_msg.edit_text(str(e), parse_mode='Markdown')
+    
     except asyncio.TimeoutError:
         await processing_msg.edit_text(
             "⏱️ **Conversion is taking longer than expected...**\n\n"
@@ -212,6 +239,173 @@ async def pdf_to_images_command(update: Update, context: ContextTypes.DEFAULT_TY
         context.user_data.clear()
 
 
+async def _render_and_send_photos(
+    update: Update,
+    pdf_path: Path,
+    images_dir: Path,
+    image_format: str,
+    pages: PageSpec
+) -> None:
+    """
+    Render pages one at a time and upload them while later pages are still rendering.
+    Pages that are ready together go out in one media group (up to 10).
+    
+    Args:
+        update: Telegram update object
+        pdf_path: Path to source PDF
+        images_dir: Directory for rendered images
+        image_format: Image format (PNG or JPEG)
+        pages: Pages to render
+    """
+    rendered = asyncio.Queue()
+    
+    async def render() -> None:
+        try:
+            for page_num in pages:
+                paths = await pdf_executor.run(
+                    'render_pages',
+                    pdf_path,
+                    images_dir,
+                    image_format,
+                    page_num,
+                    page_num
+                )
+                for path in paths:
+                    await rendered.put((page_num, path))
+        finally:
+            await rendered.put(None)  # Tell uploader we're done
+    
+    async def upload() -> None:
+        finished = False
+        while not finished:
+            # Wait for at least one page, then take everything else that's ready
+            batch = []
+            item = await rendered.get()
+            while item is not None:
+                batch.append(item)
+                if len(batch) == 10 or rendered.empty():
+                    break
+                item = rendered.get_nowait()
+            finished = item is None
+            
+            if len(batch) == 1:
+                page_num, path = batch[0]
+                with open(path, 'rb') as img_file:
+                    await update.message.reply_photo(
+                        photo=img_file,
+                        caption=f"📄 Page {page_num} of {pages.total_pages}"
+                    )
+            elif batch:
+                files = [open(path, 'rb') for _, path in batch]
+                try:
+                    await update.message.reply_media_group(media=[
+                        InputMediaPhoto(media=img_file, caption=f"📄 Page {page_num} of {pages.total_pages}")
+                        for (page_num, _), img_file in zip(batch, files)
+                    ])
+                finally:
+                    for img_file in files:
+                        img_file.close()
+    
+    render_task = asyncio.create_task(render())
+    try:
+        await upload()
+        await render_task  # Re-raise rendering errors
+    finally:
+        if not render_task.done():
+            render_task.cancel()
+
+
+async def _render_and_send_zip(
+    update: Update,
+    pdf_path: Path,
+    images_dir: Path,
+    user_dir: Path,
+    image_format: str,
+    pages: PageSpec
+) -> int:
+    """
+    Render pages in chunks and append each page to a ZIP as soon as it exists.
+    Archives are split into volumes under Telegram's upload limit, and each
+    volume is uploaded as soon as it is complete.
+    
+    Args:
+        update: Telegram update object
+        pdf_path: Path to source PDF
+        images_dir: Directory for rendered images
+        user_dir: Directory for ZIP volumes
+        image_format: Image format (PNG or JPEG)
+        pages: Pages to render
+        
+    Returns:
+        int: Number of ZIP volumes sent
+    """
+    loop = asyncio.get_running_loop()
+    zip_writer = StreamingZipWriter(user_dir, "pdf_images")
+    upload_lock = asyncio.Lock()  # Keeps volumes in order
+    uploads = []
+    
+    async def send_volume(volume_path: Path, part: int, file_count: int) -> None:
+        async with upload_lock:
+            zip_size = file_manager.get_file_size_mb(volume_path)
+            
+            # Only number the file if the archive was split
+            if len(zip_writer.volumes) > 1:
+                filename = f"pdf_images_part{part}.zip"
+                title = f"📦 **ZIP part {part}**"
+            else:
+                filename = "pdf_images.zip"
+                title = "📦 **All images in one ZIP file!**"
+            
+            await file_manager.send_document(
+                update.message,
+                volume_path,
+                filename=filename,
+                caption=f"{title}\n\n"
+                       f"🖼️ Images: {file_count}\n"
+                       f"📊 Size: {zip_size:.2f} MB\n"
+                       f"📄 Format: {image_format}",
+                parse_mode='Markdown'
+            )
+            
+            volume_path.unlink()
+    
+    def queue_upload(volume_path: Path) -> None:
+        part = zip_writer.volumes.index(volume_path) + 1
+        file_count = zip_writer.file_counts[part - 1]
+        uploads.append(asyncio.create_task(send_volume(volume_path, part, file_count)))
+    
+    try:
+        for first_page, last_page in pages.runs(config.RENDER_CHUNK_PAGES):
+            image_paths = await pdf_executor.run(
+                'render_pages',
+                pdf_path,
+                images_dir,
+                image_format,
+                first_page,
+                last_page
+            )
+            
+            # Archive off the event loop; rendered images are deleted once stored
+            for img_path in image_paths:
+                completed = await loop.run_in_executor(None, zip_writer.add, img_path)
+                img_path.unlink()
+                if completed:
+                    queue_upload(completed)
+        
+        last_volume = await loop.run_in_executor(None, zip_writer.close)
+        if last_volume:
+            queue_upload(last_volume)
+        
+        await asyncio.gather(*uploads)
+        return len(zip_writer.volumes)
+    
+    finally:
+        for upload in uploads:
+            if not upload.done():
+                upload.cancel()
+        zip_writer.close()
+
+
 async def images_to_pdf_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Handle /topdf command - Convert images to PDF.
@@ -253,10 +447,23 @@ async def images_to_pdf_command(update: Update, context: ContextTypes.DEFAULT_TY
         )
         return
     
+    # Download the images now that they're needed
+    image_paths = await file_manager.fetch_files(update, context, 'image_files')
+    if image_paths is None:
+        return
+    
+    # Animated images (GIF, WEBP, multi-page TIFF) contribute their first frame only
+    animated = sum(
+        1 for pending in image_files
+        if pending.image_info and pending.image_info['frames'] > 1
+    )
+    animated_note = f"🎞️ {animated} animated image(s): first frame only\n" if animated else ""
+    
     # Show processing message
     processing_msg = await update.message.reply_text(
         f"🔄 **Converting images to PDF...**\n\n"
-        f"🖼️ Total images: {len(image_files)}\n\n"
+        f"🖼️ Total images: {len(image_files)}\n"
+        f"{animated_note}\n"
         f"⏳ Please wait...",
         parse_mode='Markdown'
     )
@@ -273,7 +480,13 @@ async def images_to_pdf_command(update: Update, context: ContextTypes.DEFAULT_TY
         output_path = user_dir / "images_combined.pdf"
         
         # Convert images to PDF
-        pdf_ops.images_to_pdf(image_files, output_path)
+        await job_scheduler.run(
+            user_id,
+            'images_to_pdf',
+            image_paths,
+            output_path,
+            on_position=queue_position_updater(processing_msg)
+        )
         
         # Get file size
         file_size = file_manager.get_file_size_mb(output_path)
@@ -288,16 +501,16 @@ async def images_to_pdf_command(update: Update, context: ContextTypes.DEFAULT_TY
         )
         
         # Send PDF
-        with open(output_path, 'rb') as pdf_file:
-            await update.message.reply_document(
-                document=pdf_file,
-                filename="images_combined.pdf",
-                caption=f"✨ Here's your PDF from images!\n\n"
-                       f"📄 Pages: {len(image_files)}\n"
-                       f"📊 Size: {file_size:.2f} MB\n"
-                       f"🖼️ Images converted successfully!",
-                parse_mode='Markdown'
-            )
+        await file_manager.send_document(
+            update.message,
+            output_path,
+            filename="images_combined.pdf",
+            caption=f"✨ Here's your PDF from images!\n\n"
+                   f"📄 Pages: {len(image_files)}\n"
+                   f"📊 Size: {file_size:.2f} MB\n"
+                   f"🖼️ Images converted successfully!",
+            parse_mode='Markdown'
+        )
         
         # Delete processing message
         await processing_msg.delete()
@@ -314,6 +527,10 @@ async def images_to_pdf_command(update: Update, context: ContextTypes.DEFAULT_TY
             parse_mode='Markdown'
         )
     
+    except SchedulerError as e:
+        # Queue full or rate limited - keep files so the user can retry
+        await processing_msg.edit_text(str(e), parse_mode='Markdown')
+    
     except Exception as e:
         # Handle errors
         error_message = str(e)
@@ -346,28 +563,16 @@ async def handle_image_file(update: Update, context: ContextTypes.DEFAULT_TYPE)
         update: Telegram update object
         context: Telegram context object
     """
-    user_id = update.effective_user.id
+    # Album parts are collected and handled together
+    if update.message.media_group_id:
+        media_groups.add(update.message, context, _handle_image_album)
+        return
     
     # Handle both photo and document uploads
-    if update.message.photo:
-        # Photo sent as image (compressed by Telegram)
-        photo = update.message.photo[-1]  # Get largest size
-        telegram_file = await photo.get_file()
-        file_name = f"photo_{photo.file_unique_id}.jpg"
-        file_size = photo.file_size
-    elif update.message.document:
-        # Document upload
-        document = update.message.document
-        
-        # Check if it's an image format
-        if not any(document.file_name.lower().endswith(ext) for ext in config.SUPPORTED_IMAGE_FORMATS):
-            return  # Not an image, ignore
-        
-        telegram_file = await document.get_file()
-        file_name = document.file_name
-        file_size = document.file_size
-    else:
-        return
+    image = _image_attachment(update.message)
+    if image is None:
+        return  # Not an image, ignore
+    attachment, file_name, file_size = image
     
     # Check file size
     if file_size > config.MAX_FILE_SIZE:
@@ -384,51 +589,152 @@ async def handle_image_file(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
     
     try:
-        # Download image
-        sanitized_filename = file_manager.sanitize_filename(file_name)
-        file_path = await file_manager.download_file(
-            telegram_file,
-            user_id,
-            sanitized_filename
+        pending = _pending_image(attachment, file_name, file_size)
+    except ValueError as e:
+        await update.message.reply_text(
+            f"⚠️ **Image rejected!**\n\n"
+            f"🖼️ File: {file_name}\n"
+            f"Reason: {str(e)}\n\n"
+            f"💡 Try a smaller image.",
+            parse_mode='Markdown'
         )
+        return
+    
+    # Remember the image - it is downloaded only when /topdf runs
+    if 'image_files' not in context.user_data:
+        context.user_data['image_files'] = []
+    
+    context.user_data['image_files'].append(pending)
+    
+    file_count = len(context.user_data['image_files'])
+    
+    # Send confirmation
+    await update.message.reply_text(
+        f"✅ **Image received!**\n\n"
+        f"🖼️ File: {file_name}\n"
+        f"📊 Size: {file_size / (1024 * 1024):.2f} MB\n"
+        f"📚 Total images: {file_count}\n\n"
+        f"**What's next?**\n"
+        f"• Send more images (up to {config.MAX_IMAGE_FILES})\n"
+        f"• Use /topdf to create PDF\n"
+        f"• Use /cancel to start over",
+        parse_mode='Markdown'
+    )
+
+
+def _image_attachment(message: Message) -> Optional[Tuple[Any, str, int]]:
+    """
+    Get the image a message carries.
+    
+    Args:
+        message: Telegram message
         
-        # Validate image
-        if not file_manager.validate_image(file_path):
-            await update.message.reply_text(
-                "❌ **Invalid image file!**\n\n"
-                "The file appears to be corrupted or unsupported.\n\n"
-                "**Supported formats:**\n"
-                "JPG, JPEG, PNG, GIF, BMP, TIFF, WEBP",
-                parse_mode='Markdown'
-            )
-            file_path.unlink()  # Delete invalid file
-            return
+    Returns:
+        Optional[Tuple[Any, str, int]]: (PhotoSize/Document, file name, file size), or None if not an image
+    """
+    if message.photo:
+        # Photo sent as image (compressed by Telegram)
+        photo = message.photo[-1]  # Get largest size
+        return photo, f"photo_{photo.file_unique_id}.jpg", photo.file_size
+    
+    if message.document:
+        # Document upload - check if it's an image format
+        document = message.document
+        if any(document.file_name.lower().endswith(ext) for ext in config.SUPPORTED_IMAGE_FORMATS):
+            return document, document.file_name, document.file_size
+    
+    return None
+
+
+def _pending_image(attachment: Any, file_name: str, file_size: int) -> PendingFile:
+    """
+    Remember an image for /topdf.
+    Photos carry their dimensions, so they are checked right away; image documents
+    are probed from their header once downloaded (see ImageEncoder.probe).
+    
+    Args:
+        attachment: PhotoSize or Document
+        file_name: File name
+        file_size: Size in bytes
         
-        # Store file path in user data
-        if 'image_files' not in context.user_data:
-            context.user_data['image_files'] = []
+    Returns:
+        PendingFile: Reference to the image
+        
+    Raises:
+        ValueError: If the photo is too large to decode safely
+    """
+    pending = PendingFile(
+        attachment.file_id,
+        attachment.file_unique_id,
+        file_manager.sanitize_filename(file_name),
+        file_size
+    )
+    
+    if isinstance(attachment, PhotoSize):
+        image_encoder.check_size(attachment.width, attachment.height)
+        # Telegram re-encodes photos as baseline RGB JPEGs
+        pending.image_info = {
+            'format': 'JPEG',
+            'width': attachment.width,
+            'height': attachment.height,
+            'mode': 'RGB',
+            'frames': 1
+        }
+    
+    return pending
+
+
+async def _handle_image_album(messages: List[Message], context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Handle an album of images - Remember all images with one confirmation message.
+    
+    Args:
+        messages: Album messages in order
+        context: Telegram context object
+    """
+    max_size_mb = config.MAX_FILE_SIZE / (1024 * 1024)
+    
+    received = 0
+    total_size = 0
+    skipped = []
+    for message in messages:
+        image = _image_attachment(message)
+        if image is None:
+            continue  # Not an image, ignore
         
-        context.user_data['image_files'].append(file_path)
+        attachment, file_name, file_size = image
+        if file_size > config.MAX_FILE_SIZE:
+            skipped.append(f"• {file_name}: larger than {max_size_mb:.1f} MB")
+            continue
         
-        file_count = len(context.user_data['image_files'])
+        try:
+            pending = _pending_image(attachment, file_name, file_size)
+        except ValueError as e:
+            skipped.append(f"• {file_name}: {e}")
+            continue
         
-        # Send confirmation
-        await update.message.reply_text(
-            f"✅ **Image received!**\n\n"
-            f"🖼️ File: {file_name}\n"
-            f"📊 Size: {file_size / (1024 * 1024):.2f} MB\n"
-            f"📚 Total images: {file_count}\n\n"
-            f"**What's next?**\n"
-            f"• Send more images (up to {config.MAX_IMAGE_FILES})\n"
-            f"• Use /topdf to create PDF\n"
-            f"• Use /cancel to start over",
-            parse_mode='Markdown'
-        )
+        if 'image_files' not in context.user_data:
+            context.user_data['image_files'] = []
+        context.user_data['image_files'].append(pending)
+        received += 1
+        total_size += file_size
     
-    except Exception as e:
-        await update.message.reply_text(
-            "❌ **Something went wrong!**\n\n"
-            f"Error: {str(e)}\n\n"
-            "Please try again or use /cancel to reset.",
-            parse_mode='Markdown'
-        )
\ No newline at end of file
+    if not received and not skipped:
+        return
+    
+    file_count = len(context.user_data.get('image_files', []))
+    skipped_text = ""
+    if skipped:
+        skipped_text = "⚠️ **Skipped:**\n" + "\n".join(skipped) + "\n\n"
+    
+    await messages[0].reply_text(
+        f"✅ **{received} images received!**\n\n"
+        f"📊 Size: {total_size / (1024 * 1024):.2f} MB\n"
+        f"📚 Total images: {file_count}\n\n"
+        f"{skipped_text}"
+        f"**What's next?**\n"
+        f"• Send more images (up to {config.MAX_IMAGE_FILES})\n"
+        f"• Use /topdf to create PDF\n"
+        f"• Use /cancel to start over",
+        parse_mode='Markdown'
+    )
@@ -3,11 +3,20 @@ Merge PDF handler for PDF Telegram Bot.
 Handles merging multiple PDF files into one document.
 """
 
-from telegram import Update
+from typing import List
+from telegram import Update, Message
 from telegram.ext import ContextTypes
 from telegram.constants import ChatAction
 
-from utils import file_manager, pdf_ops, analytics
+from utils import (
+    file_manager,
+    job_scheduler,
+    queue_position_updater,
+    SchedulerError,
+    PendingFile,
+    media_groups,
+    analytics
+)
 import config
 
 
@@ -50,6 +59,11 @@ async def merge_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         )
         return
     
+    # Download the PDFs now that they're needed
+    pdf_paths = await file_manager.fetch_files(update, context, 'pdf_files')
+    if pdf_paths is None:
+        return
+    
     # Show processing message
     processing_msg = await update.message.reply_text(
         f"🔄 **Merging {len(pdf_files)} PDFs...**\n\n"
@@ -69,7 +83,13 @@ async def merge_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         output_path = user_dir / "merged.pdf"
         
         # Merge PDFs
-        pdf_ops.merge_pdfs(pdf_files, output_path)
+        await job_scheduler.run(
+            user_id,
+            'merge_pdfs',
+            pdf_paths,
+            output_path,
+            on_position=queue_position_updater(processing_msg)
+        )
         
         # Get file size
         file_size = file_manager.get_file_size_mb(output_path)
@@ -84,15 +104,15 @@ async def merge_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         )
         
         # Send merged PDF
-        with open(output_path, 'rb') as pdf_file:
-            await update.message.reply_document(
-                document=pdf_file,
-                filename="merged.pdf",
-                caption=f"✨ Here's your merged PDF!\n\n"
-                       f"📄 {len(pdf_files)} files combined\n"
-                       f"📊 Total size: {file_size:.2f} MB",
-                parse_mode='Markdown'
-            )
+        await file_manager.send_document(
+            update.message,
+            output_path,
+            filename="merged.pdf",
+            caption=f"✨ Here's your merged PDF!\n\n"
+                   f"📄 {len(pdf_files)} files combined\n"
+                   f"📊 Total size: {file_size:.2f} MB",
+            parse_mode='Markdown'
+        )
         
         # Delete processing message
         await processing_msg.delete()
@@ -109,6 +129,10 @@ async def merge_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             parse_mode='Markdown'
         )
     
+    except SchedulerError as e:
+        # Queue full or rate limited - keep files so the user can retry
+        await processing_msg.edit_text(str(e), parse_mode='Markdown')
+    
     except Exception as e:
         # Handle errors
         error_message = str(e)
@@ -140,7 +164,11 @@ async def handle_pdf_file(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         update: Telegram update object
         context: Telegram context object
     """
-    user_id = update.effective_user.id
+    # Album parts are collected and handled together
+    if update.message.media_group_id:
+        media_groups.add(update.message, context, _handle_pdf_album)
+        return
+    
     document = update.message.document
     
     # Check if it's a PDF file
@@ -170,73 +198,83 @@ async def handle_pdf_file(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         )
         return
     
-    # Show download message
-    download_msg = await update.message.reply_text(
-        f"📥 **Downloading PDF...**\n\n"
+    # Remember the file - it is downloaded only when an operation needs it
+    if 'pdf_files' not in context.user_data:
+        context.user_data['pdf_files'] = []
+    
+    context.user_data['pdf_files'].append(PendingFile(
+        document.file_id,
+        document.file_unique_id,
+        file_manager.sanitize_filename(document.file_name),
+        document.file_size
+    ))
+    
+    file_count = len(context.user_data['pdf_files'])
+    
+    await update.message.reply_text(
+        f"✅ **PDF received!**\n\n"
         f"📄 File: {document.file_name}\n"
-        f"📊 Size: {document.file_size / (1024 * 1024):.2f} MB",
+        f"📊 Size: {document.file_size / (1024 * 1024):.2f} MB\n"
+        f"📚 Total PDFs: {file_count}\n\n"
+        f"**What's next?**\n"
+        f"• Send more PDFs to merge (min 2)\n"
+        f"• Use /merge to combine all PDFs\n"
+        f"• Use /split <pages> to extract pages\n"
+        f"• Use /compress to reduce size\n"
+        f"• Use /toimage to convert to images\n"
+        f"• Use /cancel to start over",
         parse_mode='Markdown'
     )
+
+
+async def _handle_pdf_album(messages: List[Message], context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Handle an album of PDFs - Remember all files with one confirmation message.
     
-    try:
-        # Download file
-        telegram_file = await document.get_file()
-        sanitized_filename = file_manager.sanitize_filename(document.file_name)
-        file_path = await file_manager.download_file(
-            telegram_file,
-            user_id,
-            sanitized_filename
-        )
-        
-        # Validate PDF
-        if not file_manager.validate_pdf(file_path):
-            await download_msg.edit_text(
-                "❌ **Invalid PDF file!**\n\n"
-                "The file appears to be corrupted or not a valid PDF.\n\n"
-                "Please try:\n"
-                "• Opening the file on your device to check it works\n"
-                "• Converting it using another tool\n"
-                "• Sending a different file",
-                parse_mode='Markdown'
-            )
-            file_path.unlink()  # Delete invalid file
-            return
-        
-        # Store file path in user data
-        if 'pdf_files' not in context.user_data:
-            context.user_data['pdf_files'] = []
-        
-        context.user_data['pdf_files'].append(file_path)
-        
-        file_count = len(context.user_data['pdf_files'])
-        
-        # Update message
-        await download_msg.edit_text(
-            f"✅ **PDF received!**\n\n"
-            f"📄 File: {document.file_name}\n"
-            f"📊 Size: {document.file_size / (1024 * 1024):.2f} MB\n"
-            f"📚 Total PDFs: {file_count}\n\n"
-            f"**What's next?**\n"
-            f"• Send more PDFs to merge (min 2)\n"
-            f"• Use /merge to combine all PDFs\n"
-            f"• Use /split <pages> to extract pages\n"
-            f"• Use /compress to reduce size\n"
-            f"• Use /toimage to convert to images\n"
-            f"• Use /cancel to start over",
-            parse_mode='Markdown'
-        )
+    Args:
+        messages: Album messages in order
+        context: Telegram context object
+    """
+    max_size_mb = config.MAX_FILE_SIZE / (1024 * 1024)
     
-    except ValueError as e:
-        await download_msg.edit_text(
-            f"❌ **Download failed!**\n\n"
-            f"{str(e)}",
-            parse_mode='Markdown'
-        )
+    if 'pdf_files' not in context.user_data:
+        context.user_data['pdf_files'] = []
     
-    except Exception as e:
-        await download_msg.edit_text(
-            "❌ **Something went wrong!**\n\n"
-            f"Error: {str(e)}\n\n"
-            "Please try again or use /cancel to reset.",
-            parse_mode='Markdown'
-        )
\ No newline at end of file
+    received = 0
+    total_size = 0
+    skipped = []
+    for message in messages:
+        document = message.document
+        if not document.file_name.lower().endswith('.pdf'):
+            skipped.append(f"• {document.file_name}: not a PDF")
+        elif document.file_size > config.MAX_FILE_SIZE:
+            skipped.append(f"• {document.file_name}: larger than {max_size_mb:.1f} MB")
+        else:
+            context.user_data['pdf_files'].append(PendingFile(
+                document.file_id,
+                document.file_unique_id,
+                file_manager.sanitize_filename(document.file_name),
+                document.file_size
+            ))
+            received += 1
+            total_size += document.file_size
+    
+    file_count = len(context.user_data['pdf_files'])
+    skipped_text = ""
+    if skipped:
+        skipped_text = "⚠️ **Skipped:**\n" + "\n".join(skipped) + "\n\n"
+    
+    await messages[0].reply_text(
+        f"✅ **{received} PDFs received!**\n\n"
+        f"📊 Size: {total_size / (1024 * 1024):.2f} MB\n"
+        f"📚 Total PDFs: {file_count}\n\n"
+        f"{skipped_text}"
+        f"**What's next?**\n"
+        f"• Send more PDFs to merge (min 2)\n"
+        f"• Use /merge to combine all PDFs\n"
+        f"• Use /split <pages> to extract pages\n"
+        f"• Use /compress to reduce size\n"
+        f"• Use /toimage to convert to images\n"
+        f"• Use /cancel to start over",
+        parse_mode='Markdown'
+    )
@@ -7,7 +7,14 @@ from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.constants import ChatAction
 
-from utils import file_manager, pdf_ops, analytics
+from utils import (
+    file_manager,
+    pdf_executor,
+    job_scheduler,
+    queue_position_updater,
+    SchedulerError,
+    analytics
+)
 import config
 
 
@@ -99,10 +106,15 @@ async def protect_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         )
         return
     
-    pdf_path = pdf_files[0]
+    # Download the PDF now that it's needed
+    pdf_paths = await file_manager.fetch_files(update, context, 'pdf_files')
+    if pdf_paths is None:
+        return
+    
+    pdf_path = pdf_paths[0]
     
     # Get original PDF info
-    pdf_info = pdf_ops.get_pdf_info(pdf_path)
+    pdf_info = await pdf_executor.run('get_pdf_info', pdf_path)
     original_size = file_manager.get_file_size_mb(pdf_path)
     
     # Check if PDF is already encrypted
@@ -141,7 +153,14 @@ async def protect_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         output_path = user_dir / "protected.pdf"
         
         # Add password protection
-        pdf_ops.protect_pdf(pdf_path, output_path, password)
+        await job_scheduler.run(
+            user_id,
+            'protect_pdf',
+            pdf_path,
+            output_path,
+            password,
+            on_position=queue_position_updater(processing_msg)
+        )
         
         # Get file size
         protected_size = file_manager.get_file_size_mb(output_path)
@@ -197,6 +216,10 @@ async def protect_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             parse_mode='Markdown'
         )
     
+    except SchedulerError as e:
+        # Queue full or rate limited - keep files so the user can retry
+        await processing_msg.edit_text(str(e), parse_mode='Markdown')
+    
     except Exception as e:
         # Handle errors
         error_message = str(e)
@@ -279,7 +302,13 @@ async def unlock_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
     
     password = command_parts[1].strip()
-    pdf_path = pdf_files[0]
+    
+    # Download the PDF now that it's needed
+    pdf_paths = await file_manager.fetch_files(update, context, 'pdf_files')
+    if pdf_paths is None:
+        return
+    
+    pdf_path = pdf_paths[0]
     
     # Get original PDF info (will fail if password is wrong)
     original_size = file_manager.get_file_size_mb(pdf_path)
@@ -305,10 +334,17 @@ async def unlock_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         output_path = user_dir / "unlocked.pdf"
         
         # Remove password protection
-        pdf_ops.unlock_pdf(pdf_path, output_path, password)
+        await job_scheduler.run(
+            user_id,
+            'unlock_pdf',
+            pdf_path,
+            output_path,
+            password,
+            on_position=queue_position_updater(processing_msg)
+        )
         
         # Get PDF info after unlocking
-        pdf_info = pdf_ops.get_pdf_info(output_path)
+        pdf_info = await pdf_executor.run('get_pdf_info', output_path)
         unlocked_size = file_manager.get_file_size_mb(output_path)
         
         # Update processing message
@@ -355,6 +391,10 @@ async def unlock_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             parse_mode='Markdown'
         )
     
+    except SchedulerError as e:
+        # Queue full or rate limited - keep files so the user can retry
+        await processing_msg.edit_text(str(e), parse_mode='Markdown')
+    
     except ValueError as e:
         # Wrong password error
         await processing_msg.edit_text(
@@ -3,14 +3,91 @@ Split PDF handler for PDF Telegram Bot.
 Handles extracting specific pages from PDF files.
 """
 
-from telegram import Update
+import asyncio
+from pathlib import Path
+from typing import List
+from telegram import Update, InputMediaDocument
 from telegram.ext import ContextTypes
 from telegram.constants import ChatAction
 
-from utils import file_manager, pdf_ops, analytics
+from utils import (
+    file_manager,
+    pdf_executor,
+    job_scheduler,
+    queue_position_updater,
+    SchedulerError,
+    StreamingZipWriter,
+    PDFOperations,
+    analytics
+)
 import config
 
 
+async def _send_parts(update: Update, part_paths: List[Path], user_dir: Path) -> None:
+    """
+    Send the files of a multi-part split: as one album when Telegram allows it,
+    otherwise as a ZIP (split into volumes if needed).
+    
+    Args:
+        update: Telegram update object
+        part_paths: Part files in order
+        user_dir: Directory for ZIP volumes
+    """
+    if len(part_paths) == 1:
+        await file_manager.send_document(
+            update.message,
+            part_paths[0],
+            filename=part_paths[0].name,
+            caption="✨ Here is your part!"
+        )
+        return
+    
+    fits_album = (
+        len(part_paths) <= config.MEDIA_GROUP_LIMIT
+        and all(path.stat().st_size <= config.MAX_FILE_SIZE for path in part_paths)
+    )
+    
+    if fits_album:
+        files = [open(path, 'rb') for path in part_paths]
+        try:
+            await update.message.reply_media_group(
+                media=[
+                    InputMediaDocument(file, filename=path.name)
+                    for file, path in zip(files, part_paths)
+                ],
+                caption=f"✨ Here are your {len(part_paths)} parts!"
+            )
+        finally:
+            for file in files:
+                file.close()
+        return
+    
+    # Too many parts for one album - archive them
+    loop = asyncio.get_running_loop()
+    zip_writer = StreamingZipWriter(user_dir, "split_parts")
+    for path in part_paths:
+        await loop.run_in_executor(None, zip_writer.add, path)
+    await loop.run_in_executor(None, zip_writer.close)
+    
+    for part, volume_path in enumerate(zip_writer.volumes, 1):
+        if len(zip_writer.volumes) > 1:
+            filename = f"split_parts_part{part}.zip"
+            title = f"📦 **ZIP part {part}**"
+        else:
+            filename = "split_parts.zip"
+            title = "📦 **All parts in one ZIP file!**"
+        
+        await file_manager.send_document(
+            update.message,
+            volume_path,
+            filename=filename,
+            caption=f"{title}\n\n"
+                   f"📄 Files: {zip_writer.file_counts[part - 1]}\n"
+                   f"📊 Size: {file_manager.get_file_size_mb(volume_path):.2f} MB",
+            parse_mode='Markdown'
+        )
+
+
 async def split_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Handle /split command - Extract specific pages from PDF.
@@ -37,7 +114,9 @@ async def split_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             "**Page formats:**\n"
             "• /split 1-3 → Pages 1, 2, 3\n"
             "• /split 1,3,5 → Pages 1, 3, 5\n"
-            "• /split 2-end → From page 2 to last page",
+            "• /split 2-end → From page 2 to last page\n"
+            "• /split 1-10;11-end → Two files\n"
+            "• /split every 5 → One file per 5 pages",
             parse_mode='Markdown'
         )
         return
@@ -53,13 +132,18 @@ async def split_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         )
         return
     
+    # Download the PDF now that it's needed
+    pdf_paths = await file_manager.fetch_files(update, context, 'pdf_files')
+    if pdf_paths is None:
+        return
+    
     # Get page specification from command
     command_parts = update.message.text.split(maxsplit=1)
     
     if len(command_parts) < 2:
         # Get PDF info for help message
-        pdf_path = pdf_files[0]
-        pdf_info = pdf_ops.get_pdf_info(pdf_path)
+        pdf_path = pdf_paths[0]
+        pdf_info = await pdf_executor.run('get_pdf_info', pdf_path)
         
         await update.message.reply_text(
             "⚠️ **Missing page specification!**\n\n"
@@ -71,20 +155,27 @@ async def split_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             "• /split 1,3,5 → Extract pages 1, 3, 5\n"
             "• /split 5-end → From page 5 to last page\n"
             f"• /split 1-{pdf_info['pages']} → All pages\n\n"
-            "💡 Mix formats: /split 1-3,5,7-end",
+            "• /split -3-end → Last 3 pages\n"
+            "• /split odd → Odd pages\n"
+            "• /split 1-end,!5 → All pages except 5\n\n"
+            "💡 Mix formats: /split 1-3,5,7-end\n\n"
+            "**Several files at once:**\n"
+            "• /split 1-10;11-20;21-end → One file per group\n"
+            "• /split every 5 → One file per 5 pages",
             parse_mode='Markdown'
         )
         return
     
     pages_spec = command_parts[1].strip()
-    pdf_path = pdf_files[0]
+    pdf_path = pdf_paths[0]
+    multi_part = PDFOperations.is_multi_part_spec(pages_spec)
     
     # Get PDF info
-    pdf_info = pdf_ops.get_pdf_info(pdf_path)
+    pdf_info = await pdf_executor.run('get_pdf_info', pdf_path)
     
     # Show processing message
     processing_msg = await update.message.reply_text(
-        f"🔄 **Extracting pages...**\n\n"
+        f"🔄 **{'Splitting into parts' if multi_part else 'Extracting pages'}...**\n\n"
         f"📄 Pages to extract: {pages_spec}\n"
         f"📚 Total pages in PDF: {pdf_info['pages']}\n\n"
         f"⏳ Please wait...",
@@ -100,27 +191,58 @@ async def split_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     try:
         # Get user directory
         user_dir = file_manager.get_user_dir(user_id)
-        output_path = user_dir / "extracted.pdf"
         
-        # Split PDF
-        success, pages_extracted = pdf_ops.split_pdf(pdf_path, pages_spec, output_path)
-        
-        # Get file size
-        file_size = file_manager.get_file_size_mb(output_path)
-        
-        # Update processing message
-        await processing_msg.edit_text(
-            f"✅ **Extraction completed!**\n\n"
-            f"📄 Pages extracted: {pages_extracted}\n"
-            f"📊 Size: {file_size:.2f} MB\n\n"
-            f"📤 Sending your file...",
-            parse_mode='Markdown'
-        )
+        if multi_part:
+            # All parts come from one pass over the PDF
+            part_paths = await job_scheduler.run(
+                user_id,
+                'split_pdf_parts',
+                pdf_path,
+                pages_spec,
+                user_dir / "parts",
+                on_position=queue_position_updater(processing_msg)
+            )
+            total_size = sum(file_manager.get_file_size_mb(path) for path in part_paths)
+            
+            await processing_msg.edit_text(
+                f"✅ **Split completed!**\n\n"
+                f"📄 Parts: {len(part_paths)}\n"
+                f"📊 Total size: {total_size:.2f} MB\n\n"
+                f"📤 Sending your files...",
+                parse_mode='Markdown'
+            )
+            
+            await _send_parts(update, part_paths, user_dir)
         
-        # Send extracted PDF
-        with open(output_path, 'rb') as pdf_file:
-            await update.message.reply_document(
-                document=pdf_file,
+        else:
+            output_path = user_dir / "extracted.pdf"
+            
+            # Split PDF
+            success, pages_extracted = await job_scheduler.run(
+                user_id,
+                'split_pdf',
+                pdf_path,
+                pages_spec,
+                output_path,
+                on_position=queue_position_updater(processing_msg)
+            )
+            
+            # Get file size
+            file_size = file_manager.get_file_size_mb(output_path)
+            
+            # Update processing message
+            await processing_msg.edit_text(
+                f"✅ **Extraction completed!**\n\n"
+                f"📄 Pages extracted: {pages_extracted}\n"
+                f"📊 Size: {file_size:.2f} MB\n\n"
+                f"📤 Sending your file...",
+                parse_mode='Markdown'
+            )
+            
+            # Send extracted PDF
+            await file_manager.send_document(
+                update.message,
+                output_path,
                 filename="extracted_pages.pdf",
                 caption=f"✨ Here are your extracted pages!\n\n"
                        f"📄 Pages: {pages_spec}\n"
@@ -144,6 +266,10 @@ async def split_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             parse_mode='Markdown'
         )
     
+    except SchedulerError as e:
+        # Queue full or rate limited - keep files so the user can retry
+        await processing_msg.edit_text(str(e), parse_mode='Markdown')
+    
     except ValueError as e:
         # Handle invalid page specification
         error_message = str(e)
@@ -155,7 +281,11 @@ async def split_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             "**Valid formats:**\n"
             "• /split 1-3 → Pages 1, 2, 3\n"
             "• /split 1,3,5 → Pages 1, 3, 5\n"
-            "• /split 2-end → Page 2 to last page\n\n"
+            "• /split 2-end → Page 2 to last page\n"
+            "• /split -3-end → Last 3 pages\n"
+            "• /split odd → Odd pages\n"
+            "• /split 1-10;11-end → Several files\n"
+            "• /split every 5 → One file per 5 pages\n\n"
             "💡 Make sure page numbers are within range!",
             parse_mode='Markdown'
         )
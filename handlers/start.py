@@ -3,11 +3,12 @@ Start and help command handlers for PDF Telegram Bot.
 Provides welcome messages and usage instructions.
 """
 
+import asyncio
 from telegram import Update
 from telegram.ext import ContextTypes
 
 import config
-from utils import analytics
+from utils import analytics, pdf_executor, job_scheduler, result_cache, file_manager, bot_persistence
 
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -119,7 +120,12 @@ Extract specific pages from a PDF.
 - Page range: /split 1-3
 - Multiple pages: /split 1,3,5
 - From page to end: /split 3-end
+- Last pages: /split -3-end (last 3 pages)
+- Odd or even pages: /split odd, /split 1-10 even
+- Leave pages out: /split 1-end,!5
 - Mix formats: /split 1-3,5,7-end
+- Several files: /split 1-10;11-20;21-end
+- Equal parts: /split every 5
 
 <b>Examples:</b>
 /split 1-3 → Extract pages 1, 2, 3
@@ -154,6 +160,7 @@ Convert each PDF page to an image file.
 <b>How to use:</b>
 - Send 1 PDF file
 - Type: /toimage, /topng, or /tojpg
+- Optionally pick pages: /toimage 1-5, /tojpg odd
 - Receive images (PNG format default)
 
 <b>Example:</b>
@@ -414,8 +421,9 @@ async def daily_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         return
     
-    # Get daily statistics
-    stats = analytics.get_daily_statistics()
+    # Get daily statistics (flushes pending events and queries the database, so off the event loop)
+    loop = asyncio.get_running_loop()
+    stats = await loop.run_in_executor(None, analytics.get_daily_statistics)
     
     # Format top 3 users
     top_users_text = ""
@@ -496,8 +504,9 @@ async def weekly_stats_command(update: Update, context: ContextTypes.DEFAULT_TYP
         )
         return
     
-    # Get weekly statistics
-    stats = analytics.get_weekly_statistics()
+    # Get weekly statistics (flushes pending events and queries the database, so off the event loop)
+    loop = asyncio.get_running_loop()
+    stats = await loop.run_in_executor(None, analytics.get_weekly_statistics)
     
     # Format weekly breakdown
     weekly_breakdown = ""
@@ -562,4 +571,87 @@ Last updated: {stats['last_updated']}
     await update.message.reply_text(
         stats_message,
         parse_mode='HTML'
-    )
\ No newline at end of file
+    )
+
+
+async def queue_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Handle /queuestats command - Show worker pool queue depth and cache stats (admin only).
+    
+    Args:
+        update: Telegram update object
+        context: Telegram context object
+    """
+    user_id = update.effective_user.id
+    
+    # Check if user is admin
+    if user_id not in config.ADMIN_USER_IDS:
+        await update.message.reply_text(
+            "⚠️ This command is only available to bot administrators.",
+            parse_mode='HTML'
+        )
+        return
+    
+    depth = pdf_executor.queue_depth()
+    queue = job_scheduler.stats()
+    cache = result_cache.stats()
+    reuse = file_manager.cache_stats()
+    
+    if bot_persistence is not None:
+        sessions = bot_persistence.stats()
+        sessions_text = (
+            f"- Backend: {config.PERSISTENCE}\n"
+            f"- Stored sessions: {sessions['sessions']} ({sessions['pending']} pending)\n"
+            f"- Batch writes: {sessions['writes']} / Store re-reads: {sessions['reads']}"
+        )
+    else:
+        sessions_text = "- Backend: memory only"
+    
+    # Format per-operation breakdown
+    if depth['operations']:
+        operations_text = "\n".join([
+            f"• {name}: {counts['running']} running, {counts['waiting']} waiting"
+            for name, counts in sorted(depth['operations'].items())
+        ])
+    else:
+        operations_text = "No active jobs."
+    
+    stats_message = f"""
+⚙️ <b>Worker Pool Status</b>
+
+- Pool: {depth['pool_type']} ({depth['max_workers']} workers)
+- Running: {depth['running']}
+- Waiting: {depth['waiting']}
+
+━━━━━━━━━━━━━━━━━━━━━
+
+<b>🚦 Job Queue:</b>
+- Running: {queue['running']}/{queue['max_running']}
+- Queued: {queue['queued']} (limit {queue['max_queued']})
+- Waiting users: {queue['waiting_users']}
+
+━━━━━━━━━━━━━━━━━━━━━
+
+<b>💾 Result Cache:</b>
+- Status: {'enabled' if cache['enabled'] else 'disabled'}
+- Hits: {cache['hits']} / Misses: {cache['misses']} ({cache['hit_rate']:.1f}% hit rate)
+- Entries: {cache['entries']} ({cache['size_mb']:.1f}/{cache['max_size_mb']:.0f} MB)
+- Evictions: {cache['evictions']}
+
+<b>♻️ Telegram File Reuse:</b>
+- Downloads skipped: {reuse['download_hits']} ({reuse['cached_downloads']} files, {reuse['cached_downloads_mb']:.1f} MB cached)
+- Uploads skipped: {reuse['upload_hits']} ({reuse['known_file_ids']} known file_ids)
+
+<b>🗂 Sessions:</b>
+{sessions_text}
+
+━━━━━━━━━━━━━━━━━━━━━
+
+<b>🔧 By Operation:</b>
+{operations_text}
+"""
+    
+    await update.message.reply_text(
+        stats_message,
+        parse_mode='HTML'
+    )
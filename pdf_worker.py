@@ -0,0 +1,108 @@
+"""
+PDF worker for PDF Telegram Bot.
+Runs PDF jobs submitted by the bot through the job broker (config.JOB_BROKER),
+so PDF processing can scale across processes and machines independently of the bot.
+
+Each worker runs one job at a time - start more workers to add capacity.
+Workers must share TEMP_DIR with the bot, since jobs refer to files by path.
+
+Usage:
+    JOB_BROKER=redis python pdf_worker.py
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+
+import config
+from utils.broker import job_broker
+from utils.executor import _init_worker, _run_operation
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger("pdf_worker")
+
+
+class PDFWorker:
+    """Claims jobs from the broker and runs them until told to stop."""
+    
+    def __init__(self, broker=job_broker):
+        """
+        Initialize the worker.
+        
+        Args:
+            broker: Job broker to claim jobs from
+        """
+        self.broker = broker
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.running = True
+        self.jobs_done = 0
+    
+    def stop(self, *_) -> None:
+        """Finish the current job, then exit (SIGINT/SIGTERM handler)."""
+        logger.info("Stop requested, finishing current job...")
+        self.running = False
+    
+    def run_job(self, job_id: str, operation: str, args: tuple, kwargs: dict) -> None:
+        """
+        Run one job and report its outcome to the broker.
+        
+        Args:
+            job_id: Job ID
+            operation: PDFOperations method name
+            args: Positional arguments
+            kwargs: Keyword arguments
+        """
+        started = time.time()
+        try:
+            result = _run_operation(operation, args, kwargs)
+        except Exception as e:
+            logger.warning(f"Job {job_id} ({operation}) failed: {e}")
+            self.broker.complete(job_id, error=e)
+        else:
+            self.broker.complete(job_id, result=result)
+            logger.info(f"Job {job_id} ({operation}) done in {time.time() - started:.1f}s")
+        self.jobs_done += 1
+    
+    def run(self) -> None:
+        """Claim and run jobs until stopped."""
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        
+        logger.info(f"PDF worker {self.worker_id} waiting for jobs ({self.broker.name} broker)")
+        while self.running:
+            try:
+                job = self.broker.claim(self.worker_id)
+            except Exception as e:
+                logger.error(f"Broker unavailable: {e}")
+                time.sleep(5)
+                continue
+            
+            if job is None:
+                time.sleep(config.JOB_POLL_INTERVAL)
+                continue
+            
+            self.run_job(*job)
+        
+        logger.info(f"PDF worker {self.worker_id} stopped after {self.jobs_done} jobs")
+
+
+def main():
+    """Start a worker."""
+    if job_broker is None:
+        print("❌ JOB_BROKER is not set - the bot runs PDF jobs itself, no worker needed.")
+        print("   Set JOB_BROKER=sqlite, redis or postgres for both the bot and its workers.")
+        sys.exit(1)
+    
+    config.TEMP_DIR.mkdir(parents=True, exist_ok=True)
+    _init_worker()
+    PDFWorker().run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+"""
+Shared test setup for PDF Telegram Bot.
+Makes the bot's top-level modules (config, utils, handlers) importable from the tests.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,66 @@
+"""
+Tests for ZIP volume splitting (utils/archive.py).
+"""
+
+import os
+import zipfile
+
+from utils.archive import StreamingZipWriter
+
+
+def make_files(directory, count, size, suffix=".png"):
+    paths = []
+    for index in range(count):
+        path = directory / f"page_{index + 1}{suffix}"
+        path.write_bytes(os.urandom(size))  # Incompressible, like real images
+        paths.append(path)
+    return paths
+
+
+def test_volumes_stay_under_limit(tmp_path):
+    files = make_files(tmp_path, 10, 30_000)
+    writer = StreamingZipWriter(tmp_path, "images", max_volume_size=100_000)
+    
+    completed = [writer.add(path) for path in files]
+    completed.append(writer.close())
+    
+    assert len(writer.volumes) == 4
+    assert [path for path in completed if path] == writer.volumes
+    assert writer.file_counts == [3, 3, 3, 1]
+    
+    names = []
+    for volume in writer.volumes:
+        assert volume.name.startswith("images_part")
+        assert volume.stat().st_size <= 100_000
+        with zipfile.ZipFile(volume) as archive:
+            assert archive.testzip() is None
+            names.extend(archive.namelist())
+    assert names == [path.name for path in files]
+
+
+def test_oversized_file_gets_its_own_volume(tmp_path):
+    small, = make_files(tmp_path, 1, 1_000)
+    large = tmp_path / "large.png"
+    large.write_bytes(os.urandom(50_000))
+    
+    writer = StreamingZipWriter(tmp_path, "images", max_volume_size=20_000)
+    assert writer.add(small) is None
+    assert writer.add(large) == writer.volumes[0]
+    writer.close()
+    
+    assert writer.file_counts == [1, 1]
+
+
+def test_compression_by_extension(tmp_path):
+    text = tmp_path / "notes.txt"
+    text.write_text("page " * 10_000)
+    image, = make_files(tmp_path, 1, 1_000)
+    
+    writer = StreamingZipWriter(tmp_path, "mixed")
+    writer.add(text)
+    writer.add(image, arcname="renamed.png")
+    writer.close()
+    
+    with zipfile.ZipFile(writer.volumes[0]) as archive:
+        assert archive.getinfo("notes.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert archive.getinfo("renamed.png").compress_type == zipfile.ZIP_STORED
@@ -0,0 +1,73 @@
+"""
+Tests for page specification parsing (utils/page_spec.py).
+"""
+
+import pytest
+
+from utils.page_spec import PageSpec
+
+
+@pytest.mark.parametrize("spec, pages", [
+    ("5", [5]),
+    ("1-3,7", [1, 2, 3, 7]),
+    ("1..3", [1, 2, 3]),
+    ("8-end", [8, 9, 10]),
+    ("-1", [10]),
+    ("-3-end", [8, 9, 10]),
+    ("end-2", [8]),
+    ("odd", [1, 3, 5, 7, 9]),
+    ("even", [2, 4, 6, 8, 10]),
+    ("2-7 odd", [3, 5, 7]),
+    ("1-end,!4", [1, 2, 3, 5, 6, 7, 8, 9, 10]),
+    ("!even", [1, 3, 5, 7, 9]),
+    ("!1-8", [9, 10]),
+    ("3,1,2,2", [1, 2, 3]),
+    ("7-50", [7, 8, 9, 10]),
+    (" 1 - 2 , , 4 ", [1, 2, 4]),
+])
+def test_parse(spec, pages):
+    page_spec = PageSpec.parse(spec, 10)
+    assert list(page_spec) == pages
+    assert len(page_spec) == len(pages)
+    assert all(page in page_spec for page in pages)
+    assert not any(page in page_spec for page in range(0, 12) if page not in pages)
+
+
+@pytest.mark.parametrize("spec", ["", "abc", "0", "11", "5-3", "1-2-3", "!1-10"])
+def test_parse_rejects(spec):
+    with pytest.raises(ValueError):
+        PageSpec.parse(spec, 10)
+
+
+def test_large_range_stays_compact():
+    page_spec = PageSpec.parse("1-999999999,!500000000", 1_000_000_000)
+    assert len(page_spec.intervals) == 2
+    assert len(page_spec) == 999_999_998
+    assert 500_000_000 not in page_spec
+    assert 999_999_999 in page_spec
+    assert (page_spec.first, page_spec.last) == (1, 999_999_999)
+
+
+@pytest.mark.parametrize("spec, description", [
+    ("1-3,7", "1-3,7"),
+    ("3,2,1", "1-3"),
+    ("odd", "1-9 odd"),
+    ("1-end,!4", "1-3,5-10"),
+    ("1-4,3-6 even", "1-4,6"),
+    ("1-4,5-6 odd", "1-5"),
+])
+def test_describe_round_trips(spec, description):
+    page_spec = PageSpec.parse(spec, 10)
+    assert page_spec.describe() == description
+    assert PageSpec.parse(description, 10) == page_spec
+
+
+def test_runs():
+    page_spec = PageSpec.parse("1-5,8,2-10 even", 10)
+    assert list(page_spec.runs()) == [(1, 6), (8, 8), (10, 10)]
+    assert list(PageSpec.parse("1-7", 10).runs(max_pages=3)) == [(1, 3), (4, 6), (7, 7)]
+
+
+def test_all():
+    assert list(PageSpec.all(3)) == [1, 2, 3]
+    assert not PageSpec.all(0)
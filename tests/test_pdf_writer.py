@@ -0,0 +1,64 @@
+"""
+Tests for the streaming image PDF writer (utils/pdf_writer.py).
+The output is opened without recovery, so a broken cross-reference table fails the test.
+"""
+
+import io
+
+import pikepdf
+import pytest
+from PIL import Image
+
+from utils.pdf_writer import StreamingPDFWriter
+
+
+def jpeg_page(writer, width, height, color, **kwargs):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, "JPEG")
+    data = buffer.getvalue()
+    writer.add_image_page(
+        {'Width': str(width), 'Height': str(height), 'ColorSpace': '/DeviceRGB',
+         'BitsPerComponent': '8', 'Filter': '/DCTDecode'},
+        lambda output: output.write(data),
+        **kwargs
+    )
+
+
+def test_pages_are_valid(tmp_path):
+    output = tmp_path / "out.pdf"
+    with StreamingPDFWriter(output) as writer:
+        jpeg_page(writer, 80, 60, "red", page_width=80, page_height=60)
+        jpeg_page(writer, 40, 90, "blue", page_width=595, page_height=842, rotate=90,
+                  placement=(10, 20, 40, 90))
+        assert writer.page_count == 2
+    
+    with pikepdf.open(output, attempt_recovery=False) as pdf:
+        assert len(pdf.pages) == 2
+        
+        first, second = pdf.pages
+        assert [float(value) for value in first.MediaBox] == [0, 0, 80, 60]
+        assert "/Rotate" not in first
+        assert int(second.Rotate) == 90
+        
+        image = pikepdf.PdfImage(second.Resources.XObject.Im0)
+        assert (image.width, image.height) == (40, 90)
+        assert image.as_pil_image().getpixel((20, 45))[2] > 200
+        assert b"40.00 0 0 90.00 10.00 20.00 cm" in second.Contents.read_bytes()
+
+
+def test_empty_document_is_valid(tmp_path):
+    output = tmp_path / "empty.pdf"
+    StreamingPDFWriter(output).close()
+    
+    with pikepdf.open(output, attempt_recovery=False) as pdf:
+        assert len(pdf.pages) == 0
+
+
+def test_error_removes_partial_file(tmp_path):
+    output = tmp_path / "partial.pdf"
+    with pytest.raises(RuntimeError):
+        with StreamingPDFWriter(output) as writer:
+            jpeg_page(writer, 10, 10, "red", page_width=10, page_height=10)
+            raise RuntimeError("conversion failed")
+    
+    assert not output.exists()
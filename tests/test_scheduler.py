@@ -0,0 +1,152 @@
+"""
+Tests for job admission and round-robin dispatch (utils/scheduler.py).
+"""
+
+import asyncio
+
+import pytest
+
+from utils.scheduler import JobScheduler, QueueFullError, RateLimitError
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch):
+    monkeypatch.setattr("config.ENABLE_RATE_LIMITING", False)
+
+
+async def hold(scheduler, user_id, operation, started, release):
+    async with scheduler.slot(user_id, operation):
+        started.append(f"{user_id}:{operation}")
+        await release.wait()
+
+
+def test_queue_full():
+    async def main():
+        scheduler = JobScheduler(max_running=1, max_queued=2)
+        release = asyncio.Event()
+        started = []
+        tasks = [asyncio.create_task(hold(scheduler, user_id, "merge_pdfs", started, release)) for user_id in (1, 2)]
+        await asyncio.sleep(0)
+        
+        with pytest.raises(QueueFullError):
+            async with scheduler.slot(3, "merge_pdfs"):
+                pass
+        assert scheduler.stats()['queued'] == 1
+        assert scheduler.stats()['running'] == 1
+        
+        release.set()
+        await asyncio.gather(*tasks)
+        assert started == ["1:merge_pdfs", "2:merge_pdfs"]
+        assert scheduler.stats()['running'] == 0
+    
+    asyncio.run(main())
+
+
+def test_operation_queue_limit(monkeypatch):
+    monkeypatch.setattr("config.MAX_QUEUED_PER_OPERATION", {"pdf_to_images": 1})
+    
+    async def main():
+        scheduler = JobScheduler(max_running=4, max_queued=10)
+        release = asyncio.Event()
+        task = asyncio.create_task(hold(scheduler, 1, "pdf_to_images", [], release))
+        await asyncio.sleep(0)
+        
+        with pytest.raises(QueueFullError):
+            async with scheduler.slot(2, "pdf_to_images"):
+                pass
+        async with scheduler.slot(2, "merge_pdfs"):
+            pass
+        
+        release.set()
+        await task
+    
+    asyncio.run(main())
+
+
+def test_rate_limit(monkeypatch):
+    monkeypatch.setattr("config.ENABLE_RATE_LIMITING", True)
+    monkeypatch.setattr("config.MAX_OPERATIONS_PER_MINUTE", 2)
+    
+    async def main():
+        scheduler = JobScheduler(max_running=1, max_queued=10)
+        for _ in range(2):
+            async with scheduler.slot(1, "merge_pdfs"):
+                pass
+        
+        with pytest.raises(RateLimitError):
+            async with scheduler.slot(1, "merge_pdfs"):
+                pass
+        async with scheduler.slot(2, "merge_pdfs"):
+            pass
+    
+    asyncio.run(main())
+
+
+def test_round_robin_between_users():
+    async def main():
+        scheduler = JobScheduler(max_running=1, max_queued=10)
+        release = asyncio.Event()
+        started = []
+        
+        # User 1 queues three jobs before user 2 queues one
+        tasks = []
+        for user_id, operation in ((1, "a"), (1, "b"), (1, "c"), (2, "a")):
+            tasks.append(asyncio.create_task(hold(scheduler, user_id, operation, started, release)))
+            await asyncio.sleep(0)
+        
+        assert started == ["1:a"]
+        release.set()
+        await asyncio.gather(*tasks)
+        assert started == ["1:a", "1:b", "2:a", "1:c"]
+    
+    asyncio.run(main())
+
+
+def test_position():
+    async def main():
+        scheduler = JobScheduler(max_running=1, max_queued=10)
+        release = asyncio.Event()
+        positions = []
+        
+        async def report(position):
+            positions.append(position)
+        
+        blocker = asyncio.create_task(hold(scheduler, 1, "merge_pdfs", [], release))
+        await asyncio.sleep(0)
+        queued = [asyncio.create_task(hold(scheduler, 1, "merge_pdfs", [], release)) for _ in range(2)]
+        await asyncio.sleep(0)
+        
+        async def watched():
+            async with scheduler.slot(2, "merge_pdfs", on_position=report):
+                pass
+        
+        task = asyncio.create_task(watched())
+        await asyncio.sleep(0)
+        assert positions == [2]  # After user 1's next job, before their last one
+        
+        release.set()
+        await asyncio.gather(blocker, task, *queued)
+        assert positions == [2, 0]
+    
+    asyncio.run(main())
+
+
+def test_cancelled_job_leaves_queue():
+    async def main():
+        scheduler = JobScheduler(max_running=1, max_queued=10)
+        release = asyncio.Event()
+        blocker = asyncio.create_task(hold(scheduler, 1, "merge_pdfs", [], release))
+        waiting = asyncio.create_task(hold(scheduler, 2, "merge_pdfs", [], release))
+        await asyncio.sleep(0)
+        assert scheduler.stats()['queued'] == 1
+        
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert scheduler.stats()['queued'] == 0
+        assert scheduler.stats()['waiting_users'] == 0
+        
+        release.set()
+        await blocker
+        assert scheduler.stats()['running'] == 0
+    
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+"""
+Smoke test for webhook mode: one update goes through the HTTP endpoint to a handler.
+A local stand-in Bot API server answers the calls the bot makes on startup.
+"""
+
+import os
+import json
+import time
+import signal
+import socket
+import asyncio
+import threading
+import urllib.request
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application, MessageHandler, filters
+
+from utils import UserSerialUpdateProcessor
+from utils.webhook_server import WebhookServer, SECRET_TOKEN_HEADER
+
+TOKEN = "123456:TEST"
+SECRET = "test-secret"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_bot_api(port: int) -> None:
+    """Serve getMe and setWebhook on a thread with its own event loop."""
+    async def handle(request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        if method == 'getMe':
+            result = {'id': 123456, 'is_bot': True, 'first_name': 'Test', 'username': 'test_bot'}
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+    
+    app = web.Application()
+    app.router.add_post(f"/bot{TOKEN}/{{method}}", handle)
+    started = threading.Event()
+    
+    def serve() -> None:
+        loop = asyncio.new_event_loop()
+        runner = web.AppRunner(app)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+        started.set()
+        loop.run_forever()
+    
+    threading.Thread(target=serve, daemon=True).start()
+    started.wait(5)
+
+
+def post_update_when_ready(port: int) -> None:
+    """Wait for /health, then post one message update with the secret token."""
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            with urllib.request.urlopen(f"{base}/health") as response:
+                if response.status == 200:
+                    break
+        except OSError:
+            pass
+        time.sleep(0.05)
+    
+    update = {
+        'update_id': 1,
+        'message': {
+            'message_id': 1,
+            'date': int(time.time()),
+            'chat': {'id': 42, 'type': 'private'},
+            'from': {'id': 42, 'is_bot': False, 'first_name': 'User'},
+            'text': 'hello'
+        }
+    }
+    request = urllib.request.Request(
+        f"{base}/telegram",
+        data=json.dumps(update).encode(),
+        headers={'Content-Type': 'application/json', SECRET_TOKEN_HEADER: SECRET}
+    )
+    urllib.request.urlopen(request).close()
+
+
+def test_webhook_update_reaches_handler(monkeypatch):
+    api_port = free_port()
+    webhook_port = free_port()
+    start_fake_bot_api(api_port)
+    monkeypatch.setattr("config.WEBHOOK_URL", "https://example.com")
+    
+    # A fresh process has a default loop; earlier tests' asyncio.run calls unset it
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    
+    # Built before the server runs, exactly like bot.py does
+    application = (
+        Application.builder()
+        .token(TOKEN)
+        .base_url(f"http://127.0.0.1:{api_port}/bot")
+        .concurrent_updates(UserSerialUpdateProcessor(4))
+        .build()
+    )
+    received = []
+    
+    async def on_message(update: Update, context) -> None:
+        received.append(update.message.text)
+        os.kill(os.getpid(), signal.SIGTERM)  # Stops WebhookServer.run
+    
+    application.add_handler(MessageHandler(filters.TEXT, on_message))
+    
+    sender = threading.Thread(target=post_update_when_ready, args=(webhook_port,), daemon=True)
+    sender.start()
+    
+    # Stop the server even if the update never reaches the handler
+    watchdog = threading.Timer(15, os.kill, (os.getpid(), signal.SIGTERM))
+    watchdog.start()
+    
+    server = WebhookServer(application, listen="127.0.0.1", port=webhook_port, path="/telegram", secret_token=SECRET)
+    try:
+        server.run()
+    finally:
+        watchdog.cancel()
+        asyncio.set_event_loop(None)
+        loop.close()
+    
+    assert received == ['hello']
+    assert server.received == 1
+    assert server.rejected == 0
@@ -2,16 +2,55 @@
 Utilities package for PDF Telegram Bot.
 """
 
-from .file_manager import file_manager, FileManager, cleanup_scheduler
+from .file_manager import (
+    file_manager,
+    FileManager,
+    PendingFile,
+    cleanup_scheduler,
+    download_progress_updater
+)
 from .pdf_operations import pdf_ops, PDFOperations
+from .page_spec import PageSpec
+from .compression_planner import compression_planner, CompressionPlanner
+from .archive import StreamingZipWriter
+from .pdf_writer import StreamingPDFWriter
+from .image_encoder import image_encoder, ImageEncoder
+from .result_cache import result_cache, ResultCache
+from .media_group import media_groups, MediaGroupCollector
 from .analytics import analytics, Analytics
+from .executor import pdf_executor, PDFExecutor
+from .scheduler import job_scheduler, JobScheduler, SchedulerError, queue_position_updater
+from .persistence import bot_persistence, BotPersistence
+from .update_processor import UserSerialUpdateProcessor
 
 __all__ = [
     'file_manager',
     'FileManager',
+    'PendingFile',
     'cleanup_scheduler',
+    'download_progress_updater',
     'pdf_ops',
     'PDFOperations',
+    'PageSpec',
+    'compression_planner',
+    'CompressionPlanner',
+    'StreamingZipWriter',
+    'StreamingPDFWriter',
+    'image_encoder',
+    'ImageEncoder',
+    'result_cache',
+    'ResultCache',
+    'media_groups',
+    'MediaGroupCollector',
     'analytics',
-    'Analytics'
+    'Analytics',
+    'pdf_executor',
+    'PDFExecutor',
+    'job_scheduler',
+    'JobScheduler',
+    'SchedulerError',
+    'queue_position_updater',
+    'bot_persistence',
+    'BotPersistence',
+    'UserSerialUpdateProcessor'
 ]
\ No newline at end of file
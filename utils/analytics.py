@@ -1,23 +1,32 @@
 """
 Analytics utilities for PDF Telegram Bot.
 Tracks user activity and generates statistics using PostgreSQL (Neon DB).
+Activity events are buffered in memory and written in batches by a background task.
 """
 
 import os
+import asyncio
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from psycopg2 import pool
+from collections import deque
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from telegram import User
 import calendar
 
+import config
+
 
 class Analytics:
     """Handles user activity tracking and statistics with PostgreSQL (Neon DB)."""
     
     def __init__(self):
         """Initialize analytics with PostgreSQL connection pool."""
+        self._events = deque(maxlen=config.ANALYTICS_QUEUE_SIZE)  # Pending activity events
+        self._flush_event: Optional[asyncio.Event] = None
+        self.dropped_events = 0
+        
         self.database_url = os.getenv('DATABASE_URL')
         if not self.database_url:
             print("⚠️  WARNING: DATABASE_URL not found. Analytics will be disabled.")
@@ -126,6 +135,7 @@ class Analytics:
     def track_user(self, user: User, operation: str) -> None:
         """
         Track user activity.
+        Only buffers the event; it is written by the background writer.
         
         Args:
             user: Telegram User object
@@ -134,48 +144,146 @@ class Analytics:
         if not self.enabled:
             return
         
+        if len(self._events) == self._events.maxlen:
+            self.dropped_events += 1  # Oldest event is discarded
+        
+        self._events.append((
+            user.id,
+            user.username,
+            user.first_name,
+            user.last_name,
+            operation,
+            datetime.now()
+        ))
+        
+        # Wake the writer early once a full batch is waiting
+        if self._flush_event and len(self._events) >= config.ANALYTICS_BATCH_SIZE:
+            self._flush_event.set()
+    
+    def flush(self) -> int:
+        """
+        Write all buffered activity events to the database.
+        Uses one multi-row INSERT for operations and one aggregated upsert for users.
+        
+        Returns:
+            int: Number of events written
+        """
+        if not self.enabled or not self._events:
+            return 0
+        
+        # Drain buffer (deque pops are thread-safe)
+        events = []
+        while self._events:
+            try:
+                events.append(self._events.popleft())
+            except IndexError:
+                break
+        
+        # Aggregate per user so each row is upserted once
+        users = {}
+        for user_id, username, first_name, last_name, operation, timestamp in events:
+            day = timestamp.date()
+            if user_id in users:
+                entry = users[user_id]
+                entry['first_seen'] = min(entry['first_seen'], day)
+                entry['last_seen'] = max(entry['last_seen'], day)
+                entry['username'] = username
+                entry['first_name'] = first_name
+                entry['last_name'] = last_name
+                entry['count'] += 1
+            else:
+                users[user_id] = {
+                    'username': username,
+                    'first_name': first_name,
+                    'last_name': last_name,
+                    'first_seen': day,
+                    'last_seen': day,
+                    'count': 1
+                }
+        
         conn = None
         try:
             conn = self._get_connection()
             if not conn:
-                return
+                raise Exception("No database connection available")
             
             cursor = conn.cursor()
-            today = datetime.now().date()
             
-            # Insert or update user
-            cursor.execute("""
+            # Insert or update users
+            execute_values(cursor, """
                 INSERT INTO users (user_id, username, first_name, last_name, first_seen, last_seen, total_operations)
-                VALUES (%s, %s, %s, %s, %s, %s, 1)
+                VALUES %s
                 ON CONFLICT (user_id) 
                 DO UPDATE SET
                     username = EXCLUDED.username,
                     first_name = EXCLUDED.first_name,
                     last_name = EXCLUDED.last_name,
-                    last_seen = EXCLUDED.last_seen,
-                    total_operations = users.total_operations + 1
-            """, (user.id, user.username, user.first_name, user.last_name, today, today))
-            
-            # Insert operation record
-            cursor.execute("""
-                INSERT INTO operations (user_id, operation_type)
-                VALUES (%s, %s)
-            """, (user.id, operation))
+                    last_seen = GREATEST(users.last_seen, EXCLUDED.last_seen),
+                    total_operations = users.total_operations + EXCLUDED.total_operations
+            """, [
+                (user_id, u['username'], u['first_name'], u['last_name'],
+                 u['first_seen'], u['last_seen'], u['count'])
+                for user_id, u in users.items()
+            ], page_size=1000)
+            
+            # Insert operation records
+            execute_values(cursor, """
+                INSERT INTO operations (user_id, operation_type, timestamp)
+                VALUES %s
+            """, [
+                (user_id, operation, timestamp)
+                for user_id, _, _, _, operation, timestamp in events
+            ], page_size=1000)
             
             conn.commit()
             cursor.close()
+            return len(events)
         
         except Exception as e:
-            print(f"Error tracking user: {e}")
+            print(f"Error writing analytics batch of {len(events)} events: {e}")
             if conn:
                 conn.rollback()
+            
+            # Put events back for the next flush. Events tracked meanwhile are newer and stay;
+            # if the buffer can't hold both, the oldest of the failed batch are dropped
+            overflow = max(0, len(self._events) + len(events) - self._events.maxlen)
+            self.dropped_events += min(overflow, len(events))
+            self._events.extendleft(reversed(events[overflow:]))
+            return 0
         finally:
             if conn:
                 self._return_connection(conn)
     
+    async def run_writer(self) -> None:
+        """
+        Background task that flushes buffered events to the database
+        every config.ANALYTICS_FLUSH_INTERVAL seconds or once a batch is full.
+        Database work runs in a thread so the event loop never waits on it.
+        """
+        if not self.enabled:
+            return
+        
+        self._flush_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._flush_event.wait(),
+                    timeout=config.ANALYTICS_FLUSH_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+            
+            self._flush_event.clear()
+            
+            if self._events:
+                await loop.run_in_executor(None, self.flush)
+    
     def get_daily_statistics(self) -> dict:
         """
         Get daily statistics including unique users, operations, top 3 users, and recent 10 users.
+        Blocks on the database (and flushes pending events), so call it from a worker thread.
         
         Returns:
             dict: Daily statistics
@@ -183,6 +291,9 @@ class Analytics:
         if not self.enabled:
             return self._empty_daily_stats()
         
+        # Write pending events first so stats are up to date
+        self.flush()
+        
         conn = None
         try:
             conn = self._get_connection()
@@ -289,6 +400,7 @@ class Analytics:
     def get_weekly_statistics(self) -> dict:
         """
         Get weekly statistics for the current month, including week-by-week breakdown.
+        Blocks on the database (and flushes pending events), so call it from a worker thread.
         
         Returns:
             dict: Weekly statistics
@@ -296,6 +408,9 @@ class Analytics:
         if not self.enabled:
             return self._empty_weekly_stats()
         
+        # Write pending events first so stats are up to date
+        self.flush()
+        
         conn = None
         try:
             conn = self._get_connection()
@@ -0,0 +1,110 @@
+"""
+Archive utilities for PDF Telegram Bot.
+Builds ZIP files incrementally and splits them into volumes that fit Telegram's upload limit.
+"""
+
+import zipfile
+from pathlib import Path
+from typing import List, Optional
+
+import config
+
+
+# Formats that are already compressed - deflating them again only burns CPU
+STORED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.pdf', '.zip')
+
+# ZIP overhead estimates (bytes): local header + central directory entry + end record
+_LOCAL_HEADER_SIZE = 30
+_CENTRAL_ENTRY_SIZE = 46
+_END_RECORD_SIZE = 22
+
+
+class StreamingZipWriter:
+    """Appends files to ZIP volumes as they are produced."""
+    
+    def __init__(
+        self,
+        output_dir: Path,
+        base_name: str,
+        max_volume_size: int = config.MAX_FILE_SIZE
+    ):
+        """
+        Initialize the writer. Volumes are named <base_name>_part<N>.zip.
+        
+        Args:
+            output_dir: Directory where volumes are written
+            base_name: Volume name prefix
+            max_volume_size: Maximum size of one volume in bytes
+        """
+        self.output_dir = output_dir
+        self.base_name = base_name
+        self.max_volume_size = max_volume_size
+        self.volumes: List[Path] = []
+        self.file_counts: List[int] = []
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._central_size = 0  # Bytes the central directory will need
+    
+    def _open_volume(self) -> None:
+        """Start a new ZIP volume."""
+        volume_path = self.output_dir / f"{self.base_name}_part{len(self.volumes) + 1}.zip"
+        self._zip = zipfile.ZipFile(volume_path, 'w')
+        self._central_size = 0
+        self.volumes.append(volume_path)
+        self.file_counts.append(0)
+    
+    def _close_volume(self) -> Optional[Path]:
+        """Finish the current ZIP volume."""
+        if self._zip is None:
+            return None
+        self._zip.close()
+        self._zip = None
+        return self.volumes[-1]
+    
+    def add(self, file_path: Path, arcname: Optional[str] = None) -> Optional[Path]:
+        """
+        Append a file to the archive, starting a new volume if it would not fit.
+        
+        Args:
+            file_path: File to add
+            arcname: Name inside the archive (defaults to the file name)
+        
+        Returns:
+            Optional[Path]: Path of a volume that was completed by this call, if any
+        """
+        arcname = arcname or file_path.name
+        name_size = len(arcname.encode('utf-8'))
+        file_size = file_path.stat().st_size
+        completed = None
+        
+        if self._zip is not None and self.file_counts[-1] > 0:
+            projected = (
+                self._zip.fp.tell()
+                + _LOCAL_HEADER_SIZE + name_size + file_size
+                + self._central_size + _CENTRAL_ENTRY_SIZE + name_size
+                + _END_RECORD_SIZE
+            )
+            if projected > self.max_volume_size:
+                completed = self._close_volume()
+        
+        if self._zip is None:
+            self._open_volume()
+        
+        if file_path.suffix.lower() in STORED_EXTENSIONS:
+            compression = zipfile.ZIP_STORED
+        else:
+            compression = zipfile.ZIP_DEFLATED
+        
+        self._zip.write(file_path, arcname, compress_type=compression)
+        self._central_size += _CENTRAL_ENTRY_SIZE + name_size
+        self.file_counts[-1] += 1
+        
+        return completed
+    
+    def close(self) -> Optional[Path]:
+        """
+        Finish the archive.
+        
+        Returns:
+            Optional[Path]: Path of the last volume, if one was open
+        """
+        return self._close_volume()
@@ -0,0 +1,560 @@
+"""
+Job broker for PDF Telegram Bot.
+Carries PDFOperations calls from the bot front-end to separate worker processes (pdf_worker.py)
+and their results back, through SQLite (single host), Redis or PostgreSQL.
+"""
+
+import json
+import time
+import uuid
+import sqlite3
+import builtins
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+import config
+
+try:
+    import redis
+except ImportError:  # Only needed for JOB_BROKER=redis
+    redis = None
+
+
+class RemoteOperationError(Exception):
+    """Raised on the front-end when a worker's operation failed with a non-builtin error."""
+
+
+def encode_value(value: Any) -> Any:
+    """
+    Make a PDFOperations argument or result JSON-safe, keeping Paths and tuples.
+    
+    Args:
+        value: Value to encode
+        
+    Returns:
+        Any: JSON-serializable value
+    """
+    if isinstance(value, Path):
+        return {'__path__': str(value)}
+    if isinstance(value, tuple):
+        return {'__tuple__': [encode_value(item) for item in value]}
+    if isinstance(value, list):
+        return [encode_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: encode_value(item) for key, item in value.items()}
+    return value
+
+
+def decode_value(value: Any) -> Any:
+    """
+    Reverse encode_value.
+    
+    Args:
+        value: Value produced by encode_value
+        
+    Returns:
+        Any: Original value
+    """
+    if isinstance(value, list):
+        return [decode_value(item) for item in value]
+    if isinstance(value, dict):
+        if '__path__' in value:
+            return Path(value['__path__'])
+        if '__tuple__' in value:
+            return tuple(decode_value(item) for item in value['__tuple__'])
+        return {key: decode_value(item) for key, item in value.items()}
+    return value
+
+
+def encode_error(error: Exception) -> str:
+    """Serialize an exception raised by an operation."""
+    return json.dumps({'type': type(error).__name__, 'message': str(error)})
+
+
+def decode_error(error: str) -> Exception:
+    """
+    Rebuild an exception reported by a worker.
+    Builtin types (ValueError, FileNotFoundError, ...) are restored so handlers
+    can keep catching them; anything else becomes RemoteOperationError.
+    """
+    data = json.loads(error)
+    error_type = getattr(builtins, data['type'], None)
+    if isinstance(error_type, type) and issubclass(error_type, Exception):
+        return error_type(data['message'])
+    return RemoteOperationError(f"{data['type']}: {data['message']}")
+
+
+class JobBroker(ABC):
+    """
+    Interface shared by all brokers.
+    
+    Job lifecycle: queued -> running -> done/failed. The front-end submits a job,
+    polls pop_result() until it returns something, and cancels on timeout.
+    """
+    
+    name = "base"
+    
+    @abstractmethod
+    def submit(self, operation: str, args: tuple, kwargs: dict) -> str:
+        """
+        Queue a PDFOperations call.
+        
+        Args:
+            operation: PDFOperations method name
+            args: Positional arguments
+            kwargs: Keyword arguments
+            
+        Returns:
+            str: Job ID
+        """
+    
+    @abstractmethod
+    def claim(self, worker_id: str) -> Optional[Tuple[str, str, tuple, dict]]:
+        """
+        Take the oldest queued job (worker side). Jobs whose lease expired are requeued first.
+        
+        Args:
+            worker_id: Name of the claiming worker
+            
+        Returns:
+            Optional[Tuple[str, str, tuple, dict]]: (job ID, operation, args, kwargs), or None if idle
+        """
+    
+    @abstractmethod
+    def complete(self, job_id: str, result: Any = None, error: Optional[Exception] = None) -> None:
+        """
+        Store a job's result or error (worker side).
+        
+        Args:
+            job_id: Job ID
+            result: Value the operation returned
+            error: Exception the operation raised, if any
+        """
+    
+    @abstractmethod
+    def pop_result(self, job_id: str) -> Optional[Tuple[bool, Any]]:
+        """
+        Fetch and forget a finished job's outcome (front-end side).
+        
+        Args:
+            job_id: Job ID
+            
+        Returns:
+            Optional[Tuple[bool, Any]]: (True, result) or (False, exception), None while pending
+        """
+    
+    @abstractmethod
+    def cancel(self, job_id: str) -> None:
+        """
+        Forget a job the front-end stopped waiting for. Queued jobs are never started;
+        running ones finish but their result is discarded.
+        
+        Args:
+            job_id: Job ID
+        """
+    
+    @abstractmethod
+    def stats(self) -> dict:
+        """
+        Get queue statistics for monitoring.
+        
+        Returns:
+            dict: Queued and running job counts
+        """
+    
+    @staticmethod
+    def _payload(args: tuple, kwargs: dict) -> str:
+        """Serialize call arguments."""
+        return json.dumps({'args': encode_value(list(args)), 'kwargs': encode_value(kwargs)})
+    
+    @staticmethod
+    def _unpayload(payload: str) -> Tuple[tuple, dict]:
+        """Deserialize call arguments."""
+        data = json.loads(payload)
+        return tuple(decode_value(data['args'])), decode_value(data['kwargs'])
+
+
+class _SQLBroker(JobBroker):
+    """Shared logic for the SQLite and PostgreSQL brokers (one pdf_jobs table)."""
+    
+    placeholder = "?"
+    
+    @abstractmethod
+    def _connect(self):
+        """Open a connection (subclasses)."""
+    
+    def _release(self, conn) -> None:
+        """Release a connection (subclasses)."""
+        conn.close()
+    
+    def _execute(self, query: str, params: tuple = (), fetch: bool = False):
+        """Run one statement in its own transaction."""
+        query = query.replace("?", self.placeholder)
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall() if fetch else None
+            conn.commit()
+            return rows
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+    
+    def _create_table(self) -> None:
+        """Create the jobs table if needed."""
+        self._execute("""
+            CREATE TABLE IF NOT EXISTS pdf_jobs (
+                id TEXT PRIMARY KEY,
+                operation TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                worker TEXT,
+                created DOUBLE PRECISION NOT NULL,
+                claimed DOUBLE PRECISION
+            )
+        """)
+        self._execute("CREATE INDEX IF NOT EXISTS idx_pdf_jobs_status ON pdf_jobs(status, created)")
+    
+    def submit(self, operation: str, args: tuple, kwargs: dict) -> str:
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO pdf_jobs (id, operation, payload, status, created) VALUES (?, ?, ?, 'queued', ?)",
+            (job_id, operation, self._payload(args, kwargs), time.time())
+        )
+        return job_id
+    
+    def _requeue_expired(self) -> None:
+        """Put jobs from crashed workers back in the queue."""
+        self._execute(
+            "UPDATE pdf_jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND claimed < ?",
+            (time.time() - config.JOB_LEASE_TIMEOUT,)
+        )
+    
+    def complete(self, job_id: str, result: Any = None, error: Optional[Exception] = None) -> None:
+        if error is not None:
+            self._execute(
+                "UPDATE pdf_jobs SET status = 'failed', error = ? WHERE id = ?",
+                (encode_error(error), job_id)
+            )
+        else:
+            self._execute(
+                "UPDATE pdf_jobs SET status = 'done', result = ? WHERE id = ?",
+                (json.dumps(encode_value(result)), job_id)
+            )
+    
+    def pop_result(self, job_id: str) -> Optional[Tuple[bool, Any]]:
+        rows = self._execute(
+            "SELECT status, result, error FROM pdf_jobs WHERE id = ?",
+            (job_id,),
+            fetch=True
+        )
+        if not rows:
+            return False, RemoteOperationError("Job was lost by the broker")
+        
+        status, result, error = rows[0]
+        if status not in ('done', 'failed'):
+            return None
+        
+        self._execute("DELETE FROM pdf_jobs WHERE id = ?", (job_id,))
+        if status == 'failed':
+            return False, decode_error(error)
+        return True, decode_value(json.loads(result))
+    
+    def cancel(self, job_id: str) -> None:
+        self._execute("DELETE FROM pdf_jobs WHERE id = ?", (job_id,))
+    
+    def stats(self) -> dict:
+        rows = self._execute(
+            "SELECT status, COUNT(*) FROM pdf_jobs GROUP BY status",
+            fetch=True
+        )
+        counts = dict(rows)
+        return {'queued': counts.get('queued', 0), 'running': counts.get('running', 0)}
+
+
+class SQLiteBroker(_SQLBroker):
+    """Broker backed by a SQLite file - for a single host and for local testing."""
+    
+    name = "sqlite"
+    
+    def __init__(self, path: Path = config.JOB_BROKER_SQLITE_PATH):
+        """
+        Initialize the broker.
+        
+        Args:
+            path: SQLite database file shared by the bot and its workers
+        """
+        self.path = path
+        self._ready = False
+    
+    def _connect(self):
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        if not self._ready:
+            self._ready = True
+            conn.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+            self._create_table()
+        return conn
+    
+    def claim(self, worker_id: str) -> Optional[Tuple[str, str, tuple, dict]]:
+        self._requeue_expired()
+        
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATE takes the write lock, so two workers can't claim the same job
+            conn.isolation_level = None
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, operation, payload FROM pdf_jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            
+            conn.execute(
+                "UPDATE pdf_jobs SET status = 'running', worker = ?, claimed = ? WHERE id = ?",
+                (worker_id, time.time(), row[0])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        
+        args, kwargs = self._unpayload(row[2])
+        return row[0], row[1], args, kwargs
+
+
+class PostgresBroker(_SQLBroker):
+    """Broker backed by PostgreSQL - workers claim jobs with FOR UPDATE SKIP LOCKED."""
+    
+    name = "postgres"
+    placeholder = "%s"
+    
+    def __init__(self, database_url: str = config.JOB_BROKER_POSTGRES_URL):
+        """
+        Initialize the broker. Connections are opened on first use.
+        
+        Args:
+            database_url: PostgreSQL connection URL
+        """
+        self.database_url = database_url
+        self._pool = None
+    
+    def _connect(self):
+        if self._pool is None:
+            import psycopg2.pool
+            
+            self._pool = psycopg2.pool.ThreadedConnectionPool(1, 10, self.database_url)
+            self._create_table()
+        return self._pool.getconn()
+    
+    def _release(self, conn) -> None:
+        self._pool.putconn(conn)
+    
+    def claim(self, worker_id: str) -> Optional[Tuple[str, str, tuple, dict]]:
+        self._requeue_expired()
+        
+        rows = self._execute(
+            """
+            UPDATE pdf_jobs SET status = 'running', worker = ?, claimed = ?
+            WHERE id = (
+                SELECT id FROM pdf_jobs WHERE status = 'queued'
+                ORDER BY created LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, operation, payload
+            """,
+            (worker_id, time.time()),
+            fetch=True
+        )
+        if not rows:
+            return None
+        
+        job_id, operation, payload = rows[0]
+        args, kwargs = self._unpayload(payload)
+        return job_id, operation, args, kwargs
+
+
+class RedisBroker(JobBroker):
+    """
+    Broker backed by Redis - a job list, one hash per job, a processing list and a lease sorted set.
+    Claiming moves a job into the processing list atomically, so a worker that dies right after
+    taking it doesn't lose it; the job's lease then expires and it is queued again.
+    """
+    
+    name = "redis"
+    
+    QUEUE_KEY = "pdf_jobs:queue"
+    PROCESSING_KEY = "pdf_jobs:processing"
+    RUNNING_KEY = "pdf_jobs:running"
+    JOB_KEY = "pdf_jobs:job:{}"
+    JOB_TTL = 86400  # Forget abandoned jobs after a day
+    
+    # KEYS: processing, running, queue - ARGV: now, lease cutoff
+    # Claimed jobs without a lease (worker died before taking it) get one starting now
+    REQUEUE_SCRIPT = """
+        for _, job_id in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+            redis.call('ZADD', KEYS[2], 'NX', ARGV[1], job_id)
+        end
+        local expired = redis.call('ZRANGEBYSCORE', KEYS[2], 0, ARGV[2])
+        for _, job_id in ipairs(expired) do
+            redis.call('ZREM', KEYS[2], job_id)
+            redis.call('LREM', KEYS[1], 0, job_id)
+            redis.call('RPUSH', KEYS[3], job_id)
+        end
+        return #expired
+    """
+    
+    # KEYS: job, processing, running - ARGV: job ID, worker ID, now
+    CLAIM_SCRIPT = """
+        local job = redis.call('HMGET', KEYS[1], 'operation', 'payload')
+        if not job[1] then
+            redis.call('LREM', KEYS[2], 0, ARGV[1])
+            redis.call('ZREM', KEYS[3], ARGV[1])
+            return false
+        end
+        redis.call('HSET', KEYS[1], 'status', 'running', 'worker', ARGV[2])
+        redis.call('ZADD', KEYS[3], ARGV[3], ARGV[1])
+        return job
+    """
+    
+    # KEYS: job, processing, running - ARGV: job ID, TTL, field/value pairs
+    COMPLETE_SCRIPT = """
+        redis.call('LREM', KEYS[2], 0, ARGV[1])
+        redis.call('ZREM', KEYS[3], ARGV[1])
+        if redis.call('EXISTS', KEYS[1]) == 0 then
+            return 0
+        end
+        redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+        redis.call('EXPIRE', KEYS[1], ARGV[2])
+        return 1
+    """
+    
+    def __init__(self, url: str = config.JOB_BROKER_REDIS_URL):
+        """
+        Initialize the broker.
+        
+        Args:
+            url: Redis connection URL
+            
+        Raises:
+            RuntimeError: If the redis package is not installed
+        """
+        if redis is None:
+            raise RuntimeError("JOB_BROKER=redis requires the 'redis' package (pip install redis)")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self._requeue = self.client.register_script(self.REQUEUE_SCRIPT)
+        self._claim = self.client.register_script(self.CLAIM_SCRIPT)
+        self._complete = self.client.register_script(self.COMPLETE_SCRIPT)
+    
+    def submit(self, operation: str, args: tuple, kwargs: dict) -> str:
+        job_id = uuid.uuid4().hex
+        job_key = self.JOB_KEY.format(job_id)
+        pipe = self.client.pipeline()
+        pipe.hset(job_key, mapping={
+            'operation': operation,
+            'payload': self._payload(args, kwargs),
+            'status': 'queued'
+        })
+        pipe.expire(job_key, self.JOB_TTL)
+        pipe.lpush(self.QUEUE_KEY, job_id)  # Claimed from the right, oldest first
+        pipe.execute()
+        return job_id
+    
+    def claim(self, worker_id: str) -> Optional[Tuple[str, str, tuple, dict]]:
+        # Requeue jobs from crashed workers
+        now = time.time()
+        self._requeue(
+            keys=[self.PROCESSING_KEY, self.RUNNING_KEY, self.QUEUE_KEY],
+            args=[now, now - config.JOB_LEASE_TIMEOUT]
+        )
+        
+        job_id = self.client.brpoplpush(self.QUEUE_KEY, self.PROCESSING_KEY, timeout=1)
+        if job_id is None:
+            return None
+        
+        job = self._claim(
+            keys=[self.JOB_KEY.format(job_id), self.PROCESSING_KEY, self.RUNNING_KEY],
+            args=[job_id, worker_id, time.time()]
+        )
+        if job is None:
+            return None  # Cancelled while queued
+        
+        operation, payload = job
+        args, kwargs = self._unpayload(payload)
+        return job_id, operation, args, kwargs
+    
+    def complete(self, job_id: str, result: Any = None, error: Optional[Exception] = None) -> None:
+        if error is not None:
+            fields = ['status', 'failed', 'error', encode_error(error)]
+        else:
+            fields = ['status', 'done', 'result', json.dumps(encode_value(result))]
+        
+        # Cancelled jobs stay deleted instead of coming back without a TTL
+        self._complete(
+            keys=[self.JOB_KEY.format(job_id), self.PROCESSING_KEY, self.RUNNING_KEY],
+            args=[job_id, self.JOB_TTL, *fields]
+        )
+    
+    def pop_result(self, job_id: str) -> Optional[Tuple[bool, Any]]:
+        job_key = self.JOB_KEY.format(job_id)
+        job = self.client.hgetall(job_key)
+        if not job:
+            return False, RemoteOperationError("Job was lost by the broker")
+        
+        if job['status'] not in ('done', 'failed'):
+            return None
+        
+        self.client.delete(job_key)
+        if job['status'] == 'failed':
+            return False, decode_error(job['error'])
+        return True, decode_value(json.loads(job['result']))
+    
+    def cancel(self, job_id: str) -> None:
+        pipe = self.client.pipeline()
+        pipe.delete(self.JOB_KEY.format(job_id))
+        pipe.lrem(self.PROCESSING_KEY, 0, job_id)
+        pipe.zrem(self.RUNNING_KEY, job_id)
+        pipe.execute()
+    
+    def stats(self) -> dict:
+        return {
+            'queued': self.client.llen(self.QUEUE_KEY),
+            'running': self.client.llen(self.PROCESSING_KEY)
+        }
+
+
+def create_broker(kind: str = config.JOB_BROKER) -> Optional[JobBroker]:
+    """
+    Create the configured broker.
+    
+    Args:
+        kind: "", "sqlite", "redis" or "postgres"
+        
+    Returns:
+        Optional[JobBroker]: Broker, or None to run jobs on the local worker pool
+        
+    Raises:
+        ValueError: If the broker type is unknown
+    """
+    if not kind:
+        return None
+    if kind == "sqlite":
+        return SQLiteBroker()
+    if kind == "redis":
+        return RedisBroker()
+    if kind == "postgres":
+        return PostgresBroker()
+    raise ValueError(f"Invalid job broker: {kind}. Use: sqlite, redis, postgres")
+
+
+# Global job broker instance (None when jobs run on the local worker pool)
+job_broker = create_broker()
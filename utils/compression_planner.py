@@ -0,0 +1,199 @@
+"""
+Compression planner for PDF Telegram Bot.
+Predicts Ghostscript settings for target-size compression by trial-compressing a few sample pages.
+"""
+
+import uuid
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+import pikepdf
+
+import config
+
+
+class CompressionPlanner:
+    """Picks image DPI and JPEG quality that should land a PDF near a target size."""
+    
+    def plan(self, pdf_path: Path, target_size_mb: float, work_dir: Path) -> Optional[dict]:
+        """
+        Plan a single-pass compression for a target size.
+        
+        Compresses sample pages at each point of config.COMPRESSION_PLAN_POINTS,
+        extrapolates the full-document size at each point, and interpolates
+        between the two points that bracket the target.
+        
+        Args:
+            pdf_path: Path to source PDF
+            target_size_mb: Target size in MB
+            work_dir: Directory for temporary sample files
+        
+        Returns:
+            Optional[dict]: {'gs_quality', 'image_dpi', 'jpeg_quality', 'predicted_mb',
+                            'most_aggressive'}, or None if the document is too small to sample
+        """
+        original_size = pdf_path.stat().st_size / (1024 * 1024)
+        run_id = uuid.uuid4().hex[:8]
+        sample_path = work_dir / f"plan_sample_{run_id}.pdf"
+        trial_paths = [
+            work_dir / f"plan_trial_{run_id}_{i}.pdf"
+            for i in range(len(config.COMPRESSION_PLAN_POINTS))
+        ]
+        
+        try:
+            if not self._extract_sample(pdf_path, sample_path):
+                return None
+            
+            sample_size = sample_path.stat().st_size
+            if sample_size == 0:
+                return None
+            
+            # Trial-compress the sample at every point, all at once
+            sizes = self._run_trials(sample_path, trial_paths)
+            predictions = [
+                (dpi, quality, original_size * size / sample_size)
+                for (dpi, quality), size in zip(config.COMPRESSION_PLAN_POINTS, sizes)
+                if size is not None
+            ]
+            
+            if not predictions:
+                return None
+            
+            for dpi, quality, predicted in predictions:
+                print(f"Plan point {dpi} DPI / JPEG {quality}: predicted {predicted:.2f} MB")
+            
+            return self._choose(predictions, target_size_mb)
+        
+        finally:
+            for path in [sample_path] + trial_paths:
+                if path.exists():
+                    try:
+                        path.unlink()
+                    except OSError:
+                        pass
+    
+    def _extract_sample(self, pdf_path: Path, sample_path: Path) -> bool:
+        """
+        Copy evenly spaced sample pages into a new PDF.
+        
+        Args:
+            pdf_path: Path to source PDF
+            sample_path: Where to save the sample
+        
+        Returns:
+            bool: False if the document is too short for sampling to pay off
+        """
+        sample_count = config.COMPRESSION_SAMPLE_PAGES
+        
+        with pikepdf.open(pdf_path) as pdf:
+            total_pages = len(pdf.pages)
+            
+            # Sampling only saves time if it is much smaller than the document
+            if total_pages < sample_count * 2:
+                return False
+            
+            step = total_pages / sample_count
+            indexes = sorted({int(step * i + step / 2) for i in range(sample_count)})
+            
+            with pikepdf.new() as sample:
+                for index in indexes:
+                    sample.pages.append(pdf.pages[index])
+                sample.save(sample_path)
+        
+        return True
+    
+    def _run_trials(self, sample_path: Path, trial_paths: List[Path]) -> List[Optional[int]]:
+        """
+        Compress the sample once per plan point with concurrent Ghostscript processes.
+        
+        Args:
+            sample_path: Path to sample PDF
+            trial_paths: Output path for each plan point
+        
+        Returns:
+            List[Optional[int]]: Output size in bytes per point (None if that run failed)
+        """
+        from .pdf_operations import PDFOperations
+        
+        processes = []
+        try:
+            for (dpi, quality), trial_path in zip(config.COMPRESSION_PLAN_POINTS, trial_paths):
+                processes.append(subprocess.Popen(
+                    PDFOperations._ghostscript_command(
+                        sample_path,
+                        trial_path,
+                        config.COMPRESSION_LEVELS['default'],
+                        image_dpi=dpi,
+                        jpeg_quality=quality
+                    ),
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                ))
+            
+            sizes = []
+            for process, trial_path in zip(processes, trial_paths):
+                process.wait(timeout=config.OPERATION_TIMEOUT)
+                if process.returncode == 0 and trial_path.exists():
+                    sizes.append(trial_path.stat().st_size)
+                else:
+                    sizes.append(None)
+            return sizes
+        
+        finally:
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+    
+    def _choose(self, predictions: List[tuple], target_size_mb: float) -> dict:
+        """
+        Pick settings for the target by interpolating between plan points.
+        
+        Args:
+            predictions: (dpi, jpeg quality, predicted MB) tuples, best quality first
+            target_size_mb: Target size in MB
+        
+        Returns:
+            dict: Chosen Ghostscript settings and predicted size
+        """
+        # Aim a little under the target to absorb prediction error
+        aim = target_size_mb * 0.95
+        gs_quality = config.COMPRESSION_LEVELS['default']
+        
+        previous = None
+        for dpi, quality, predicted in predictions:
+            if predicted <= aim:
+                if previous is None:
+                    # Even the best quality point fits
+                    return {
+                        'gs_quality': gs_quality,
+                        'image_dpi': dpi,
+                        'jpeg_quality': quality,
+                        'predicted_mb': predicted,
+                        'most_aggressive': False
+                    }
+                
+                prev_dpi, prev_quality, prev_predicted = previous
+                fraction = (prev_predicted - aim) / (prev_predicted - predicted)
+                return {
+                    'gs_quality': gs_quality,
+                    'image_dpi': round(prev_dpi + fraction * (dpi - prev_dpi)),
+                    'jpeg_quality': round(prev_quality + fraction * (quality - prev_quality)),
+                    'predicted_mb': aim,
+                    'most_aggressive': False
+                }
+            previous = (dpi, quality, predicted)
+        
+        # Target is below every point - use the most aggressive one
+        dpi, quality, predicted = predictions[-1]
+        return {
+            'gs_quality': gs_quality,
+            'image_dpi': dpi,
+            'jpeg_quality': quality,
+            'predicted_mb': predicted,
+            'most_aggressive': True
+        }
+
+
+# Global compression planner instance
+compression_planner = CompressionPlanner()
@@ -0,0 +1,354 @@
+"""
+Execution layer for PDF Telegram Bot.
+Runs blocking PDFOperations calls on a bounded worker pool so handlers never block the event loop.
+"""
+
+import asyncio
+import functools
+import signal
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import config
+from .pdf_operations import PDFOperations
+from .result_cache import result_cache
+from .broker import job_broker
+
+
+def _init_worker() -> None:
+    """
+    Warm up a process worker so the first job doesn't pay import costs.
+    Loads PyPDF2, pikepdf and all Pillow format plugins up front.
+    """
+    # Let the main process handle Ctrl+C; workers are shut down by it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    
+    import PyPDF2  # noqa: F401
+    import pikepdf  # noqa: F401
+    import pdf2image  # noqa: F401
+    from PIL import Image
+    
+    Image.init()
+
+
+def _ping() -> bool:
+    """No-op job used to spawn workers ahead of time."""
+    return True
+
+
+def _run_operation(operation: str, args: tuple, kwargs: dict):
+    """
+    Run a PDFOperations method by name.
+    Defined at module level so process pools can pickle it.
+    """
+    return getattr(PDFOperations, operation)(*args, **kwargs)
+
+
+class _ProcessWorker:
+    """One worker process, as a single-process pool, and the jobs it has run."""
+    
+    def __init__(self):
+        self.pool = ProcessPoolExecutor(max_workers=1, initializer=_init_worker)
+        self.jobs = 0
+
+
+class _RecyclingProcessPool(Executor):
+    """
+    Process pool whose workers are replaced one at a time after max_jobs jobs each,
+    to release memory leaked by long-lived PDF/image libraries.
+    ProcessPoolExecutor only gained max_tasks_per_child in Python 3.11, and a worker
+    exiting on its own breaks the whole pool, so each worker is a pool of its own,
+    fed from a shared backlog.
+    """
+    
+    def __init__(self, max_workers: int, max_jobs: int):
+        """
+        Initialize the pool. Worker processes start with their first job.
+        
+        Args:
+            max_workers: Number of worker processes
+            max_jobs: Jobs after which a worker is replaced (0 = never)
+        """
+        self.max_jobs = max_jobs
+        self._workers: List[_ProcessWorker] = [_ProcessWorker() for _ in range(max_workers)]
+        self._idle: List[_ProcessWorker] = list(self._workers)
+        self._backlog: Deque[Tuple[Future, Callable]] = deque()
+        self._lock = threading.RLock()  # Done callbacks run on the pools' threads
+        self._shutdown = False
+    
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self._backlog.append((future, functools.partial(fn, *args, **kwargs)))
+            self._dispatch()
+        return future
+    
+    def _dispatch(self) -> None:
+        """Hand backlogged jobs to idle workers (caller holds the lock)."""
+        while self._idle and self._backlog:
+            future, job = self._backlog.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue  # Cancelled while waiting
+            
+            worker = self._idle.pop()
+            worker.jobs += 1
+            worker.pool.submit(job).add_done_callback(
+                functools.partial(self._finished, worker, future)
+            )
+    
+    def _finished(self, worker: _ProcessWorker, future: Future, done: Future) -> None:
+        """Pass a job's outcome on and put its worker back, replacing it if it is used up."""
+        error = done.exception()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(done.result())
+        
+        with self._lock:
+            if self._shutdown:
+                return
+            
+            if isinstance(error, BrokenProcessPool) or (self.max_jobs > 0 and worker.jobs >= self.max_jobs):
+                worker.pool.shutdown(wait=False)
+                replacement = _ProcessWorker()
+                replacement.pool.submit(_ping)  # Start it before the next job needs it
+                self._workers[self._workers.index(worker)] = replacement
+                worker = replacement
+            
+            self._idle.append(worker)
+            self._dispatch()
+    
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            self._shutdown = True
+            backlog = list(self._backlog)
+            self._backlog.clear()
+        
+        for future, _ in backlog:
+            future.cancel()
+        for worker in self._workers:
+            worker.pool.shutdown(wait=wait)
+
+
+class PDFExecutor:
+    """Runs PDFOperations methods on a thread or process pool with per-operation limits."""
+    
+    def __init__(
+        self,
+        pool_type: str = config.WORKER_POOL_TYPE,
+        max_workers: int = config.WORKER_POOL_SIZE
+    ):
+        """
+        Initialize the executor. The pool itself is created lazily on first use.
+        
+        Args:
+            pool_type: "thread" or "process"
+            max_workers: Maximum number of worker threads/processes
+                (with a job broker: total workers across all pdf_worker.py processes)
+        """
+        if pool_type not in ("thread", "process"):
+            raise ValueError(f"Invalid pool type: {pool_type}. Use: thread, process")
+        
+        self.pool_type = pool_type
+        self.max_workers = max(1, max_workers)
+        self._pool: Optional[Executor] = None
+        self._local_pool: Optional[ThreadPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._waiting: Dict[str, int] = {}
+        self._running: Dict[str, int] = {}
+    
+    def _get_pool(self) -> Executor:
+        """
+        Get or create the underlying worker pool.
+        Process workers are replaced after config.WORKER_MAX_JOBS jobs each.
+        """
+        if self._pool is None:
+            if self.pool_type == "process":
+                self._pool = _RecyclingProcessPool(
+                    max_workers=self.max_workers,
+                    max_jobs=config.WORKER_MAX_JOBS
+                )
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="pdf_worker"
+                )
+        return self._pool
+    
+    def _get_local_pool(self) -> ThreadPoolExecutor:
+        """Get or create the thread pool for config.LOCAL_OPERATIONS."""
+        if self._local_pool is None:
+            self._local_pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="pdf_local"
+            )
+        return self._local_pool
+    
+    def _get_semaphore(self, operation: str) -> asyncio.Semaphore:
+        """Get or create the concurrency limiter for an operation."""
+        if operation not in self._semaphores:
+            limit = config.OPERATION_CONCURRENCY.get(operation, self.max_workers)
+            self._semaphores[operation] = asyncio.Semaphore(max(1, min(limit, self.max_workers)))
+        return self._semaphores[operation]
+    
+    async def _run_remote(self, operation: str, args: tuple, kwargs: dict):
+        """
+        Hand a job to the broker and poll until a pdf_worker.py process finishes it.
+        The job is withdrawn if the caller times out or is cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        job_id = await loop.run_in_executor(None, job_broker.submit, operation, args, kwargs)
+        
+        try:
+            while True:
+                outcome = await loop.run_in_executor(None, job_broker.pop_result, job_id)
+                if outcome is not None:
+                    break
+                await asyncio.sleep(config.JOB_POLL_INTERVAL)
+        except BaseException:
+            await loop.run_in_executor(None, job_broker.cancel, job_id)
+            raise
+        
+        ok, value = outcome
+        if not ok:
+            raise value
+        return value
+    
+    def _submit_local(self, operation: str, args: tuple, kwargs: dict) -> Future:
+        """
+        Submit a job to this process's worker pool.
+        config.LOCAL_OPERATIONS run on a thread instead, so their in-memory
+        memos (e.g. get_pdf_info) are shared by every handler of this process.
+        """
+        job = functools.partial(_run_operation, operation, args, kwargs)
+        if operation in config.LOCAL_OPERATIONS:
+            return self._get_local_pool().submit(job)
+        return self._get_pool().submit(job)
+    
+    async def run(self, operation: str, *args, **kwargs):
+        """
+        Run a PDFOperations method on the worker pool and await its result.
+        With a job broker configured, jobs run on pdf_worker.py processes instead
+        (except config.LOCAL_OPERATIONS).
+        Cacheable operations are answered from the result cache when possible.
+        
+        Args:
+            operation: Name of the PDFOperations method (e.g. "merge_pdfs")
+            *args: Positional arguments for the method
+            **kwargs: Keyword arguments for the method
+            
+        Returns:
+            Whatever the PDFOperations method returns
+            
+        Raises:
+            ValueError: If the operation does not exist
+            asyncio.TimeoutError: If the operation exceeds config.OPERATION_TIMEOUT
+            Exception: Any exception raised by the operation itself
+        """
+        if operation.startswith('_') or not callable(getattr(PDFOperations, operation, None)):
+            raise ValueError(f"Unknown PDF operation: {operation}")
+        
+        hit, result = await result_cache.get(operation, args, kwargs)
+        if hit:
+            return result
+        
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore(operation)
+        self._waiting[operation] = self._waiting.get(operation, 0) + 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting[operation] -= 1
+        self._running[operation] = self._running.get(operation, 0) + 1
+        
+        # The slot is given back when the job really ends, not when the caller stops
+        # waiting: a timed-out thread or process can't be interrupted and still uses its worker
+        def release(_=None) -> None:
+            self._running[operation] -= 1
+            semaphore.release()
+        
+        def release_threadsafe(_: Future) -> None:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(release)
+        
+        try:
+            if job_broker is not None and operation not in config.LOCAL_OPERATIONS:
+                work = asyncio.ensure_future(self._run_remote(operation, args, kwargs))
+                work.add_done_callback(release)
+            else:
+                future = self._submit_local(operation, args, kwargs)
+                future.add_done_callback(release_threadsafe)
+                work = asyncio.wrap_future(future)
+        except BaseException:
+            release()
+            raise
+        
+        try:
+            result = await asyncio.wait_for(asyncio.shield(work), timeout=config.OPERATION_TIMEOUT)
+        except BaseException:
+            # Withdraws jobs that haven't started; running local jobs finish on their own
+            work.cancel()
+            raise
+        
+        await result_cache.put(operation, args, kwargs, result)
+        return result
+    
+    async def warm_up(self) -> None:
+        """
+        Start all process workers ahead of the first real job.
+        Does nothing for thread pools or when jobs go through a broker.
+        """
+        if self.pool_type != "process" or job_broker is not None:
+            return
+        
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        await asyncio.gather(*[
+            loop.run_in_executor(pool, _ping)
+            for _ in range(self.max_workers)
+        ])
+    
+    def queue_depth(self) -> dict:
+        """
+        Get current queue depth for monitoring.
+        
+        Returns:
+            dict: Waiting/running job counts, total and per operation
+        """
+        operations = {}
+        for operation in set(self._waiting) | set(self._running):
+            waiting = self._waiting.get(operation, 0)
+            running = self._running.get(operation, 0)
+            if waiting or running:
+                operations[operation] = {'waiting': waiting, 'running': running}
+        
+        return {
+            'pool_type': job_broker.name if job_broker is not None else self.pool_type,
+            'max_workers': self.max_workers,
+            'waiting': sum(op['waiting'] for op in operations.values()),
+            'running': sum(op['running'] for op in operations.values()),
+            'operations': operations
+        }
+    
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shut down the worker pool.
+        
+        Args:
+            wait: Whether to wait for running jobs to finish
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+        if self._local_pool is not None:
+            self._local_pool.shutdown(wait=wait)
+            self._local_pool = None
+
+
+# Global PDF executor instance
+pdf_executor = PDFExecutor()
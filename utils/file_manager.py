@@ -6,12 +6,66 @@ Handles file downloads, validation, cleanup, and temporary storage.
 import os
 import time
 import uuid
+import shutil
 import asyncio
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, List
-from telegram import File as TelegramFile
+from typing import Awaitable, Callable, Dict, Optional, List, Tuple, Union
+from telegram import Bot, File as TelegramFile, Message, Update
+from telegram.ext import ContextTypes
+from telegram.error import BadRequest
 
 import config
+from .result_cache import result_cache
+from .image_encoder import image_encoder
+from .pdf_operations import PDFOperations
+
+
+class PendingFile:
+    """A file the user sent, downloaded only once an operation needs it."""
+    
+    def __init__(self, file_id: str, file_unique_id: str, file_name: str, file_size: int):
+        """
+        Initialize the reference.
+        
+        Args:
+            file_id: Telegram file_id used to download the file
+            file_unique_id: Telegram file_unique_id (stable across bots and resends)
+            file_name: Sanitized file name
+            file_size: Size in bytes as reported by Telegram
+        """
+        self.file_id = file_id
+        self.file_unique_id = file_unique_id
+        self.file_name = file_name
+        self.file_size = file_size
+        self.path: Optional[Path] = None  # Set once downloaded
+        self.image_info: Optional[dict] = None  # Image header probe (see ImageEncoder.probe)
+    
+    @property
+    def downloaded(self) -> bool:
+        """Whether a local copy exists (temp cleanup may have removed it)."""
+        return self.path is not None and self.path.exists()
+    
+    def to_dict(self) -> dict:
+        """Serialize the reference (for session persistence)."""
+        return {
+            'file_id': self.file_id,
+            'file_unique_id': self.file_unique_id,
+            'file_name': self.file_name,
+            'file_size': self.file_size,
+            'path': str(self.path) if self.path is not None else None,
+            'image_info': self.image_info
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "PendingFile":
+        """Rebuild a reference serialized with to_dict."""
+        pending = cls(data['file_id'], data['file_unique_id'], data['file_name'], data['file_size'])
+        if data.get('path'):
+            pending.path = Path(data['path'])
+        pending.image_info = data.get('image_info')
+        return pending
 
 
 class FileManager:
@@ -21,6 +75,15 @@ class FileManager:
         """Initialize file manager with temp directory."""
         self.temp_dir = config.TEMP_DIR
         self.user_dirs = {}  # Track user-specific temp directories
+        self.download_cache_dir = config.DOWNLOAD_CACHE_DIR
+        self.download_hits = 0
+        self.upload_hits = 0
+        self._downloads: "OrderedDict[str, int]" = OrderedDict()  # file_unique_id -> size, least recent first
+        self._downloads_size = 0
+        self._downloads_loaded = False
+        self._downloads_lock = threading.Lock()  # Cache copies run on executor threads
+        self._download_slots: Dict[int, asyncio.Semaphore] = {}  # Per-user download limit
+        self._sent_file_ids: "OrderedDict[Tuple[str, str], str]" = OrderedDict()  # (sha256, filename) -> file_id
     
     def get_user_dir(self, user_id: int) -> Path:
         """
@@ -73,11 +136,330 @@ class FileManager:
         user_dir = self.get_user_dir(user_id)
         file_path = user_dir / filename
         
+        loop = asyncio.get_running_loop()
+        unique_id = telegram_file.file_unique_id
+        
+        # Reuse a recent download of the same file
+        if await loop.run_in_executor(None, self._copy_cached_download, unique_id, file_path):
+            self.download_hits += 1
+            return file_path
+        
         # Download file
         await telegram_file.download_to_drive(str(file_path))
+        await loop.run_in_executor(None, self._cache_download, unique_id, file_path)
         
         return file_path
     
+    async def download_files(
+        self,
+        bot: Bot,
+        attachments: List[Tuple[str, str]],
+        user_id: int,
+        on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+        validate: Optional[Callable[[Path], bool]] = None
+    ) -> List[Union[Path, Exception]]:
+        """
+        Download several files concurrently, at most config.MAX_CONCURRENT_DOWNLOADS
+        at a time per user. Each file is validated on a thread as soon as it arrives,
+        while the others are still downloading.
+        
+        Args:
+            bot: Bot used to resolve file_ids
+            attachments: (file_id, filename) pairs
+            user_id: User's Telegram ID
+            on_progress: Optional async callback receiving (completed, total)
+            validate: Optional blocking check run on each downloaded file; failing files
+                      are deleted. It may raise ValueError to give the reason.
+                      
+        Returns:
+            List[Union[Path, Exception]]: Downloaded path or the error, in input order
+        """
+        if user_id not in self._download_slots:
+            self._download_slots[user_id] = asyncio.Semaphore(config.MAX_CONCURRENT_DOWNLOADS)
+        slots = self._download_slots[user_id]
+        user_dir = self.get_user_dir(user_id)
+        completed = 0
+        loop = asyncio.get_running_loop()
+        
+        # Concurrent downloads must not share a path, nor overwrite earlier downloads
+        filenames = []
+        for _, filename in attachments:
+            name, ext = os.path.splitext(filename)
+            unique_name = filename
+            counter = 1
+            while unique_name in filenames or (user_dir / unique_name).exists():
+                unique_name = f"{name}_{counter}{ext}"
+                counter += 1
+            filenames.append(unique_name)
+        
+        async def download(file_id: str, filename: str) -> Path:
+            nonlocal completed
+            try:
+                async with slots:
+                    telegram_file = await bot.get_file(file_id)
+                    file_path = await self.download_file(telegram_file, user_id, filename)
+                
+                if validate:
+                    try:
+                        valid = await loop.run_in_executor(None, validate, file_path)
+                    except ValueError:
+                        file_path.unlink()
+                        raise
+                    if not valid:
+                        file_path.unlink()
+                        raise ValueError("invalid or corrupted file")
+                return file_path
+            
+            finally:
+                completed += 1
+                if on_progress:
+                    await on_progress(completed, len(attachments))
+        
+        return await asyncio.gather(
+            *[
+                download(file_id, filename)
+                for (file_id, _), filename in zip(attachments, filenames)
+            ],
+            return_exceptions=True
+        )
+    
+    async def fetch_files(
+        self,
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE,
+        key: str
+    ) -> Optional[List[Path]]:
+        """
+        Download the user's pending files for an operation that is about to run.
+        Shows one progress message while downloading. Files that fail are removed
+        from the user's list and reported.
+        
+        Args:
+            update: Telegram update object
+            context: Telegram context object (files are in context.user_data[key])
+            key: 'pdf_files' or 'image_files'
+            
+        Returns:
+            Optional[List[Path]]: Local paths in upload order, or None if any file failed
+        """
+        pending_files: List[PendingFile] = context.user_data.get(key, [])
+        missing = [pending for pending in pending_files if not pending.downloaded]
+        
+        if missing:
+            validate = self._check_pdf if key == 'pdf_files' else self._check_image
+            title = f"📥 **Downloading {len(missing)} file(s)...**"
+            status_msg = await update.message.reply_text(title, parse_mode='Markdown')
+            
+            results = await self.download_files(
+                context.bot,
+                [(pending.file_id, pending.file_name) for pending in missing],
+                update.effective_user.id,
+                on_progress=download_progress_updater(status_msg, title),
+                validate=validate
+            )
+            
+            failed = []
+            for pending, result in zip(missing, results):
+                if isinstance(result, Exception):
+                    failed.append(f"• {pending.file_name}: {result}")
+                    pending_files.remove(pending)
+                else:
+                    pending.path = result
+                    if key == 'image_files':
+                        pending.image_info = image_encoder.probe(result)  # Memoized by validation
+            
+            if failed:
+                await status_msg.edit_text(
+                    "❌ **Some files could not be loaded!**\n\n"
+                    + "\n".join(failed) + "\n\n"
+                    "They were removed from your list.\n"
+                    "Send them again or use /cancel to start over.",
+                    parse_mode='Markdown'
+                )
+                return None
+            
+            await status_msg.delete()
+        
+        return [pending.path for pending in pending_files]
+    
+    def _check_pdf(self, file_path: Path) -> bool:
+        """
+        Validate a downloaded PDF and read its metadata while other files are still
+        downloading. get_pdf_info memoizes it, so the operation's first step is ready.
+        """
+        if not self.validate_pdf(file_path):
+            return False
+        PDFOperations.get_pdf_info(file_path)
+        return True
+    
+    def _check_image(self, file_path: Path) -> bool:
+        """
+        Validate a downloaded image, keeping the reason it was rejected for the user.
+        
+        Raises:
+            ValueError: If the file is not a supported image or is too large to decode
+        """
+        image_encoder.probe(file_path)
+        return True
+    
+    def _load_download_cache(self) -> None:
+        """Index cached downloads left on disk by a previous run (caller holds the lock)."""
+        if self._downloads_loaded:
+            return
+        self._downloads_loaded = True
+        self.download_cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        cached = []
+        for path in self.download_cache_dir.iterdir():
+            if path.name.startswith('.'):
+                path.unlink()  # Interrupted copy
+            elif path.is_file():
+                cached.append((path.stat().st_mtime, path.name, path.stat().st_size))
+        
+        for _, unique_id, size in sorted(cached):
+            self._downloads[unique_id] = size
+            self._downloads_size += size
+    
+    def _copy_cached_download(self, unique_id: str, file_path: Path) -> bool:
+        """
+        Copy a cached download to file_path.
+        
+        Args:
+            unique_id: Telegram file_unique_id
+            file_path: Destination path
+            
+        Returns:
+            bool: True if the file was in the cache
+        """
+        with self._downloads_lock:
+            self._load_download_cache()
+            if unique_id not in self._downloads:
+                return False
+            self._downloads.move_to_end(unique_id)
+        
+        cached_path = self.download_cache_dir / unique_id
+        try:
+            shutil.copyfile(cached_path, file_path)
+            os.utime(cached_path)  # Remember recency across restarts
+        except OSError as e:
+            print(f"Error reusing cached download {unique_id}: {e}")
+            with self._downloads_lock:
+                self._downloads_size -= self._downloads.pop(unique_id, 0)
+            return False
+        
+        return True
+    
+    def _cache_download(self, unique_id: str, file_path: Path) -> None:
+        """
+        Keep a copy of a downloaded file, evicting the least recently used ones.
+        
+        Args:
+            unique_id: Telegram file_unique_id
+            file_path: Downloaded file
+        """
+        size = file_path.stat().st_size
+        with self._downloads_lock:
+            self._load_download_cache()
+            if unique_id in self._downloads or size > config.DOWNLOAD_CACHE_MAX_SIZE:
+                return
+        
+        # Copy rather than link so later writes to the user's copy can't alter the cache
+        temp_path = self.download_cache_dir / f".{unique_id}.{uuid.uuid4().hex[:8]}"
+        try:
+            shutil.copyfile(file_path, temp_path)
+            temp_path.rename(self.download_cache_dir / unique_id)
+        except OSError as e:
+            print(f"Error caching download {unique_id}: {e}")
+            if temp_path.exists():
+                temp_path.unlink()
+            return
+        
+        with self._downloads_lock:
+            if unique_id in self._downloads:
+                return
+            self._downloads[unique_id] = size
+            self._downloads_size += size
+            
+            while self._downloads_size > config.DOWNLOAD_CACHE_MAX_SIZE:
+                old_id, old_size = self._downloads.popitem(last=False)
+                self._downloads_size -= old_size
+                try:
+                    (self.download_cache_dir / old_id).unlink()
+                except OSError:
+                    pass
+    
+    async def send_document(
+        self,
+        message: Message,
+        file_path: Path,
+        filename: str,
+        caption: Optional[str] = None,
+        parse_mode: Optional[str] = None
+    ) -> Message:
+        """
+        Reply with a document, reusing Telegram's file_id if identical content
+        was already sent under the same filename.
+        
+        Args:
+            message: Message to reply to
+            file_path: File to send
+            filename: File name shown to the user
+            caption: Optional caption
+            parse_mode: Optional caption parse mode
+            
+        Returns:
+            Message: The sent message
+        """
+        loop = asyncio.get_running_loop()
+        content_hash = await loop.run_in_executor(None, result_cache.file_hash, file_path)
+        key = (content_hash, filename)
+        
+        file_id = self._sent_file_ids.get(key)
+        if file_id:
+            try:
+                sent = await message.reply_document(
+                    document=file_id,
+                    caption=caption,
+                    parse_mode=parse_mode
+                )
+                self._sent_file_ids.move_to_end(key)
+                self.upload_hits += 1
+                return sent
+            except BadRequest as e:
+                # file_id no longer valid - fall back to uploading
+                print(f"Cached file_id rejected, uploading instead: {e}")
+                self._sent_file_ids.pop(key, None)
+        
+        with open(file_path, 'rb') as document:
+            sent = await message.reply_document(
+                document=document,
+                filename=filename,
+                caption=caption,
+                parse_mode=parse_mode
+            )
+        
+        if sent.document:
+            self._sent_file_ids[key] = sent.document.file_id
+            if len(self._sent_file_ids) > config.SENT_FILE_ID_CACHE_SIZE:
+                self._sent_file_ids.popitem(last=False)
+        
+        return sent
+    
+    def cache_stats(self) -> dict:
+        """
+        Get file reuse statistics for monitoring.
+        
+        Returns:
+            dict: Download/upload reuse counts and cache size
+        """
+        return {
+            'download_hits': self.download_hits,
+            'upload_hits': self.upload_hits,
+            'cached_downloads': len(self._downloads),
+            'cached_downloads_mb': self._downloads_size / (1024 * 1024),
+            'known_file_ids': len(self._sent_file_ids)
+        }
+    
     def validate_pdf(self, file_path: Path) -> bool:
         """
         Validate that a file is a valid PDF.
@@ -105,7 +487,9 @@ class FileManager:
     
     def validate_image(self, file_path: Path) -> bool:
         """
-        Validate that a file is a supported image format.
+        Validate that a file is a supported image that can be decoded safely.
+        Only the header is read (see ImageEncoder.probe), so corrupt files and
+        decompression bombs are caught before a job is queued.
         
         Args:
             file_path: Path to file to validate
@@ -116,8 +500,12 @@ class FileManager:
         if not file_path.exists():
             return False
         
-        # Check file extension
-        return file_path.suffix.lower() in config.SUPPORTED_IMAGE_FORMATS
+        try:
+            image_encoder.probe(file_path)
+        except ValueError as e:
+            print(f"Invalid image {file_path.name}: {e}")
+            return False
+        return True
     
     def cleanup_user_files(self, user_id: int) -> None:
         """
@@ -220,6 +608,39 @@ class FileManager:
         return sanitized
 
 
+def download_progress_updater(message: Message, title: str) -> Callable[[int, int], Awaitable[None]]:
+    """
+    Build an on_progress callback for FileManager.download_files that edits one status message.
+    Edits are throttled to config.DOWNLOAD_PROGRESS_INTERVAL; the final count is always shown.
+    
+    Args:
+        message: Telegram status message to edit
+        title: Markdown heading shown above the progress line
+        
+    Returns:
+        Callable: Async callback receiving (completed, total)
+    """
+    loop = asyncio.get_running_loop()
+    last_update = loop.time()
+    
+    async def update(completed: int, total: int) -> None:
+        nonlocal last_update
+        now = loop.time()
+        if completed < total and now - last_update < config.DOWNLOAD_PROGRESS_INTERVAL:
+            return
+        last_update = now
+        
+        try:
+            await message.edit_text(
+                f"{title}\n\n✅ Downloaded {completed}/{total}",
+                parse_mode='Markdown'
+            )
+        except Exception:
+            pass  # Message unchanged or deleted
+    
+    return update
+
+
 # Global file manager instance
 file_manager = FileManager()
 
@@ -0,0 +1,625 @@
+"""
+Image encoding for PDF Telegram Bot.
+Decides how each image is stored in a PDF: JPEGs are embedded as they are, other
+images are decoded and stored with the encoder that suits their content.
+"""
+
+import io
+import zlib
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+import config
+
+# Pillow refuses to open images far beyond this (decompression bombs)
+Image.MAX_IMAGE_PIXELS = config.MAX_IMAGE_PIXELS
+
+# Pillow formats accepted for /topdf, whatever the file extension says
+SUPPORTED_FORMATS = ('JPEG', 'MPO', 'PNG', 'GIF', 'BMP', 'TIFF', 'WEBP')
+
+_PROBE_MEMO_SIZE = 1000
+
+
+# JPEG start-of-frame markers (C4, C8 and CC are other markers)
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# Huffman-coded baseline, extended and progressive JPEGs - what every PDF reader decodes.
+# Lossless, hierarchical and arithmetic-coded JPEGs are re-encoded instead.
+PASSTHROUGH_PROCESSES = (0xC0, 0xC1, 0xC2)
+
+_COLORSPACES = {1: '/DeviceGray', 3: '/DeviceRGB', 4: '/DeviceCMYK'}
+
+# Few-color images are stored losslessly only if Flate gets them below this
+# (a JPEG of a photo takes roughly 1-3 bits per pixel)
+LOSSLESS_MAX_BITS_PER_PIXEL = 2.0
+
+# Rows compressed per Flate call, in bytes of raw pixel data
+_FLATE_BAND_BYTES = 1024 * 1024
+
+# EXIF orientations that are plain rotations, as the page /Rotate that shows them upright
+_EXIF_ORIENTATION = 0x0112
+_ORIENTATION_ROTATION = {1: 0, 3: 180, 6: 90, 8: 270}
+
+ImageData = Tuple[Dict[str, str], Callable[[BinaryIO], None]]
+
+
+# Paper sizes in points (portrait); pages are turned to landscape for landscape images
+PAPER_SIZES = {
+    'a4': (595.28, 841.89),
+    'letter': (612.0, 792.0),
+}
+
+# Peak memory per pixel while an image is prepared, measured: the decoded image, its
+# working copies (flatten, transpose, resize) and encoder buffers. Pillow keeps RGB
+# pixels in 4 bytes, and transparent images are flattened through RGBA copies.
+_PREPARE_BYTES_PER_PIXEL = {'gray': 3, 'color': 10, 'transparent': 17}
+
+# Pixels per inch that decide an image's natural page size in "fit" mode
+_NATURAL_DPI = 100
+
+Layout = Tuple[float, float, Tuple[float, float, float, float]]
+
+
+class _MemoryBudget:
+    """Memory shared by threads decoding images; reservations wait while it is used up."""
+    
+    def __init__(self, limit: int):
+        """
+        Initialize the budget.
+        
+        Args:
+            limit: Bytes that may be reserved at once (0 = unlimited)
+        """
+        self.limit = limit
+        self.used = 0
+        self._condition = threading.Condition()
+    
+    @contextmanager
+    def reserve(self, amount: int) -> Iterator[None]:
+        """
+        Hold part of the budget, waiting until it is available.
+        An image larger than the whole budget still runs, but only on its own.
+        
+        Args:
+            amount: Bytes needed
+        """
+        if self.limit <= 0:
+            yield
+            return
+        
+        amount = min(amount, self.limit)
+        with self._condition:
+            self._condition.wait_for(lambda: self.used + amount <= self.limit)
+            self.used += amount
+        
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.used -= amount
+                self._condition.notify_all()
+
+
+class PreparedImage:
+    """An image encoded for a PDF page, waiting to be written."""
+    
+    def __init__(
+        self,
+        entries: Dict[str, str],
+        write_data: Callable[[BinaryIO], None],
+        layout: Layout,
+        rotate: int
+    ):
+        """
+        Initialize the prepared image.
+        
+        Args:
+            entries: Image XObject entries
+            write_data: Writes the encoded stream data
+            layout: Page width and height, and the image's (x, y, width, height) on it, in points
+            rotate: Clockwise page rotation that shows the image upright (0, 90, 180, 270)
+        """
+        self.entries = entries
+        self.write_data = write_data
+        self.page_width, self.page_height, self.placement = layout
+        self.rotate = rotate
+
+
+class ImageEncoder:
+    """Turns images into PDF image XObjects."""
+    
+    def __init__(
+        self,
+        jpeg_quality: int = config.IMAGE_JPEG_QUALITY,
+        page_size: str = config.IMAGE_PAGE_SIZE,
+        max_dpi: int = config.IMAGE_MAX_DPI,
+        decode_memory: int = config.IMAGE_DECODE_MEMORY
+    ):
+        """
+        Initialize the encoder.
+        
+        Args:
+            jpeg_quality: Quality for images that have to be stored as new JPEGs
+            page_size: "a4" or "letter" (image centered on the paper), or "fit"
+                       (page is the image, shrunk to fit on A4)
+            max_dpi: Images sharper than this on their page are downscaled (0 = never)
+            decode_memory: Bytes that images being decoded may take at once, across
+                           threads (0 = unlimited)
+        """
+        if page_size not in PAPER_SIZES and page_size != 'fit':
+            raise ValueError(f"Invalid page size: {page_size}. Use: a4, letter, fit")
+        
+        self.jpeg_quality = jpeg_quality
+        self.page_size = page_size
+        self.max_dpi = max_dpi
+        self.ccitt_available = features.check('libtiff')
+        self._decode_budget = _MemoryBudget(decode_memory)
+        self._probes: "OrderedDict[Tuple[str, int, int], dict]" = OrderedDict()
+        self._probes_lock = threading.Lock()
+    
+    @staticmethod
+    def check_size(width: int, height: int) -> None:
+        """
+        Reject images too large to decode safely.
+        
+        Args:
+            width: Width in pixels
+            height: Height in pixels
+        
+        Raises:
+            ValueError: If the image has no pixels or more than config.MAX_IMAGE_PIXELS
+        """
+        if width < 1 or height < 1:
+            raise ValueError("image has no pixels")
+        if width * height > config.MAX_IMAGE_PIXELS:
+            raise ValueError(
+                f"image too large: {width * height / 1e6:.0f} megapixels "
+                f"(max {config.MAX_IMAGE_PIXELS / 1e6:.0f})"
+            )
+    
+    def probe(self, img_path: Path) -> dict:
+        """
+        Read an image's header without decoding it, and reject files that would fail or
+        exhaust memory once decoded. Memoized by path, size and modification time.
+        
+        Args:
+            img_path: Path to image file
+        
+        Returns:
+            dict: format, width, height, mode and frames (more than 1 for animations)
+        
+        Raises:
+            ValueError: If it isn't a supported image or it is too large
+        """
+        stat = img_path.stat()
+        memo_key = (str(img_path), stat.st_size, stat.st_mtime_ns)
+        with self._probes_lock:
+            info = self._probes.get(memo_key)
+            if info is not None:
+                self._probes.move_to_end(memo_key)
+                return dict(info)
+        
+        try:
+            with Image.open(img_path) as img:
+                frames = 1
+                # MPO's extra frames are previews or depth maps, not pages
+                if img.format != 'MPO' and getattr(img, 'is_animated', False):
+                    frames = img.n_frames
+                info = {
+                    'format': img.format,
+                    'width': img.width,
+                    'height': img.height,
+                    'mode': img.mode,
+                    'frames': frames
+                }
+        except Image.DecompressionBombError:
+            raise ValueError(f"image too large (max {config.MAX_IMAGE_PIXELS / 1e6:.0f} megapixels)")
+        except (UnidentifiedImageError, OSError, SyntaxError):
+            raise ValueError("not a valid image file")
+        
+        if info['format'] not in SUPPORTED_FORMATS:
+            raise ValueError(f"unsupported image format ({info['format']})")
+        self.check_size(info['width'], info['height'])
+        
+        with self._probes_lock:
+            self._probes[memo_key] = info
+            if len(self._probes) > _PROBE_MEMO_SIZE:
+                self._probes.popitem(last=False)
+        return dict(info)
+    
+    def layout(self, width: int, height: int) -> Layout:
+        """
+        Place an image on its page.
+        
+        Args:
+            width: Image width in pixels
+            height: Image height in pixels
+        
+        Returns:
+            Layout: Page width and height, and the image's (x, y, width, height), in points
+        """
+        natural_width = width * 72 / _NATURAL_DPI
+        natural_height = height * 72 / _NATURAL_DPI
+        
+        paper_width, paper_height = PAPER_SIZES.get(self.page_size, PAPER_SIZES['a4'])
+        if width > height:
+            paper_width, paper_height = paper_height, paper_width
+        scale = min(paper_width / natural_width, paper_height / natural_height)
+        
+        if self.page_size == 'fit':
+            # Never enlarge; big photos no longer become poster-sized pages
+            scale = min(scale, 1.0)
+            image_width, image_height = natural_width * scale, natural_height * scale
+            return image_width, image_height, (0.0, 0.0, image_width, image_height)
+        
+        image_width, image_height = natural_width * scale, natural_height * scale
+        return paper_width, paper_height, (
+            (paper_width - image_width) / 2,
+            (paper_height - image_height) / 2,
+            image_width,
+            image_height
+        )
+    
+    def _target_size(self, width: int, height: int, layout: Layout) -> Optional[Tuple[int, int]]:
+        """
+        Pixel size an image should be resampled to, so it's no sharper than max_dpi on its page.
+        
+        Returns:
+            Optional[Tuple[int, int]]: Target size, or None to keep the image as it is
+        """
+        if self.max_dpi <= 0:
+            return None
+        _, _, (_, _, shown_width, shown_height) = layout
+        target = (
+            max(1, round(shown_width / 72 * self.max_dpi)),
+            max(1, round(shown_height / 72 * self.max_dpi))
+        )
+        if target[0] >= width or target[1] >= height:
+            return None
+        return target
+    
+    @staticmethod
+    def read_jpeg_header(img_path: Path) -> Optional[dict]:
+        """
+        Read a JPEG's frame header and Adobe marker without decoding anything.
+        
+        Args:
+            img_path: Path to image file
+        
+        Returns:
+            Optional[dict]: process (SOF marker), precision, width, height, components
+                            and adobe (APP14 present), or None if it isn't a JPEG
+        """
+        adobe = False
+        with open(img_path, 'rb') as image_file:
+            if image_file.read(2) != b'\xff\xd8':
+                return None
+            
+            while True:
+                byte = image_file.read(1)
+                if not byte:
+                    return None
+                if byte != b'\xff':
+                    continue
+                
+                # Skip fill bytes
+                marker = image_file.read(1)
+                while marker == b'\xff':
+                    marker = image_file.read(1)
+                if not marker:
+                    return None
+                marker = marker[0]
+                
+                # Markers without a length field
+                if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+                    continue
+                if marker in (0xD9, 0xDA):
+                    return None  # Image data started before any frame header
+                
+                length_bytes = image_file.read(2)
+                if len(length_bytes) < 2:
+                    return None
+                length = int.from_bytes(length_bytes, 'big')
+                
+                if marker in _SOF_MARKERS:
+                    header = image_file.read(6)
+                    if len(header) < 6:
+                        return None
+                    return {
+                        'process': marker,
+                        'precision': header[0],
+                        'height': int.from_bytes(header[1:3], 'big'),
+                        'width': int.from_bytes(header[3:5], 'big'),
+                        'components': header[5],
+                        'adobe': adobe
+                    }
+                
+                if marker == 0xEE:
+                    adobe = adobe or image_file.read(5) == b'Adobe'
+                    image_file.seek(length - 7, 1)
+                else:
+                    image_file.seek(length - 2, 1)
+    
+    def prepare(self, img_path: Path) -> PreparedImage:
+        """
+        Decode, orient, flatten and encode an image, so all that's left is writing it.
+        Safe to run for several images at once on different threads; decoding waits
+        while other threads hold the encoder's decode memory (config.IMAGE_DECODE_MEMORY).
+        
+        JPEGs are embedded as-is; an EXIF rotation becomes the page's /Rotate instead of
+        a re-encode. Everything else is decoded, turned upright and encoded by encode_pixels.
+        Images with more pixels than max_dpi allows on their page are downscaled first
+        (JPEGs included, decoded at reduced scale with draft()).
+        
+        Args:
+            img_path: Path to image file
+        
+        Returns:
+            PreparedImage: Encoded image, ready for StreamingPDFWriter.add_image_page
+        
+        Raises:
+            ValueError: If the image fails probe()
+        """
+        self.probe(img_path)
+        
+        with Image.open(img_path) as img:
+            orientation = img.getexif().get(_EXIF_ORIENTATION, 1)
+            
+            # Rotated pages are laid out unrotated - the page turns together with the image
+            layout = self.layout(img.width, img.height)
+            target = self._target_size(img.width, img.height, layout)
+            
+            if target and img.format == 'JPEG':
+                # JPEGs are only shrunk by what libjpeg can skip while decoding (1/2, 1/4
+                # or 1/8 - nearly free); less than half isn't worth a lossy re-encode
+                reduction = max(
+                    (factor for factor in (2, 4, 8)
+                     if img.width // factor >= target[0] and img.height // factor >= target[1]),
+                    default=1
+                )
+                target = None if reduction == 1 else (
+                    -(-img.width // reduction), -(-img.height // reduction)
+                )
+            
+            if img.format == 'JPEG' and orientation in _ORIENTATION_ROTATION and target is None:
+                passthrough = self._passthrough(img_path)
+                if passthrough:
+                    entries, write_data = passthrough
+                    return PreparedImage(entries, write_data, layout, _ORIENTATION_ROTATION[orientation])
+            
+            if target and img.format == 'JPEG':
+                img.draft(img.mode, target)
+            
+            # Decoding waits until the memory for it is free, so a few huge images
+            # can't all be decoded at once
+            if 'A' in img.mode or 'transparency' in img.info:
+                kind = 'transparent'
+            else:
+                kind = 'gray' if img.mode in ('1', 'L') else 'color'
+            with self._decode_budget.reserve(img.width * img.height * _PREPARE_BYTES_PER_PIXEL[kind]):
+                entries, data, layout = self._encode_decoded(img, orientation, layout, target)
+                img.close()  # Free the decoded pixels before giving the memory back
+        
+        return PreparedImage(entries, lambda output: output.write(data), layout, 0)
+    
+    def _encode_decoded(
+        self,
+        img: Image.Image,
+        orientation: int,
+        layout: Layout,
+        target: Optional[Tuple[int, int]]
+    ) -> Tuple[Dict[str, str], bytes, Layout]:
+        """
+        Decode, orient, flatten, downscale and encode an image for prepare().
+        
+        Returns:
+            Tuple[Dict[str, str], bytes, Layout]: Image XObject entries, encoded data and
+                                                  the layout of the upright image
+        """
+        upright = self.flatten(ImageOps.exif_transpose(img))
+        if orientation in (5, 6, 7, 8):
+            layout = self.layout(upright.width, upright.height)
+            if target:
+                target = (target[1], target[0])
+        
+        # Only photos are downscaled: resampling a scan, screenshot or diagram would blur
+        # it into many more colors, and those stay small with CCITT or Flate anyway
+        if target and upright.size != target and upright.mode != '1' and upright.getcolors(256) is None:
+            upright = upright.resize(target, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        
+        entries, write_data = self.encode_pixels(upright)
+        
+        # Encode now, on this thread, so the decoded pixels can be freed
+        buffer = io.BytesIO()
+        write_data(buffer)
+        return entries, buffer.getvalue(), layout
+    
+    def _passthrough(self, img_path: Path) -> Optional[ImageData]:
+        """
+        Embed a JPEG file unchanged as a DCTDecode stream, if PDF readers can decode it.
+        
+        Args:
+            img_path: Path to JPEG file
+        
+        Returns:
+            Optional[ImageData]: Entries and writer, or None if it must be re-encoded
+        """
+        header = self.read_jpeg_header(img_path)
+        if (
+            header is None
+            or header['process'] not in PASSTHROUGH_PROCESSES
+            or header['precision'] != 8
+            or header['components'] not in _COLORSPACES
+        ):
+            return None
+        
+        entries = {
+            'Width': str(header['width']),
+            'Height': str(header['height']),
+            'ColorSpace': _COLORSPACES[header['components']],
+            'BitsPerComponent': '8',
+            'Filter': '/DCTDecode'
+        }
+        
+        # Adobe CMYK JPEGs (Photoshop and friends) store inverted values
+        if header['components'] == 4 and header['adobe']:
+            entries['Decode'] = '[1 0 1 0 1 0 1 0]'
+        
+        def write_data(output: BinaryIO) -> None:
+            with open(img_path, 'rb') as source:
+                shutil.copyfileobj(source, output)
+        
+        return entries, write_data
+    
+    @staticmethod
+    def flatten(img: Image.Image) -> Image.Image:
+        """
+        Convert an image to a mode PDF can store directly: 1, L or RGB.
+        Transparent areas are placed on a white background.
+        
+        Args:
+            img: Image in any mode
+        
+        Returns:
+            Image.Image: Bilevel, grayscale or RGB image
+        """
+        if img.mode == 'P' and 'transparency' in img.info:
+            img = img.convert('RGBA')
+        
+        if img.mode in ('RGBA', 'LA', 'PA', 'RGBa', 'La'):
+            mode = 'L' if img.mode in ('LA', 'La') else 'RGB'
+            transparent = img.convert(mode + 'A')
+            background = Image.new(mode, img.size, 255 if mode == 'L' else (255, 255, 255))
+            background.paste(transparent, mask=transparent.getchannel('A'))
+            return background
+        
+        if img.mode in ('1', 'L', 'RGB'):
+            return img
+        if img.mode.startswith('I') or img.mode == 'F':
+            return img.convert('L')
+        return img.convert('RGB')
+    
+    def encode_pixels(self, img: Image.Image) -> ImageData:
+        """
+        Pick an encoder for a decoded image by looking at its content:
+        - black and white only: CCITT G4 (Flate when libtiff is missing)
+        - up to 256 colors that compress well (screenshots, diagrams, GIFs): lossless Flate,
+          grays as DeviceGray and other colors as a palette
+        - anything else (photos): JPEG
+        
+        Args:
+            img: Image in mode 1, L or RGB
+        
+        Returns:
+            ImageData: Image XObject entries and stream writer
+        """
+        if img.mode == '1':
+            return self._bilevel(img)
+        
+        colors = img.getcolors(256)
+        if colors is None:
+            return self._jpeg(img)
+        
+        values = {color for _, color in colors}
+        if values <= {0, 255, (0, 0, 0), (255, 255, 255)}:
+            return self._bilevel(img.convert('1'))
+        
+        if img.mode == 'RGB' and all(red == green == blue for red, green, blue in values):
+            img = img.convert('L')
+        
+        if not self._compresses_well(img):
+            return self._jpeg(img)
+        
+        if img.mode == 'L':
+            return self._flate(img, '/DeviceGray', 8)
+        
+        # With no more than 256 colors, median cut gives every color its own entry
+        indexed = img.quantize(len(colors))
+        highest = indexed.getextrema()[1]
+        palette = bytes(indexed.getpalette()[:3 * (highest + 1)])
+        colorspace = f"[/Indexed /DeviceRGB {highest} <{palette.hex()}>]"
+        return self._flate(indexed, colorspace, 8)
+    
+    @staticmethod
+    def _compresses_well(img: Image.Image) -> bool:
+        """
+        Flate a band from the middle of the image to tell graphics from photos:
+        few-color photos (grayscale or GIF photos) stay far above LOSSLESS_MAX_BITS_PER_PIXEL.
+        """
+        rows = max(1, min(img.height, _FLATE_BAND_BYTES // (img.width * len(img.getbands()))))
+        top = (img.height - rows) // 2
+        sample = img.crop((0, top, img.width, top + rows)).tobytes()
+        compressed = len(zlib.compress(sample, 6))
+        return compressed * 8 / (img.width * rows) <= LOSSLESS_MAX_BITS_PER_PIXEL
+    
+    def _bilevel(self, img: Image.Image) -> ImageData:
+        """Store a black-and-white image with CCITT Group 4, like fax machines and scanners do."""
+        if not self.ccitt_available:
+            return self._flate(img, '/DeviceGray', 1)
+        
+        # libtiff does the G4 coding; one strip holds the whole image
+        tiff = io.BytesIO()
+        img.save(tiff, 'TIFF', compression='group4', tiffinfo={278: img.height})
+        tiff.seek(0)
+        with Image.open(tiff) as encoded:
+            offset = encoded.tag_v2[273][0]
+            length = encoded.tag_v2[279][0]
+            black_is_1 = encoded.tag_v2.get(262) == 1  # Photometric: MinIsBlack
+        data = tiff.getbuffer()[offset:offset + length]
+        
+        entries = {
+            'Width': str(img.width),
+            'Height': str(img.height),
+            'ColorSpace': '/DeviceGray',
+            'BitsPerComponent': '1',
+            'Filter': '/CCITTFaxDecode',
+            'DecodeParms': f"<< /K -1 /Columns {img.width} /Rows {img.height} "
+                           f"/BlackIs1 {'true' if black_is_1 else 'false'} >>"
+        }
+        return entries, lambda output: output.write(data)
+    
+    @staticmethod
+    def _flate(img: Image.Image, colorspace: str, bits: int) -> ImageData:
+        """Store raw pixels with Flate (lossless), compressing a band of rows at a time."""
+        entries = {
+            'Width': str(img.width),
+            'Height': str(img.height),
+            'ColorSpace': colorspace,
+            'BitsPerComponent': str(bits),
+            'Filter': '/FlateDecode'
+        }
+        
+        def write_data(output: BinaryIO) -> None:
+            compressor = zlib.compressobj(6)
+            row_bytes = (img.width * len(img.getbands()) * bits + 7) // 8
+            band = max(1, _FLATE_BAND_BYTES // max(1, row_bytes))
+            for top in range(0, img.height, band):
+                rows = img.crop((0, top, img.width, min(top + band, img.height)))
+                output.write(compressor.compress(rows.tobytes()))
+            output.write(compressor.flush())
+        
+        return entries, write_data
+    
+    def _jpeg(self, img: Image.Image) -> ImageData:
+        """Store a photographic image as a new JPEG."""
+        entries = {
+            'Width': str(img.width),
+            'Height': str(img.height),
+            'ColorSpace': '/DeviceGray' if img.mode == 'L' else '/DeviceRGB',
+            'BitsPerComponent': '8',
+            'Filter': '/DCTDecode'
+        }
+        
+        def write_data(output: BinaryIO) -> None:
+            img.save(output, 'JPEG', quality=self.jpeg_quality)
+        
+        return entries, write_data
+
+
+# Global image encoder instance
+image_encoder = ImageEncoder()
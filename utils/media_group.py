@@ -0,0 +1,85 @@
+"""
+Media group collector for PDF Telegram Bot.
+Telegram delivers an album as separate updates; this gathers them so they can be handled as one batch.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Tuple
+from telegram import Message
+from telegram.ext import ContextTypes
+
+import config
+from .update_processor import UserSerialUpdateProcessor
+
+
+AlbumCallback = Callable[[List[Message], ContextTypes.DEFAULT_TYPE], Awaitable[None]]
+
+
+class MediaGroupCollector:
+    """Buffers album messages until no new part has arrived for a short while."""
+    
+    def __init__(self, delay: float = config.ALBUM_COLLECT_DELAY):
+        """
+        Initialize the collector.
+        
+        Args:
+            delay: Seconds of quiet after the last part before the album is handled
+        """
+        self.delay = delay
+        self._groups: Dict[Tuple[int, str], dict] = {}
+    
+    def add(
+        self,
+        message: Message,
+        context: ContextTypes.DEFAULT_TYPE,
+        callback: AlbumCallback
+    ) -> None:
+        """
+        Add an album part. The callback runs once with all parts, in message order.
+        
+        Args:
+            message: Message that is part of a media group
+            context: Telegram context object
+            callback: Async function receiving (messages, context)
+        """
+        key = (message.chat_id, message.media_group_id)
+        group = self._groups.get(key)
+        
+        if group is None:
+            group = {'messages': [], 'context': context, 'callback': callback, 'timer': None}
+            self._groups[key] = group
+        else:
+            group['timer'].cancel()
+        
+        group['messages'].append(message)
+        group['timer'] = asyncio.get_running_loop().call_later(self.delay, self._flush, key)
+    
+    def _flush(self, key: Tuple[int, str]) -> None:
+        """Hand a complete album to its callback."""
+        group = self._groups.pop(key, None)
+        if group is None:
+            return
+        
+        messages = sorted(group['messages'], key=lambda message: message.message_id)
+        group['context'].application.create_task(
+            self._run(messages, group['context'], group['callback'])
+        )
+    
+    @staticmethod
+    async def _run(
+        messages: List[Message],
+        context: ContextTypes.DEFAULT_TYPE,
+        callback: AlbumCallback
+    ) -> None:
+        """Run an album callback in the user's turn, like an update of that user."""
+        processor = context.application.update_processor
+        user = messages[0].from_user
+        if isinstance(processor, UserSerialUpdateProcessor) and user is not None:
+            async with processor.user_turn(user.id):
+                await callback(messages, context)
+        else:
+            await callback(messages, context)
+
+
+# Global media group collector instance
+media_groups = MediaGroupCollector()
@@ -0,0 +1,256 @@
+"""
+Page specifications for PDF Telegram Bot.
+Parses user page selections ("1-3,7", "5-end", "-3", "odd", "1-end,!4") into merged
+intervals, so even "1-999999999" costs one interval instead of a billion page numbers.
+"""
+
+import re
+from bisect import bisect_right
+from typing import Iterator, List, Tuple
+
+# Interval masks: which pages of [start, end] are selected
+ODD = 1
+EVEN = 2
+ALL = ODD | EVEN
+
+_ENDPOINT = r"(?:-?\d+|end(?:\s*-\s*\d+)?)"
+_TERM = re.compile(
+    rf"^(?P<exclude>!)?\s*"
+    rf"(?:(?P<keyword>all|odd|even)|(?P<start>{_ENDPOINT})(?:\s*(?:-|\.\.)\s*(?P<end>{_ENDPOINT}))?)"
+    rf"(?:\s+(?P<parity>odd|even))?$"
+)
+
+
+class PageSpec:
+    """
+    An ordered set of page numbers stored as disjoint (start, end, mask) intervals.
+    Parsing, counting and membership cost O(number of ranges), not O(number of pages).
+    """
+    
+    def __init__(self, intervals: List[Tuple[int, int, int]], total_pages: int):
+        """
+        Initialize from normalized intervals. Use PageSpec.parse or PageSpec.all instead.
+        
+        Args:
+            intervals: Sorted, disjoint (start, end, mask) tuples, ends aligned to the mask
+            total_pages: Number of pages in the document
+        """
+        self.intervals = intervals
+        self.total_pages = total_pages
+        self._starts = [start for start, _, _ in intervals]
+    
+    @classmethod
+    def all(cls, total_pages: int) -> "PageSpec":
+        """Every page of the document."""
+        return cls([(1, total_pages, ALL)] if total_pages > 0 else [], total_pages)
+    
+    @classmethod
+    def parse(cls, spec: str, total_pages: int) -> "PageSpec":
+        """
+        Parse a page specification.
+        
+        Terms are separated by commas:
+        - 5, 1-3, 2-end, 1..3       pages and ranges (ranges past the last page are clamped)
+        - -1, -3-end, end-2          counted from the end (-1 is the last page)
+        - all, odd, even, 1-10 odd   whole document or every other page
+        - !4, !10-12, !even          exclusions (a spec of only exclusions starts from all pages)
+        
+        Args:
+            spec: Page specification
+            total_pages: Number of pages in the document
+        
+        Returns:
+            PageSpec: Selected pages
+        
+        Raises:
+            ValueError: If a term is malformed, starts outside the document, or nothing is selected
+        """
+        includes = []
+        excludes = []
+        
+        for term in spec.lower().split(','):
+            term = term.strip()
+            if not term:
+                continue
+            
+            match = _TERM.match(term)
+            if not match:
+                raise ValueError(f"Invalid page specification: '{term}'")
+            
+            keyword = match.group('keyword')
+            if keyword:
+                start, end = 1, total_pages
+                mask = {'all': ALL, 'odd': ODD, 'even': EVEN}[keyword]
+            else:
+                start = cls._resolve(match.group('start'), total_pages)
+                end = cls._resolve(match.group('end'), total_pages) if match.group('end') else start
+                if start < 1 or start > total_pages:
+                    raise ValueError(f"Page {match.group('start')} is out of range (1-{total_pages})")
+                if end < start:
+                    raise ValueError(f"Invalid range '{term}': it ends before it starts")
+                end = min(end, total_pages)
+                mask = ALL
+            
+            parity = match.group('parity')
+            if parity:
+                mask &= ODD if parity == 'odd' else EVEN
+            
+            (excludes if match.group('exclude') else includes).append((start, end, mask))
+        
+        if excludes and not includes:
+            includes.append((1, total_pages, ALL))
+        
+        page_spec = cls(cls._combine(includes, excludes), total_pages)
+        if not page_spec:
+            raise ValueError("No valid pages specified")
+        return page_spec
+    
+    @staticmethod
+    def _resolve(endpoint: str, total_pages: int) -> int:
+        """Turn one endpoint ("7", "-2", "end", "end-3") into a page number."""
+        endpoint = endpoint.replace(' ', '')
+        if endpoint == 'end':
+            return total_pages
+        if endpoint.startswith('end-'):
+            return total_pages - int(endpoint[4:])
+        number = int(endpoint)
+        if number < 0:
+            return total_pages + 1 + number
+        if number == 0:
+            raise ValueError("Page numbers start at 1")
+        return number
+    
+    @staticmethod
+    def _combine(
+        includes: List[Tuple[int, int, int]],
+        excludes: List[Tuple[int, int, int]]
+    ) -> List[Tuple[int, int, int]]:
+        """
+        Merge included terms minus excluded ones into disjoint intervals with one sweep
+        over the range boundaries.
+        """
+        events = []  # (position, is_exclude, mask, +1/-1)
+        for terms, is_exclude in ((includes, False), (excludes, True)):
+            for start, end, mask in terms:
+                events.append((start, is_exclude, mask, 1))
+                events.append((end + 1, is_exclude, mask, -1))
+        events.sort(key=lambda event: event[0])
+        
+        # Active term counts per (is_exclude, parity bit)
+        counts = {(False, ODD): 0, (False, EVEN): 0, (True, ODD): 0, (True, EVEN): 0}
+        
+        def active(is_exclude: bool) -> int:
+            return sum(bit for bit in (ODD, EVEN) if counts[(is_exclude, bit)] > 0)
+        
+        segments = []
+        for index, (position, is_exclude, mask, delta) in enumerate(events):
+            for bit in (ODD, EVEN):
+                if mask & bit:
+                    counts[(is_exclude, bit)] += delta
+            
+            # Apply all events at a position before looking at the segment after it
+            if index + 1 < len(events) and events[index + 1][0] == position:
+                continue
+            if index + 1 == len(events):
+                break
+            
+            mask = active(False) & ~active(True)
+            end = events[index + 1][0] - 1
+            if not mask:
+                continue
+            if segments and segments[-1][2] == mask and segments[-1][1] + 1 == position:
+                segments[-1] = (segments[-1][0], end, mask)
+            else:
+                segments.append((position, end, mask))
+        
+        # Align each interval to its parity
+        intervals = []
+        for start, end, mask in segments:
+            if mask != ALL:
+                wanted = 1 if mask == ODD else 0
+                if start % 2 != wanted:
+                    start += 1
+                if end % 2 != wanted:
+                    end -= 1
+            if start > end:
+                continue
+            
+            # A single page has no parity, so equal selections get equal intervals
+            if start == end:
+                mask = ALL
+            if intervals and mask == ALL and intervals[-1][2] == ALL and intervals[-1][1] + 1 == start:
+                intervals[-1] = (intervals[-1][0], end, ALL)
+            else:
+                intervals.append((start, end, mask))
+        return intervals
+    
+    def __len__(self) -> int:
+        return sum(
+            end - start + 1 if mask == ALL else (end - start) // 2 + 1
+            for start, end, mask in self.intervals
+        )
+    
+    def __bool__(self) -> bool:
+        return bool(self.intervals)
+    
+    def __iter__(self) -> Iterator[int]:
+        for start, end, mask in self.intervals:
+            yield from range(start, end + 1, 1 if mask == ALL else 2)
+    
+    def __contains__(self, page: int) -> bool:
+        index = bisect_right(self._starts, page) - 1
+        if index < 0:
+            return False
+        start, end, mask = self.intervals[index]
+        return page <= end and (mask == ALL or (page - start) % 2 == 0)
+    
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PageSpec) and self.intervals == other.intervals
+    
+    def __repr__(self) -> str:
+        return f"PageSpec('{self.describe()}', total_pages={self.total_pages})"
+    
+    @property
+    def first(self) -> int:
+        """First selected page."""
+        return self.intervals[0][0]
+    
+    @property
+    def last(self) -> int:
+        """Last selected page."""
+        return self.intervals[-1][1]
+    
+    def runs(self, max_pages: int = 0) -> Iterator[Tuple[int, int]]:
+        """
+        Yield consecutive page runs as (first, last), for tools that take page ranges.
+        
+        Args:
+            max_pages: Split runs longer than this (0 = no limit)
+        
+        Yields:
+            Tuple[int, int]: First and last page of each run, in order
+        """
+        for start, end, mask in self.intervals:
+            if mask != ALL:
+                for page in range(start, end + 1, 2):
+                    yield page, page
+                continue
+            
+            step = max_pages if max_pages > 0 else end - start + 1
+            for first in range(start, end + 1, step):
+                yield first, min(first + step - 1, end)
+    
+    def describe(self) -> str:
+        """
+        Describe the selection compactly (e.g., "1-3,7,9-19 odd"); parse() accepts the result.
+        
+        Returns:
+            str: Normalized specification
+        """
+        parts = []
+        for start, end, mask in self.intervals:
+            text = str(start) if start == end else f"{start}-{end}"
+            if mask != ALL and start != end:
+                text += " odd" if mask == ODD else " even"
+            parts.append(text)
+        return ",".join(parts)
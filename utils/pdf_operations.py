@@ -4,15 +4,26 @@ Handles PDF merging, splitting, compression, format conversions, and password pr
 """
 
 import io
+import re
+import time
+import zlib
+import uuid
+import shutil
+import threading
 import subprocess
 from pathlib import Path
-from typing import List, Tuple, Optional
-from PIL import Image
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Tuple, Optional
 import PyPDF2
 import pikepdf
 from pdf2image import convert_from_path
 
 import config
+from .compression_planner import compression_planner
+from .page_spec import PageSpec
+from .pdf_writer import StreamingPDFWriter
+from .image_encoder import image_encoder, PreparedImage
 
 
 class PDFOperations:
@@ -40,26 +51,217 @@ class PDFOperations:
         if len(pdf_paths) > config.MAX_MERGE_FILES:
             raise ValueError(f"Maximum {config.MAX_MERGE_FILES} files can be merged at once")
         
+        for pdf_path in pdf_paths:
+            if not pdf_path.exists():
+                raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+        
         try:
-            merger = PyPDF2.PdfMerger()
-            
-            # Add each PDF to merger
-            for pdf_path in pdf_paths:
-                if not pdf_path.exists():
-                    raise FileNotFoundError(f"PDF file not found: {pdf_path}")
-                merger.append(str(pdf_path))
-            
-            # Write merged PDF
-            with open(output_path, 'wb') as output_file:
-                merger.write(output_file)
-            
-            merger.close()
+            if config.MERGE_BACKEND == "pypdf2":
+                PDFOperations._merge_pypdf2(pdf_paths, output_path)
+            else:
+                PDFOperations._merge_pikepdf(pdf_paths, output_path)
             return True
         
         except Exception as e:
             print(f"Error merging PDFs: {e}")
             raise
     
+    @staticmethod
+    def _merge_pypdf2(pdf_paths: List[Path], output_path: Path) -> None:
+        """Merge with PyPDF2 (parses every object of every input in Python)."""
+        merger = PyPDF2.PdfMerger()
+        
+        # Add each PDF to merger
+        for pdf_path in pdf_paths:
+            merger.append(str(pdf_path))
+        
+        # Write merged PDF
+        with open(output_path, 'wb') as output_file:
+            merger.write(output_file)
+        
+        merger.close()
+    
+    @staticmethod
+    def _merge_pikepdf(pdf_paths: List[Path], output_path: Path) -> None:
+        """
+        Merge with qpdf: objects are copied in C++ without parsing content streams,
+        and the output is written straight to disk.
+        Bookmarks of each input are kept, pointing at the merged pages.
+        """
+        sources = []
+        try:
+            with pikepdf.new() as merged:
+                outline_items = []
+                for pdf_path in pdf_paths:
+                    source = pikepdf.open(pdf_path)
+                    sources.append(source)
+                    
+                    offset = len(merged.pages)
+                    merged.pages.extend(source.pages)
+                    outline_items.extend(PDFOperations._copy_outline(source, offset))
+                
+                if outline_items:
+                    with merged.open_outline() as outline:
+                        outline.root.extend(outline_items)
+                
+                if config.MERGE_DEDUPLICATE:
+                    PDFOperations._deduplicate_resources(merged)
+                
+                merged.save(
+                    output_path,
+                    object_stream_mode=pikepdf.ObjectStreamMode.generate
+                )
+        
+        finally:
+            for source in sources:
+                source.close()
+    
+    @staticmethod
+    def _copy_outline(source: pikepdf.Pdf, page_offset: int) -> List[pikepdf.OutlineItem]:
+        """
+        Rebuild an input's bookmarks for the merged document.
+        
+        Args:
+            source: Input PDF
+            page_offset: Index of the input's first page in the merged document
+        
+        Returns:
+            List[pikepdf.OutlineItem]: Top-level bookmarks with page-number destinations
+        """
+        page_numbers = {page.obj.objgen: index for index, page in enumerate(source.pages)}
+        
+        def convert(item: pikepdf.OutlineItem) -> pikepdf.OutlineItem:
+            destination = item.destination
+            if destination is None and item.action is not None:
+                destination = item.action.get('/D')
+            
+            page_number = None
+            if isinstance(destination, pikepdf.Array) and len(destination) > 0:
+                target = destination[0]
+                if isinstance(target, pikepdf.Dictionary):
+                    page_number = page_numbers.get(target.objgen)
+            
+            copy = pikepdf.OutlineItem(
+                item.title,
+                destination=page_offset + page_number if page_number is not None else None
+            )
+            copy.children.extend(convert(child) for child in item.children)
+            return copy
+        
+        try:
+            with source.open_outline() as outline:
+                return [convert(item) for item in outline.root]
+        except Exception as e:
+            print(f"Skipping unreadable bookmarks: {e}")
+            return []
+    
+    @staticmethod
+    def _deduplicate_resources(pdf: pikepdf.Pdf) -> int:
+        """
+        Point all uses of byte-identical images and embedded font programs at one copy.
+        Inputs made from the same template (logos, fonts) otherwise carry one copy each;
+        unreferenced duplicates are dropped when the PDF is saved.
+        
+        Args:
+            pdf: PDF to deduplicate in place
+        
+        Returns:
+            int: Number of duplicate streams removed
+        """
+        first_of_shape: Dict[tuple, Optional[pikepdf.Stream]] = {}  # (length, dictionary) -> unread stream
+        by_content: Dict[tuple, List[pikepdf.Stream]] = {}  # (length, dictionary, crc32) -> distinct streams
+        canonical: Dict[tuple, pikepdf.Stream] = {}  # objgen -> stream to use instead
+        visited = set()
+        removed = 0
+        
+        def bucket(shape: tuple, data: bytes) -> List[pikepdf.Stream]:
+            return by_content.setdefault(shape + (zlib.crc32(data),), [])
+        
+        def dictionary_key(stream: pikepdf.Stream) -> tuple:
+            return tuple(sorted(
+                (str(key), value.objgen if getattr(value, 'is_indirect', False) else repr(value))
+                for key, value in stream.items()
+                if key != '/Length'
+            ))
+        
+        def deduplicate(stream: pikepdf.Stream) -> pikepdf.Stream:
+            nonlocal removed
+            if stream.objgen in canonical:
+                return canonical[stream.objgen]
+            
+            # Soft masks first, so images sharing a mask compare equal
+            smask = stream.get('/SMask')
+            if isinstance(smask, pikepdf.Stream):
+                stream.SMask = deduplicate(smask)
+            
+            # Only read streams whose size and dictionary match another stream
+            shape = (int(stream.get('/Length', 0)), dictionary_key(stream))
+            result = stream
+            if shape not in first_of_shape:
+                first_of_shape[shape] = stream
+            else:
+                first = first_of_shape[shape]
+                if first is not None:
+                    bucket(shape, first.read_raw_bytes()).append(first)
+                    first_of_shape[shape] = None
+                
+                data = stream.read_raw_bytes()
+                same_checksum = bucket(shape, data)
+                for other in same_checksum:
+                    if other.read_raw_bytes() == data:
+                        result = other
+                        removed += 1
+                        break
+                else:
+                    same_checksum.append(stream)
+            
+            canonical[stream.objgen] = result
+            return result
+        
+        def visit_font(font: pikepdf.Dictionary) -> None:
+            for part in [font] + list(font.get('/DescendantFonts', [])):
+                descriptor = part.get('/FontDescriptor')
+                if not isinstance(descriptor, pikepdf.Dictionary):
+                    continue
+                for key in ('/FontFile', '/FontFile2', '/FontFile3'):
+                    program = descriptor.get(key)
+                    if isinstance(program, pikepdf.Stream):
+                        descriptor[key] = deduplicate(program)
+        
+        def visit_resources(resources: pikepdf.Dictionary) -> None:
+            if resources.is_indirect:
+                if resources.objgen in visited:
+                    return
+                visited.add(resources.objgen)
+            
+            xobjects = resources.get('/XObject')
+            if isinstance(xobjects, pikepdf.Dictionary):
+                for name in list(xobjects.keys()):
+                    xobject = xobjects[name]
+                    if not isinstance(xobject, pikepdf.Stream):
+                        continue
+                    if xobject.get('/Subtype') == pikepdf.Name.Image:
+                        xobjects[name] = deduplicate(xobject)
+                    elif xobject.get('/Subtype') == pikepdf.Name.Form:
+                        nested = xobject.get('/Resources')
+                        if isinstance(nested, pikepdf.Dictionary) and xobject.objgen not in visited:
+                            visited.add(xobject.objgen)
+                            visit_resources(nested)
+            
+            fonts = resources.get('/Font')
+            if isinstance(fonts, pikepdf.Dictionary):
+                for name in list(fonts.keys()):
+                    font = fonts[name]
+                    if isinstance(font, pikepdf.Dictionary):
+                        visit_font(font)
+        
+        for page in pdf.pages:
+            resources = page.obj.get('/Resources')
+            if isinstance(resources, pikepdf.Dictionary):
+                visit_resources(resources)
+        
+        return removed
+    
     @staticmethod
     def split_pdf(
         pdf_path: Path,
@@ -90,77 +292,139 @@ class PDFOperations:
                 reader = PyPDF2.PdfReader(pdf_file)
                 total_pages = len(reader.pages)
                 
-                # Parse page specification
-                page_numbers = PDFOperations._parse_page_spec(pages, total_pages)
-                
-                if not page_numbers:
-                    raise ValueError("No valid pages specified")
+                # Parse page specification (validated and clamped to the document)
+                page_spec = PageSpec.parse(pages, total_pages)
                 
                 # Create new PDF with specified pages
                 writer = PyPDF2.PdfWriter()
                 
-                for page_num in page_numbers:
-                    if 1 <= page_num <= total_pages:
-                        writer.add_page(reader.pages[page_num - 1])  # Convert to 0-indexed
-                    else:
-                        raise ValueError(f"Page {page_num} is out of range (1-{total_pages})")
+                for page_num in page_spec:
+                    writer.add_page(reader.pages[page_num - 1])  # Convert to 0-indexed
                 
                 # Write extracted pages
                 with open(output_path, 'wb') as output_file:
                     writer.write(output_file)
                 
-                return True, len(page_numbers)
+                return True, len(page_spec)
         
         except Exception as e:
             print(f"Error splitting PDF: {e}")
             raise
     
     @staticmethod
-    def _parse_page_spec(spec: str, total_pages: int) -> List[int]:
+    def is_multi_part_spec(spec: str) -> bool:
+        """
+        Check whether a /split argument asks for several output files.
+        
+        Args:
+            spec: Page specification from the user
+        
+        Returns:
+            bool: True for group lists ("1-10;11-end") and "every N"
+        """
+        spec = spec.strip().lower()
+        return ';' in spec or spec.startswith('every')
+    
+    @staticmethod
+    def split_pdf_parts(
+        pdf_path: Path,
+        groups: str,
+        output_dir: Path
+    ) -> List[Path]:
+        """
+        Split a PDF into several files in one pass.
+        The source is opened once; parts are then written to disk concurrently.
+        
+        Args:
+            pdf_path: Path to source PDF
+            groups: Page groups separated by ";" (e.g., "1-10;11-20;21-end") or "every N"
+            output_dir: Directory where the parts are saved
+        
+        Returns:
+            List[Path]: Part files in order, named part<N>_pages_<range>.pdf
+        
+        Raises:
+            ValueError: If the group specification is invalid
+            Exception: If split operation fails
+        """
+        if not pdf_path.exists():
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+        
+        output_dir.mkdir(parents=True, exist_ok=True)
+        parts = []
+        
+        try:
+            with pikepdf.open(pdf_path) as source:
+                page_groups = PDFOperations._parse_page_groups(groups, len(source.pages))
+                
+                # Copying pages needs the source; writing the parts doesn't
+                for number, page_spec in enumerate(page_groups, 1):
+                    part = pikepdf.new()
+                    part.pages.extend(source.pages[page - 1] for page in page_spec)
+                    label = page_spec.describe().replace(' ', '_')
+                    if len(label) > 40:
+                        label = f"{page_spec.first}-{page_spec.last}"
+                    parts.append((part, output_dir / f"part{number:02d}_pages_{label}.pdf"))
+            
+            def write(item: Tuple[pikepdf.Pdf, Path]) -> Path:
+                part, part_path = item
+                part.save(part_path)
+                return part_path
+            
+            with ThreadPoolExecutor(max_workers=max(1, min(config.SPLIT_WRITE_THREADS, len(parts)))) as pool:
+                return list(pool.map(write, parts))
+        
+        except Exception as e:
+            print(f"Error splitting PDF into parts: {e}")
+            raise
+        
+        finally:
+            for part, _ in parts:
+                part.close()
+    
+    @staticmethod
+    def _parse_page_groups(spec: str, total_pages: int) -> List[PageSpec]:
         """
-        Parse page specification string into list of page numbers.
+        Parse a multi-part specification into one page selection per part.
         
         Args:
-            spec: Page specification (e.g., "1-3", "1,3,5", "2-end")
+            spec: "every N" or page specifications separated by ";"
             total_pages: Total number of pages in PDF
             
         Returns:
-            List[int]: List of page numbers to extract
+            List[PageSpec]: Pages of each part
+        
+        Raises:
+            ValueError: If a group is invalid, or there are too many parts
         """
-        pages = []
-        parts = spec.split(',')
+        spec = spec.strip().lower()
         
-        for part in parts:
-            part = part.strip()
-            
-            if '-' in part:
-                # Range specification (e.g., "1-3" or "2-end")
-                range_parts = part.split('-')
-                if len(range_parts) != 2:
-                    continue
-                
-                start = range_parts[0].strip()
-                end = range_parts[1].strip()
-                
-                # Handle "end" keyword
-                if end.lower() == 'end':
-                    end = str(total_pages)
-                
-                try:
-                    start_num = int(start)
-                    end_num = int(end)
-                    pages.extend(range(start_num, end_num + 1))
-                except ValueError:
-                    continue
-            else:
-                # Single page number
-                try:
-                    pages.append(int(part))
-                except ValueError:
-                    continue
+        if spec.startswith('every'):
+            size = spec[len('every'):].strip()
+            if not size.isdigit() or int(size) < 1:
+                raise ValueError("Use 'every N' with a page count, e.g. every 5")
+            size = int(size)
+            if (total_pages + size - 1) // size > config.MAX_SPLIT_PARTS:
+                raise ValueError(f"Maximum {config.MAX_SPLIT_PARTS} parts per split")
+            return [
+                PageSpec.parse(f"{first}-{first + size - 1}", total_pages)
+                for first in range(1, total_pages + 1, size)
+            ]
         
-        # Remove duplicates and sort
-        return sorted(list(set(pages)))
+        groups = []
+        for number, group in enumerate(spec.split(';'), 1):
+            if not group.strip():
+                continue
+            try:
+                groups.append(PageSpec.parse(group, total_pages))
+            except ValueError as e:
+                raise ValueError(f"Part {number} ({group.strip()}): {e}")
+            if len(groups) > config.MAX_SPLIT_PARTS:
+                raise ValueError(f"Maximum {config.MAX_SPLIT_PARTS} parts per split")
+        
+        if not groups:
+            raise ValueError("No valid pages specified")
+        return groups
     
     @staticmethod
     def compress_pdf_advanced(
@@ -184,28 +448,59 @@ class PDFOperations:
         
         original_size = pdf_path.stat().st_size / (1024 * 1024)
         
+        # Determine quality level based on target
+        if target['type'] == 'quality':
+            # Simple quality-based compression
+            quality_level = target['value']
+            return PDFOperations.compress_pdf(pdf_path, output_path, quality_level)
+        
+        # For percentage or size targets, try progressively lower quality levels
+        quality_levels = ['high', 'default', 'low']
+        
+        # Calculate target size in MB
+        if target['type'] == 'percentage':
+            target_size_mb = original_size * (target['value'] / 100)
+        else:  # size target
+            target_size_mb = target['value']
+        
+        print(f"Original size: {original_size:.2f} MB, Target: {target_size_mb:.2f} MB")
+        
+        if config.COMPRESSION_PLANNER:
+            try:
+                planned_size = PDFOperations._compress_planned(pdf_path, output_path, target_size_mb)
+                if planned_size is not None:
+                    return True, original_size, planned_size
+            except Exception as e:
+                print(f"Planned compression failed: {e}, searching quality levels")
+        
+        if config.PARALLEL_COMPRESSION:
+            try:
+                best_size, best_quality = PDFOperations._compress_parallel(
+                    pdf_path,
+                    output_path,
+                    target_size_mb,
+                    quality_levels
+                )
+                print(f"Using result from {best_quality} quality: {best_size:.2f} MB")
+                return True, original_size, best_size
+            except FileNotFoundError:
+                # Ghostscript not installed - sequential path falls back to pikepdf
+                print("Ghostscript not available, compressing sequentially")
+            except Exception as e:
+                print(f"Parallel compression failed: {e}, compressing sequentially")
+        
+        # Unique temp names so concurrent jobs never collide
+        run_id = uuid.uuid4().hex[:8]
+        temp_outputs = {
+            quality: output_path.parent / f"temp_{quality}_{run_id}.pdf"
+            for quality in quality_levels
+        }
+        best_result = None
+        
         try:
-            # Determine quality level based on target
-            if target['type'] == 'quality':
-                # Simple quality-based compression
-                quality_level = target['value']
-                return PDFOperations.compress_pdf(pdf_path, output_path, quality_level)
-            
-            # For percentage or size targets, try progressively lower quality levels
-            quality_levels = ['high', 'default', 'low']
-            best_result = None
-            
-            # Calculate target size in MB
-            if target['type'] == 'percentage':
-                target_size_mb = original_size * (target['value'] / 100)
-            else:  # size target
-                target_size_mb = target['value']
-            
-            print(f"Original size: {original_size:.2f} MB, Target: {target_size_mb:.2f} MB")
-            
             # Try each quality level until we meet or exceed the target
             for quality in quality_levels:
-                temp_output = output_path.parent / f"temp_{quality}.pdf"
+                temp_output = temp_outputs[quality]
                 
                 try:
                     print(f"Trying compression with quality: {quality}")
@@ -245,21 +540,11 @@ class PDFOperations:
             
             # Use best result found
             if best_result:
-                import shutil
                 best_path, best_size, best_quality = best_result
                 
                 # Move best result to output path
                 shutil.move(str(best_path), str(output_path))
                 
-                # Clean up any remaining temp files
-                for quality in quality_levels:
-                    temp_file = output_path.parent / f"temp_{quality}.pdf"
-                    if temp_file.exists():
-                        try:
-                            temp_file.unlink()
-                        except:
-                            pass
-                
                 print(f"Using result from {best_quality} quality: {best_size:.2f} MB")
                 return True, original_size, best_size
             else:
@@ -268,15 +553,177 @@ class PDFOperations:
         
         except Exception as e:
             print(f"Advanced compression failed: {e}")
-            # Clean up any temp files
-            for quality in ['high', 'default', 'low']:
-                temp_file = output_path.parent / f"temp_{quality}.pdf"
+            raise
+        
+        finally:
+            # Clean up any remaining temp files
+            for temp_file in temp_outputs.values():
                 if temp_file.exists():
                     try:
                         temp_file.unlink()
-                    except:
+                    except OSError:
+                        pass
+    
+    @staticmethod
+    def _compress_planned(
+        pdf_path: Path,
+        output_path: Path,
+        target_size_mb: float
+    ) -> Optional[float]:
+        """
+        Compress in a single full Ghostscript pass using settings predicted from sample pages.
+        
+        Args:
+            pdf_path: Path to source PDF
+            output_path: Path where compressed PDF should be saved
+            target_size_mb: Target size in MB
+        
+        Returns:
+            Optional[float]: Compressed size MB, or None if no plan could be made
+                             or the result missed the target (output is discarded)
+        """
+        plan = compression_planner.plan(pdf_path, target_size_mb, output_path.parent)
+        if plan is None:
+            return None
+        
+        print(
+            f"Planned compression: {plan['image_dpi']} DPI, JPEG quality {plan['jpeg_quality']} "
+            f"(predicted {plan['predicted_mb']:.2f} MB)"
+        )
+        
+        temp_output = output_path.parent / f"temp_planned_{uuid.uuid4().hex[:8]}.pdf"
+        try:
+            result = subprocess.run(
+                PDFOperations._ghostscript_command(
+                    pdf_path,
+                    temp_output,
+                    plan['gs_quality'],
+                    image_dpi=plan['image_dpi'],
+                    jpeg_quality=plan['jpeg_quality']
+                ),
+                capture_output=True,
+                text=True,
+                timeout=config.OPERATION_TIMEOUT
+            )
+            
+            if result.returncode != 0 or not temp_output.exists():
+                raise Exception(f"Ghostscript compression failed: {result.stderr}")
+            
+            compressed_size = temp_output.stat().st_size / (1024 * 1024)
+            print(f"Result: {compressed_size:.2f} MB with planned settings")
+            
+            # Same 15% tolerance as the quality level search; if even the most
+            # aggressive plan point misses, the quality levels won't do better
+            if compressed_size > target_size_mb * 1.15 and not plan['most_aggressive']:
+                return None
+            
+            shutil.move(str(temp_output), str(output_path))
+            return compressed_size
+        
+        finally:
+            if temp_output.exists():
+                try:
+                    temp_output.unlink()
+                except OSError:
+                    pass
+    
+    @staticmethod
+    def _compress_parallel(
+        pdf_path: Path,
+        output_path: Path,
+        target_size_mb: float,
+        quality_levels: List[str]
+    ) -> Tuple[float, str]:
+        """
+        Run Ghostscript for all quality levels at once and keep the best one that meets the target.
+        
+        The highest quality level that lands within 15% of the target wins as soon as
+        every higher quality level has finished; remaining processes are killed.
+        If no level meets the target, the smallest result is used.
+        
+        Args:
+            pdf_path: Path to source PDF
+            output_path: Path where compressed PDF should be saved
+            target_size_mb: Target size in MB
+            quality_levels: Quality levels to try, best quality first
+        
+        Returns:
+            Tuple[float, str]: (Compressed size MB, quality level used)
+        
+        Raises:
+            FileNotFoundError: If Ghostscript is not installed
+            Exception: If every Ghostscript run fails or times out
+        """
+        run_id = uuid.uuid4().hex[:8]
+        processes = {}
+        results = {}  # quality -> size in MB, or None if that run failed
+        
+        try:
+            # Launch one Ghostscript process per quality level
+            for quality in quality_levels:
+                temp_output = output_path.parent / f"temp_{quality}_{run_id}.pdf"
+                process = subprocess.Popen(
+                    PDFOperations._ghostscript_command(
+                        pdf_path,
+                        temp_output,
+                        config.COMPRESSION_LEVELS[quality]
+                    ),
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                )
+                processes[quality] = (process, temp_output)
+            
+            deadline = time.monotonic() + config.OPERATION_TIMEOUT
+            chosen = None
+            
+            while chosen is None:
+                # Collect finished runs
+                for quality, (process, temp_output) in processes.items():
+                    if quality in results or process.poll() is None:
+                        continue
+                    
+                    if process.returncode == 0 and temp_output.exists():
+                        results[quality] = temp_output.stat().st_size / (1024 * 1024)
+                        print(f"Result: {results[quality]:.2f} MB with {quality} quality")
+                    else:
+                        results[quality] = None
+                        print(f"Compression with {quality} failed (exit code {process.returncode})")
+                
+                # Walk levels best quality first; stop at the first one still running
+                for quality in quality_levels:
+                    if quality not in results:
+                        break
+                    size = results[quality]
+                    if size is not None and size <= target_size_mb * 1.15:
+                        print(f"Target met with {quality} quality!")
+                        chosen = quality
+                        break
+                else:
+                    # Everything finished without meeting the target - use the smallest result
+                    finished = {q: size for q, size in results.items() if size is not None}
+                    if not finished:
+                        raise Exception("All compression attempts failed")
+                    chosen = min(finished, key=finished.get)
+                
+                if chosen is None:
+                    if time.monotonic() > deadline:
+                        raise Exception("Compression timed out")
+                    time.sleep(0.2)
+            
+            shutil.move(str(processes[chosen][1]), str(output_path))
+            return results[chosen], chosen
+        
+        finally:
+            # Kill runs we no longer need and remove their output
+            for process, temp_output in processes.values():
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+                if temp_output.exists():
+                    try:
+                        temp_output.unlink()
+                    except OSError:
                         pass
-            raise
     
     @staticmethod
     def compress_pdf(
@@ -314,20 +761,7 @@ class PDFOperations:
             
             # Try Ghostscript compression first (most effective)
             try:
-                gs_command = [
-                    'gs',
-                    '-sDEVICE=pdfwrite',
-                    '-dCompatibilityLevel=1.4',
-                    f'-dPDFSETTINGS={gs_quality}',
-                    '-dNOPAUSE',
-                    '-dQUIET',
-                    '-dBATCH',
-                    '-dDetectDuplicateImages=true',
-                    '-dCompressFonts=true',
-                    '-r150',  # Reduce image resolution to 150 DPI
-                    f'-sOutputFile={output_path}',
-                    str(pdf_path)
-                ]
+                gs_command = PDFOperations._ghostscript_command(pdf_path, output_path, gs_quality)
                 
                 result = subprocess.run(
                     gs_command,
@@ -368,6 +802,68 @@ class PDFOperations:
             print(f"Error compressing PDF: {e}")
             raise
     
+    @staticmethod
+    def _ghostscript_command(
+        pdf_path: Path,
+        output_path: Path,
+        gs_quality: str,
+        image_dpi: Optional[int] = None,
+        jpeg_quality: Optional[int] = None
+    ) -> List[str]:
+        """
+        Build the Ghostscript command line for PDF compression.
+        
+        Args:
+            pdf_path: Path to source PDF
+            output_path: Path where compressed PDF should be saved
+            gs_quality: Ghostscript PDFSETTINGS value (e.g. "/ebook")
+            image_dpi: Optional custom color/gray image resolution
+            jpeg_quality: Optional custom JPEG quality (0-100), re-encodes all images as JPEG
+        
+        Returns:
+            List[str]: Command and arguments
+        """
+        command = [
+            'gs',
+            '-sDEVICE=pdfwrite',
+            '-dCompatibilityLevel=1.4',
+            f'-dPDFSETTINGS={gs_quality}',
+            '-dNOPAUSE',
+            '-dQUIET',
+            '-dBATCH',
+            '-dDetectDuplicateImages=true',
+            '-dCompressFonts=true',
+            '-r150',  # Reduce image resolution to 150 DPI
+        ]
+        
+        if image_dpi is not None:
+            command += [
+                '-dDownsampleColorImages=true',
+                '-dDownsampleGrayImages=true',
+                '-dColorImageDownsampleType=/Bicubic',
+                '-dGrayImageDownsampleType=/Bicubic',
+                '-dColorImageDownsampleThreshold=1.0',
+                '-dGrayImageDownsampleThreshold=1.0',
+                f'-dColorImageResolution={image_dpi}',
+                f'-dGrayImageResolution={image_dpi}',
+            ]
+        
+        if jpeg_quality is not None:
+            command += [
+                '-dPassThroughJPEGImages=false',
+                '-dAutoFilterColorImages=false',
+                '-dAutoFilterGrayImages=false',
+                '-dColorImageFilter=/DCTEncode',
+                '-dGrayImageFilter=/DCTEncode',
+                f'-dJPEGQ={jpeg_quality}',
+            ]
+        
+        command += [
+            f'-sOutputFile={output_path}',
+            str(pdf_path)
+        ]
+        return command
+    
     @staticmethod
     def pdf_to_images(
         pdf_path: Path,
@@ -376,7 +872,8 @@ class PDFOperations:
     ) -> List[Path]:
         """
         Convert PDF pages to individual image files.
-        Optimized for faster conversion on limited resources.
+        Pages are rendered in chunks straight to disk, so memory use
+        doesn't grow with the page count.
         
         Args:
             pdf_path: Path to source PDF
@@ -389,34 +886,93 @@ class PDFOperations:
         Raises:
             Exception: If conversion fails
         """
+        image_paths = []
+        for chunk in PDFOperations.iter_pdf_images(pdf_path, output_dir, format):
+            image_paths.extend(chunk)
+        return image_paths
+    
+    @staticmethod
+    def iter_pdf_images(
+        pdf_path: Path,
+        output_dir: Path,
+        format: str = "PNG",
+        chunk_pages: int = config.RENDER_CHUNK_PAGES
+    ) -> Iterator[List[Path]]:
+        """
+        Render PDF pages to image files chunk by chunk.
+        
+        Args:
+            pdf_path: Path to source PDF
+            output_dir: Directory where images should be saved
+            format: Image format (PNG, JPEG, etc.)
+            chunk_pages: Number of pages to render per chunk
+        
+        Yields:
+            List[Path]: Image paths for each rendered chunk, in page order
+        """
+        if not pdf_path.exists():
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+        
+        total_pages = PDFOperations.get_pdf_info(pdf_path)['pages']
+        if total_pages < 1:
+            raise ValueError("Could not read pages from PDF")
+        
+        for first_page in range(1, total_pages + 1, chunk_pages):
+            last_page = min(first_page + chunk_pages - 1, total_pages)
+            yield PDFOperations.render_pages(pdf_path, output_dir, format, first_page, last_page)
+    
+    @staticmethod
+    def render_pages(
+        pdf_path: Path,
+        output_dir: Path,
+        format: str = "PNG",
+        first_page: int = 1,
+        last_page: Optional[int] = None
+    ) -> List[Path]:
+        """
+        Render a range of PDF pages directly to image files with poppler.
+        Images are never loaded into memory.
+        
+        Args:
+            pdf_path: Path to source PDF
+            output_dir: Directory where images should be saved
+            format: Image format (PNG, JPEG, etc.)
+            first_page: First page to render (1-based)
+            last_page: Last page to render (inclusive, None for last page)
+        
+        Returns:
+            List[Path]: Paths named page_NNN.<format>, in page order
+        
+        Raises:
+            Exception: If rendering fails
+        """
         if not pdf_path.exists():
             raise FileNotFoundError(f"PDF file not found: {pdf_path}")
         
         output_dir.mkdir(parents=True, exist_ok=True)
         
         try:
-            # Convert PDF to images with optimized settings
-            # Reduced DPI from 200 to 150 for faster processing (still good quality)
-            # Added thread_count for multi-threaded conversion
-            images = convert_from_path(
+            prefix = f"render_{uuid.uuid4().hex[:8]}"
+            
+            # pdftoppm writes each page to disk; we only get paths back
+            rendered = convert_from_path(
                 str(pdf_path),
-                dpi=150,  # Reduced for faster processing while maintaining quality
+                dpi=config.RENDER_DPI,
                 fmt=format.lower(),
-                thread_count=2  # Use 2 threads for faster processing
+                first_page=first_page,
+                last_page=last_page,
+                output_folder=str(output_dir),
+                output_file=prefix,
+                paths_only=True,
+                jpegopt={'quality': 85, 'optimize': True} if format.upper() == "JPEG" else None
             )
             
             image_paths = []
             
-            # Save each page as separate image
-            for i, image in enumerate(images, start=1):
-                image_path = output_dir / f"page_{i:03d}.{format.lower()}"
-                
-                # For JPEG, use quality setting to balance size/quality
-                if format.upper() == "JPEG":
-                    image.save(str(image_path), format.upper(), quality=85, optimize=True)
-                else:
-                    image.save(str(image_path), format.upper(), optimize=True)
-                
+            # Rename to stable page-numbered names
+            for page_num, rendered_path in enumerate(rendered, start=first_page):
+                image_path = output_dir / f"page_{page_num:03d}.{format.lower()}"
+                Path(rendered_path).replace(image_path)
                 image_paths.append(image_path)
             
             return image_paths
@@ -450,51 +1006,60 @@ class PDFOperations:
         if len(image_paths) > config.MAX_IMAGE_FILES:
             raise ValueError(f"Maximum {config.MAX_IMAGE_FILES} images can be converted at once")
         
+        existing_paths = []
+        for img_path in image_paths:
+            if img_path.exists():
+                existing_paths.append(img_path)
+            else:
+                print(f"Warning: Image not found: {img_path}")
+        
+        if not existing_paths:
+            raise ValueError("No valid images could be loaded")
+        
+        threads = max(1, min(config.IMAGE_PREPARE_THREADS, len(existing_paths)))
+        pool = ThreadPoolExecutor(max_workers=threads)
+        
         try:
-            images = []
-            
-            # Open and convert all images
-            for img_path in image_paths:
-                if not img_path.exists():
-                    print(f"Warning: Image not found: {img_path}")
-                    continue
+            with StreamingPDFWriter(output_path) as writer:
+                # Images are decoded and encoded on the pool while the writer appends
+                # finished ones in the user's order. Only a few images run ahead of
+                # the writer, and decodes share a memory budget, so memory doesn't
+                # grow with the number or size of the images.
+                pending = deque()
+                for img_path in existing_paths:
+                    pending.append(pool.submit(image_encoder.prepare, img_path))
+                    if len(pending) >= threads * 2:
+                        PDFOperations._write_image_page(writer, pending.popleft().result())
                 
-                # Open image and convert to RGB if necessary
-                img = Image.open(img_path)
-                
-                # Convert to RGB (required for PDF)
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    # Create white background
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    if img.mode == 'P':
-                        img = img.convert('RGBA')
-                    background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-                    img = background
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                images.append(img)
-            
-            if not images:
-                raise ValueError("No valid images could be loaded")
-            
-            # Save as PDF
-            first_image = images[0]
-            other_images = images[1:] if len(images) > 1 else []
-            
-            first_image.save(
-                str(output_path),
-                "PDF",
-                save_all=True,
-                append_images=other_images,
-                resolution=100.0
-            )
+                while pending:
+                    PDFOperations._write_image_page(writer, pending.popleft().result())
             
             return True
         
         except Exception as e:
             print(f"Error converting images to PDF: {e}")
             raise
+        
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+    
+    @staticmethod
+    def _write_image_page(writer: StreamingPDFWriter, image: PreparedImage) -> None:
+        """
+        Append a prepared image as a page.
+        
+        Args:
+            writer: PDF being written
+            image: Image prepared by image_encoder
+        """
+        writer.add_image_page(
+            image.entries,
+            image.write_data,
+            image.page_width,
+            image.page_height,
+            image.rotate,
+            image.placement
+        )
     
     @staticmethod
     def protect_pdf(
@@ -614,33 +1179,131 @@ class PDFOperations:
     def get_pdf_info(pdf_path: Path) -> dict:
         """
         Get information about a PDF file.
+        Probes the file with pikepdf (cross-reference table and page tree only - no
+        content streams are decoded) and memoizes the result by path, size and
+        modification time, so every step of a request reuses one probe.
         
         Args:
             pdf_path: Path to PDF file
             
         Returns:
-            dict: PDF information (page count, size, etc.)
+            dict: PDF information (pages, size_mb, encrypted, version, linearized, images)
         """
         if not pdf_path.exists():
             raise FileNotFoundError(f"PDF file not found: {pdf_path}")
         
+        stat = pdf_path.stat()
+        memo_key = (str(pdf_path), stat.st_size, stat.st_mtime_ns)
+        with _info_lock:
+            info = _info_memo.get(memo_key)
+            if info is not None:
+                _info_memo.move_to_end(memo_key)
+                return dict(info)
+        
         try:
-            with open(pdf_path, 'rb') as pdf_file:
-                reader = PyPDF2.PdfReader(pdf_file)
-                
-                return {
-                    'pages': len(reader.pages),
-                    'size_mb': pdf_path.stat().st_size / (1024 * 1024),
-                    'encrypted': reader.is_encrypted
-                }
+            info = PDFOperations._probe_pdf(pdf_path, stat.st_size)
         
         except Exception as e:
             print(f"Error getting PDF info: {e}")
             return {
                 'pages': 0,
                 'size_mb': 0,
-                'encrypted': False
+                'encrypted': False,
+                'version': '',
+                'linearized': False,
+                'images': 0
             }
+        
+        with _info_lock:
+            _info_memo[memo_key] = info
+            if len(_info_memo) > config.PDF_INFO_MEMO_SIZE:
+                _info_memo.popitem(last=False)
+        return dict(info)
+    
+    @staticmethod
+    def _probe_pdf(pdf_path: Path, size: int) -> dict:
+        """
+        Read page count, encryption, version, linearization and image count.
+        
+        Args:
+            pdf_path: Path to PDF file
+            size: File size in bytes
+        
+        Returns:
+            dict: PDF information
+        """
+        info = {
+            'pages': 0,
+            'size_mb': size / (1024 * 1024),
+            'encrypted': False,
+            'version': '',
+            'linearized': False,
+            'images': 0
+        }
+        
+        try:
+            pdf = pikepdf.open(pdf_path)
+        except pikepdf.PasswordError:
+            # Opening needs the user password: only the header can be read
+            with open(pdf_path, 'rb') as pdf_file:
+                header = pdf_file.read(1024)
+            version = re.search(rb'%PDF-(\d\.\d)', header)
+            info['encrypted'] = True
+            info['version'] = version.group(1).decode() if version else ''
+            return info
+        
+        with pdf:
+            info['pages'] = len(pdf.pages)
+            info['encrypted'] = pdf.is_encrypted
+            info['version'] = pdf.pdf_version
+            info['linearized'] = pdf.is_linearized
+            info['images'] = PDFOperations._count_images(pdf)
+        return info
+    
+    @staticmethod
+    def _count_images(pdf: pikepdf.Pdf) -> int:
+        """
+        Count distinct image XObjects used by the pages, including images inside
+        form XObjects. Only dictionaries are read, never image data.
+        
+        Args:
+            pdf: Open PDF
+        
+        Returns:
+            int: Number of distinct images
+        """
+        images = set()
+        visited = set()
+        
+        def visit(resources) -> None:
+            xobjects = resources.get('/XObject') if isinstance(resources, pikepdf.Dictionary) else None
+            if not isinstance(xobjects, pikepdf.Dictionary):
+                return
+            for _, xobject in xobjects.items():
+                if not isinstance(xobject, pikepdf.Stream) or xobject.objgen in visited:
+                    continue
+                visited.add(xobject.objgen)
+                subtype = xobject.get('/Subtype')
+                if subtype == pikepdf.Name.Image:
+                    images.add(xobject.objgen)
+                elif subtype == pikepdf.Name.Form:
+                    visit(xobject.get('/Resources'))
+        
+        for page in pdf.pages:
+            # Resources may be inherited from an ancestor in the page tree
+            node = page.obj
+            resources = node.get('/Resources')
+            while resources is None and '/Parent' in node:
+                node = node.Parent
+                resources = node.get('/Resources')
+            visit(resources)
+        
+        return len(images)
+
+
+# Memoized get_pdf_info results: (path, size, mtime_ns) -> info
+_info_memo: "OrderedDict[Tuple[str, int, int], dict]" = OrderedDict()
+_info_lock = threading.Lock()
 
 
 # Global PDF operations instance
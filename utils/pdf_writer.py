@@ -0,0 +1,159 @@
+"""
+PDF writer for PDF Telegram Bot.
+Writes image PDFs one page at a time, straight to disk, so memory use doesn't grow
+with the number of pages.
+"""
+
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+
+# Object numbers reserved for the document catalog and page tree, written last
+_CATALOG_ID = 1
+_PAGES_ID = 2
+
+
+class StreamingPDFWriter:
+    """Appends image pages to a PDF file as they are produced."""
+    
+    def __init__(self, output_path: Path):
+        """
+        Initialize the writer and start the file.
+        
+        Args:
+            output_path: Path where the PDF is written
+        """
+        self.output_path = output_path
+        self.page_count = 0
+        self._file: Optional[BinaryIO] = open(output_path, 'wb')
+        self._offsets: Dict[int, int] = {}
+        self._page_ids: List[int] = []
+        self._next_id = _PAGES_ID + 1
+        
+        # Binary comment marks the file as binary for transfer tools
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    
+    def __enter__(self) -> "StreamingPDFWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+    
+    def _new_id(self) -> int:
+        """Allocate an object number."""
+        object_id = self._next_id
+        self._next_id += 1
+        return object_id
+    
+    def _begin_object(self, object_id: int) -> None:
+        """Record where an object starts and write its header."""
+        self._offsets[object_id] = self._file.tell()
+        self._file.write(f"{object_id} 0 obj\n".encode())
+    
+    def _write_object(self, object_id: int, body: str) -> None:
+        """Write a complete non-stream object."""
+        self._begin_object(object_id)
+        self._file.write(f"{body}\nendobj\n".encode())
+    
+    def _write_stream(
+        self,
+        object_id: int,
+        entries: Dict[str, str],
+        write_data: Callable[[BinaryIO], None]
+    ) -> None:
+        """
+        Write a stream object whose data is produced directly into the file.
+        The length isn't known up front, so it goes into a separate object afterwards.
+        
+        Args:
+            object_id: Object number
+            entries: Stream dictionary entries (name without slash -> PDF value)
+            write_data: Writes the (already encoded) stream data to the file
+        """
+        length_id = self._new_id()
+        dictionary = "".join(f" /{key} {value}" for key, value in entries.items())
+        
+        self._begin_object(object_id)
+        self._file.write(f"<<{dictionary} /Length {length_id} 0 R >>\nstream\n".encode())
+        start = self._file.tell()
+        write_data(self._file)
+        length = self._file.tell() - start
+        self._file.write(b"\nendstream\nendobj\n")
+        
+        self._write_object(length_id, str(length))
+    
+    def add_image_page(
+        self,
+        image: Dict[str, str],
+        write_data: Callable[[BinaryIO], None],
+        page_width: float,
+        page_height: float,
+        rotate: int = 0,
+        placement: Optional[Tuple[float, float, float, float]] = None
+    ) -> None:
+        """
+        Add a page showing one image.
+        
+        Args:
+            image: Image XObject entries, e.g. {'Width': '800', 'Height': '600',
+                   'ColorSpace': '/DeviceRGB', 'BitsPerComponent': '8', 'Filter': '/DCTDecode'}
+            write_data: Writes the encoded image data to the file
+            page_width: Page width in points
+            page_height: Page height in points
+            rotate: Clockwise rotation viewers apply when showing the page
+            placement: Image (x, y, width, height) in points (default: the whole page)
+        """
+        image_id = self._new_id()
+        self._write_stream(
+            image_id,
+            {'Type': '/XObject', 'Subtype': '/Image', **image},
+            write_data
+        )
+        
+        x, y, width, height = placement or (0.0, 0.0, page_width, page_height)
+        content = f"q {width:.2f} 0 0 {height:.2f} {x:.2f} {y:.2f} cm /Im0 Do Q".encode()
+        content_id = self._new_id()
+        self._write_stream(content_id, {}, lambda output: output.write(content))
+        
+        page_id = self._new_id()
+        self._write_object(
+            page_id,
+            f"<< /Type /Page /Parent {_PAGES_ID} 0 R "
+            f"/MediaBox [0 0 {page_width:.2f} {page_height:.2f}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> "
+            f"/Contents {content_id} 0 R"
+            f"{f' /Rotate {rotate}' if rotate else ''} >>"
+        )
+        self._page_ids.append(page_id)
+        self.page_count += 1
+    
+    def close(self) -> None:
+        """Write the page tree, catalog, cross-reference table and trailer."""
+        if self._file is None:
+            return
+        
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._write_object(_PAGES_ID, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>")
+        self._write_object(_CATALOG_ID, f"<< /Type /Catalog /Pages {_PAGES_ID} 0 R >>")
+        
+        xref_offset = self._file.tell()
+        self._file.write(f"xref\n0 {self._next_id}\n".encode())
+        self._file.write(b"0000000000 65535 f \n")
+        for object_id in range(1, self._next_id):
+            self._file.write(f"{self._offsets[object_id]:010d} 00000 n \n".encode())
+        self._file.write(
+            f"trailer\n<< /Size {self._next_id} /Root {_CATALOG_ID} 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n".encode()
+        )
+        
+        self._file.close()
+        self._file = None
+    
+    def abort(self) -> None:
+        """Stop writing and delete the incomplete file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.output_path.unlink(missing_ok=True)
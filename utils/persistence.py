@@ -0,0 +1,515 @@
+"""
+Session persistence for PDF Telegram Bot.
+Keeps each user's pending files (context.user_data) and temp directory in a shared store,
+so a restart or another replica can pick up where the user left off.
+
+Writes are batched (write-behind) and reads are served from memory, re-reading a user's
+session from the store only when the cached copy is older than config.PERSISTENCE_CACHE_TTL.
+"""
+
+import json
+import time
+import sqlite3
+import asyncio
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from telegram.ext import BasePersistence, PersistenceInput
+
+import config
+from .broker import encode_value, decode_value
+from .file_manager import file_manager, PendingFile
+
+try:
+    import redis
+except ImportError:  # Only needed for PERSISTENCE=redis
+    redis = None
+
+USER_DATA = "user_data"
+USER_DIR = "user_dir"
+
+# (kind, key, updated, value) - value None deletes the entry
+StateRow = Tuple[str, str, float, Optional[str]]
+
+
+def encode_session(value: Any) -> Any:
+    """
+    Make user_data JSON-safe, keeping PendingFile references.
+    
+    Args:
+        value: user_data or one of its values
+    
+    Returns:
+        Any: JSON-serializable value
+    """
+    if isinstance(value, PendingFile):
+        return {'__pending_file__': value.to_dict()}
+    if isinstance(value, list):
+        return [encode_session(item) for item in value]
+    if isinstance(value, dict):
+        return {key: encode_session(item) for key, item in value.items()}
+    return encode_value(value)
+
+
+def decode_session(value: Any) -> Any:
+    """
+    Reverse encode_session.
+    
+    Args:
+        value: Value produced by encode_session
+    
+    Returns:
+        Any: Original value
+    """
+    if isinstance(value, list):
+        return [decode_session(item) for item in value]
+    if isinstance(value, dict):
+        if '__pending_file__' in value:
+            return PendingFile.from_dict(value['__pending_file__'])
+        if '__path__' in value or '__tuple__' in value:
+            return decode_value(value)
+        return {key: decode_session(item) for key, item in value.items()}
+    return value
+
+
+class StateStore(ABC):
+    """Key/value storage behind BotPersistence, grouped by kind (user_data, user_dir)."""
+    
+    @abstractmethod
+    def load_all(self, kind: str) -> Dict[str, Tuple[float, str]]:
+        """
+        Load every entry of a kind.
+        
+        Args:
+            kind: Entry kind
+        
+        Returns:
+            Dict[str, Tuple[float, str]]: key -> (updated timestamp, JSON value)
+        """
+    
+    @abstractmethod
+    def load(self, kind: str, key: str) -> Optional[Tuple[float, str]]:
+        """
+        Load one entry.
+        
+        Args:
+            kind: Entry kind
+            key: Entry key
+        
+        Returns:
+            Optional[Tuple[float, str]]: (updated timestamp, JSON value), None if missing
+        """
+    
+    @abstractmethod
+    def save(self, rows: List[StateRow]) -> None:
+        """
+        Write a batch of entries in one round trip.
+        
+        Args:
+            rows: (kind, key, updated, value) tuples; a None value deletes the entry
+        """
+
+
+class _SQLStateStore(StateStore):
+    """Shared logic for the SQLite and PostgreSQL stores (one bot_state table)."""
+    
+    placeholder = "?"
+    
+    @abstractmethod
+    def _connect(self):
+        """Open a connection (subclasses)."""
+    
+    def _release(self, conn) -> None:
+        """Release a connection (subclasses)."""
+        conn.close()
+    
+    def _run(self, query: str, params_list: List[tuple], fetch: bool = False):
+        """Run a statement for each parameter tuple in one transaction."""
+        query = query.replace("?", self.placeholder)
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            rows = []
+            for params in params_list:
+                cursor.execute(query, params)
+                if fetch:
+                    rows.extend(cursor.fetchall())
+            conn.commit()
+            return rows
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+    
+    def _create_table(self) -> None:
+        """Create the state table if needed."""
+        self._run("""
+            CREATE TABLE IF NOT EXISTS bot_state (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated DOUBLE PRECISION NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+        """, [()])
+    
+    def load_all(self, kind: str) -> Dict[str, Tuple[float, str]]:
+        rows = self._run("SELECT key, updated, value FROM bot_state WHERE kind = ?", [(kind,)], fetch=True)
+        return {key: (updated, value) for key, updated, value in rows}
+    
+    def load(self, kind: str, key: str) -> Optional[Tuple[float, str]]:
+        rows = self._run(
+            "SELECT updated, value FROM bot_state WHERE kind = ? AND key = ?",
+            [(kind, key)],
+            fetch=True
+        )
+        return tuple(rows[0]) if rows else None
+    
+    def save(self, rows: List[StateRow]) -> None:
+        upserts = [(kind, key, value, updated) for kind, key, updated, value in rows if value is not None]
+        deletes = [(kind, key) for kind, key, _, value in rows if value is None]
+        if upserts:
+            self._run("""
+                INSERT INTO bot_state (kind, key, value, updated) VALUES (?, ?, ?, ?)
+                ON CONFLICT (kind, key) DO UPDATE SET value = excluded.value, updated = excluded.updated
+            """, upserts)
+        if deletes:
+            self._run("DELETE FROM bot_state WHERE kind = ? AND key = ?", deletes)
+
+
+class SQLiteStateStore(_SQLStateStore):
+    """Store backed by a SQLite file - for a single host."""
+    
+    def __init__(self, path: Path = config.PERSISTENCE_SQLITE_PATH):
+        """
+        Initialize the store.
+        
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self._ready = False
+    
+    def _connect(self):
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        if not self._ready:
+            self._ready = True
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._create_table()
+        return conn
+
+
+class PostgresStateStore(_SQLStateStore):
+    """Store backed by PostgreSQL - shared by several bot replicas."""
+    
+    placeholder = "%s"
+    
+    def __init__(self, database_url: str = config.PERSISTENCE_POSTGRES_URL):
+        """
+        Initialize the store. Connections are opened on first use.
+        
+        Args:
+            database_url: PostgreSQL connection URL
+        """
+        self.database_url = database_url
+        self._pool = None
+    
+    def _connect(self):
+        if self._pool is None:
+            import psycopg2.pool
+            
+            self._pool = psycopg2.pool.ThreadedConnectionPool(1, 5, self.database_url)
+            self._create_table()
+        return self._pool.getconn()
+    
+    def _release(self, conn) -> None:
+        self._pool.putconn(conn)
+
+
+class RedisStateStore(StateStore):
+    """Store backed by Redis - one hash per kind, values stored with their timestamp."""
+    
+    KEY = "pdf_bot:state:{}"
+    
+    def __init__(self, url: str = config.PERSISTENCE_REDIS_URL):
+        """
+        Initialize the store.
+        
+        Args:
+            url: Redis connection URL
+        
+        Raises:
+            RuntimeError: If the redis package is not installed
+        """
+        if redis is None:
+            raise RuntimeError("PERSISTENCE=redis requires the 'redis' package (pip install redis)")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+    
+    def load_all(self, kind: str) -> Dict[str, Tuple[float, str]]:
+        entries = self.client.hgetall(self.KEY.format(kind))
+        return {key: tuple(json.loads(entry)) for key, entry in entries.items()}
+    
+    def load(self, kind: str, key: str) -> Optional[Tuple[float, str]]:
+        entry = self.client.hget(self.KEY.format(kind), key)
+        return tuple(json.loads(entry)) if entry else None
+    
+    def save(self, rows: List[StateRow]) -> None:
+        pipe = self.client.pipeline()
+        for kind, key, updated, value in rows:
+            if value is None:
+                pipe.hdel(self.KEY.format(kind), key)
+            else:
+                pipe.hset(self.KEY.format(kind), key, json.dumps([updated, value]))
+        pipe.execute()
+
+
+class BotPersistence(BasePersistence):
+    """
+    PTB persistence for user_data plus FileManager.user_dirs.
+    Chat data, bot data, callback data and conversations are not stored.
+    """
+    
+    def __init__(
+        self,
+        store: StateStore,
+        update_interval: float = config.PERSISTENCE_INTERVAL,
+        cache_ttl: float = config.PERSISTENCE_CACHE_TTL
+    ):
+        """
+        Initialize the persistence.
+        
+        Args:
+            store: Backing store
+            update_interval: Seconds between batched writes
+            cache_ttl: Seconds before a user's session is re-read from the store (0 = never)
+        """
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.store = store
+        self.cache_ttl = cache_ttl
+        self._pending: Dict[str, Optional[str]] = {}  # user_data changes not yet written
+        self._saved: Dict[str, str] = {}  # user_data JSON as last written/read
+        self._versions: Dict[str, float] = {}  # Store timestamp of the copy we hold
+        self._checked: Dict[str, float] = {}  # When the store was last consulted per user
+        self._saved_dirs: Dict[int, str] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._write_lock: Optional[asyncio.Lock] = None  # Created on the running loop
+        self.writes = 0
+        self.reads = 0
+    
+    async def _in_thread(self, func, *args):
+        """Run a blocking store call off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+    
+    def _restore_user_dir(self, user_id: int, path: str) -> None:
+        """Track a user's temp directory again if it still exists."""
+        user_dir = Path(path)
+        if user_dir.is_dir():
+            file_manager.user_dirs.setdefault(user_id, user_dir)
+            self._saved_dirs[user_id] = path
+    
+    async def get_user_data(self) -> Dict[int, dict]:
+        entries = await self._in_thread(self.store.load_all, USER_DATA)
+        dirs = await self._in_thread(self.store.load_all, USER_DIR)
+        now = time.monotonic()
+        
+        user_data = {}
+        for key, (updated, value) in entries.items():
+            user_data[int(key)] = decode_session(json.loads(value))
+            self._saved[key] = value
+            self._versions[key] = updated
+            self._checked[key] = now
+        
+        for key, (_, path) in dirs.items():
+            self._restore_user_dir(int(key), json.loads(path))
+        
+        print(f"📂 Restored {len(user_data)} user sessions")
+        return user_data
+    
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        """Read-through: pick up changes another replica wrote since our copy was cached."""
+        key = str(user_id)
+        now = time.monotonic()
+        if self.cache_ttl <= 0 or key in self._pending:
+            return
+        if now - self._checked.get(key, 0) < self.cache_ttl:
+            return
+        
+        self._checked[key] = now
+        try:
+            entry = await self._in_thread(self.store.load, USER_DATA, key)
+            user_dir = await self._in_thread(self.store.load, USER_DIR, key)
+        except Exception as e:
+            print(f"Error refreshing session of user {user_id}: {e}")
+            return
+        self.reads += 1
+        
+        if user_dir is not None and user_id not in file_manager.user_dirs:
+            self._restore_user_dir(user_id, json.loads(user_dir[1]))
+        
+        if entry is None or entry[0] <= self._versions.get(key, 0):
+            return
+        
+        updated, value = entry
+        user_data.clear()
+        user_data.update(decode_session(json.loads(value)))
+        self._saved[key] = value
+        self._versions[key] = updated
+    
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        key = str(user_id)
+        try:
+            value = json.dumps(encode_session(data), sort_keys=True) if data else None
+        except TypeError as e:
+            print(f"Skipping session of user {user_id}, not serializable: {e}")
+            return
+        
+        if value == self._saved.get(key):
+            self._pending.pop(key, None)
+            return
+        
+        self._pending[key] = value
+        self._schedule_flush()
+    
+    async def drop_user_data(self, user_id: int) -> None:
+        key = str(user_id)
+        if key in self._saved:
+            self._pending[key] = None
+            self._schedule_flush()
+    
+    def _schedule_flush(self) -> None:
+        """
+        Write pending changes once the current round of update_user_data calls is done.
+        PTB calls update_user_data for every changed user at once, so they become one batch.
+        """
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._write_batch())
+    
+    def _collect_dirs(self, now: float) -> List[StateRow]:
+        """Rows for temp directories created or cleaned up since the last write."""
+        rows = []
+        current = {user_id: str(path) for user_id, path in file_manager.user_dirs.items()}
+        for user_id, path in current.items():
+            if self._saved_dirs.get(user_id) != path:
+                rows.append((USER_DIR, str(user_id), now, json.dumps(path)))
+        for user_id in set(self._saved_dirs) - set(current):
+            rows.append((USER_DIR, str(user_id), now, None))
+        self._saved_dirs = current
+        return rows
+    
+    async def _write_batch(self) -> None:
+        """Write all pending sessions and directory changes in one store call."""
+        await asyncio.sleep(0)  # Let the rest of this round's update_user_data calls queue up
+        
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        async with self._write_lock:
+            pending, self._pending = self._pending, {}
+            now = time.time()
+            rows = [(USER_DATA, key, now, value) for key, value in pending.items()]
+            rows.extend(self._collect_dirs(now))
+            if not rows:
+                return
+            
+            try:
+                await self._in_thread(self.store.save, rows)
+            except Exception as e:
+                print(f"Error saving sessions: {e}")
+                for key, value in pending.items():
+                    self._pending.setdefault(key, value)  # Retry with the next batch
+                return
+            
+            self.writes += 1
+            for key, value in pending.items():
+                if value is None:
+                    self._saved.pop(key, None)
+                    self._versions.pop(key, None)
+                else:
+                    self._saved[key] = value
+                    self._versions[key] = now
+    
+    async def flush(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+        await self._write_batch()
+    
+    def stats(self) -> dict:
+        """
+        Get persistence statistics for monitoring.
+        
+        Returns:
+            dict: Stored sessions, pending writes, batch writes and store re-reads
+        """
+        return {
+            'sessions': len(self._saved),
+            'pending': len(self._pending),
+            'writes': self.writes,
+            'reads': self.reads
+        }
+    
+    # Only user_data is persisted; the rest of the interface is a no-op
+    
+    async def get_chat_data(self) -> Dict[int, dict]:
+        return {}
+    
+    async def get_bot_data(self) -> dict:
+        return {}
+    
+    async def get_callback_data(self) -> None:
+        return None
+    
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+    
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        pass
+    
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+    
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+    
+    async def update_callback_data(self, data) -> None:
+        pass
+    
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+    
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+    
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+
+def create_persistence(kind: str = config.PERSISTENCE) -> Optional[BotPersistence]:
+    """
+    Create the configured session persistence.
+    
+    Args:
+        kind: "", "sqlite", "redis" or "postgres"
+    
+    Returns:
+        Optional[BotPersistence]: Persistence, or None to keep sessions in memory only
+    
+    Raises:
+        ValueError: If the persistence type is unknown
+    """
+    if not kind:
+        return None
+    if kind == "sqlite":
+        return BotPersistence(SQLiteStateStore())
+    if kind == "redis":
+        return BotPersistence(RedisStateStore())
+    if kind == "postgres":
+        return BotPersistence(PostgresStateStore())
+    raise ValueError(f"Invalid persistence: {kind}. Use: sqlite, redis, postgres")
+
+
+# Global session persistence instance (None when sessions live in memory only)
+bot_persistence = create_persistence()
@@ -0,0 +1,361 @@
+"""
+Result cache for PDF Telegram Bot.
+Stores outputs of deterministic PDFOperations calls on disk, keyed by the SHA-256
+of the input files, the operation, its normalized parameters and the settings it depends on.
+"""
+
+import os
+import json
+import uuid
+import shutil
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+
+
+# Cacheable operations: argument index of the input file(s), and of the output
+# file ('output') or output directory ('output_dir'). Password operations are
+# deliberately missing - their parameters are secrets.
+CACHEABLE_OPERATIONS: Dict[str, dict] = {
+    'compress_pdf': {'input': 0, 'output': 1},
+    'compress_pdf_advanced': {'input': 0, 'output': 1},
+    'merge_pdfs': {'input': 0, 'output': 1},
+    'split_pdf': {'input': 0, 'output': 2},
+    'images_to_pdf': {'input': 0, 'output': 1},
+    'render_pages': {'input': 0, 'output_dir': 1},
+    'split_pdf_parts': {'input': 0, 'output_dir': 2},
+}
+
+# Settings each operation's output depends on; they are part of the cache key, so
+# changing one (e.g. IMAGE_MAX_DPI) stops serving outputs made with the old value
+OPERATION_SETTINGS: Dict[str, Tuple[str, ...]] = {
+    'compress_pdf': ('COMPRESSION_LEVELS',),
+    'compress_pdf_advanced': (
+        'COMPRESSION_LEVELS',
+        'COMPRESSION_PLANNER',
+        'COMPRESSION_PLAN_POINTS',
+        'COMPRESSION_SAMPLE_PAGES'
+    ),
+    'merge_pdfs': ('MERGE_BACKEND', 'MERGE_DEDUPLICATE'),
+    'images_to_pdf': ('IMAGE_JPEG_QUALITY', 'IMAGE_PAGE_SIZE', 'IMAGE_MAX_DPI'),
+    'render_pages': ('RENDER_DPI',),
+}
+
+# Bump when an operation's code changes what it produces, so old entries are never served
+CACHE_FORMAT_VERSION = 1
+
+_META_FILE = "meta.json"
+_HASH_MEMO_SIZE = 1000
+
+
+class ResultCache:
+    """Size-bounded, LRU-evicted on-disk store of operation outputs."""
+    
+    def __init__(
+        self,
+        cache_dir: Path = config.CACHE_DIR,
+        max_size: int = config.CACHE_MAX_SIZE,
+        enabled: bool = config.ENABLE_RESULT_CACHE
+    ):
+        """
+        Initialize the cache. Existing entries are indexed lazily on first use.
+        
+        Args:
+            cache_dir: Directory holding cache entries
+            max_size: Maximum total size of cached outputs in bytes
+            enabled: Whether lookups and stores do anything
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> size, least recent first
+        self._size = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._hash_memo: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+    
+    def _load(self) -> None:
+        """Index entries left on disk by a previous run (caller holds the lock)."""
+        if self._loaded:
+            return
+        self._loaded = True
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        entries = []
+        for entry_dir in self.cache_dir.iterdir():
+            meta_path = entry_dir / _META_FILE
+            if entry_dir.is_dir() and meta_path.exists() and not entry_dir.name.startswith('.'):
+                size = sum(f.stat().st_size for f in entry_dir.iterdir() if f.is_file())
+                entries.append((meta_path.stat().st_mtime, entry_dir.name, size))
+            else:
+                # Interrupted write
+                shutil.rmtree(entry_dir, ignore_errors=True)
+        
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._size += size
+        
+        self._evict()
+    
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache fits (caller holds the lock)."""
+        while self._size > self.max_size and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            shutil.rmtree(self.cache_dir / key, ignore_errors=True)
+    
+    def file_hash(self, file_path: Path) -> str:
+        """
+        SHA-256 of a file, memoized by path, size and modification time.
+        
+        Args:
+            file_path: File to hash
+        
+        Returns:
+            str: Hex digest
+        """
+        stat = file_path.stat()
+        memo_key = str(file_path)
+        memo = self._hash_memo.get(memo_key)
+        if memo and memo[0] == stat.st_size and memo[1] == stat.st_mtime_ns:
+            return memo[2]
+        
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        
+        with self._lock:
+            self._hash_memo[memo_key] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+            if len(self._hash_memo) > _HASH_MEMO_SIZE:
+                self._hash_memo.popitem(last=False)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _normalize(value: Any) -> Any:
+        """Normalize a parameter so equivalent requests share a key."""
+        if isinstance(value, str):
+            return value.strip().lower()
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, (list, tuple)):
+            return [ResultCache._normalize(item) for item in value]
+        if isinstance(value, dict):
+            return {key: ResultCache._normalize(item) for key, item in value.items()}
+        return value
+    
+    def _key(self, operation: str, args: tuple, kwargs: dict) -> Optional[str]:
+        """
+        Build the cache key for a call.
+        
+        Returns:
+            Optional[str]: Hex key, or None if the call can't be cached
+        """
+        spec = CACHEABLE_OPERATIONS.get(operation)
+        if spec is None or len(args) <= max(spec.values()):
+            return None
+        
+        inputs = args[spec['input']]
+        if isinstance(inputs, Path):
+            inputs = [inputs]
+        input_hashes = [self.file_hash(Path(path)) for path in inputs]
+        
+        skip = set(spec.values())
+        params = [self._normalize(arg) for i, arg in enumerate(args) if i not in skip]
+        named = {name: self._normalize(value) for name, value in kwargs.items()}
+        settings = {name: getattr(config, name) for name in OPERATION_SETTINGS.get(operation, ())}
+        
+        try:
+            material = json.dumps(
+                [CACHE_FORMAT_VERSION, operation, settings, input_hashes, params, named],
+                sort_keys=True
+            )
+        except TypeError:
+            return None
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+    
+    def _fetch(self, operation: str, args: tuple, kwargs: dict) -> Tuple[bool, Any]:
+        """Blocking part of get()."""
+        key = self._key(operation, args, kwargs)
+        if key is None:
+            return False, None
+        
+        with self._lock:
+            self._load()
+            if key not in self._entries:
+                return False, None
+            self._entries.move_to_end(key)
+        
+        entry_dir = self.cache_dir / key
+        try:
+            with open(entry_dir / _META_FILE) as f:
+                meta = json.load(f)
+            
+            spec = CACHEABLE_OPERATIONS[operation]
+            if 'output_dir' in spec:
+                output_dir = Path(args[spec['output_dir']])
+                output_dir.mkdir(parents=True, exist_ok=True)
+                result = []
+                for name in meta['files']:
+                    shutil.copyfile(entry_dir / name, output_dir / name)
+                    result.append(output_dir / name)
+            else:
+                shutil.copyfile(entry_dir / meta['files'][0], Path(args[spec['output']]))
+                result = meta['result']
+                if isinstance(result, list):
+                    result = tuple(result)
+            
+            os.utime(entry_dir / _META_FILE)  # Remember recency across restarts
+            return True, result
+        
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            print(f"Dropping unreadable cache entry {key}: {e}")
+            with self._lock:
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self._size -= size
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return False, None
+    
+    def _store(self, operation: str, args: tuple, kwargs: dict, result: Any) -> None:
+        """Blocking part of put()."""
+        key = self._key(operation, args, kwargs)
+        if key is None:
+            return
+        
+        spec = CACHEABLE_OPERATIONS[operation]
+        if 'output_dir' in spec:
+            files: List[Path] = [Path(path) for path in result]
+            meta_result = None
+        else:
+            files = [Path(args[spec['output']])]
+            meta_result = result
+        
+        if not all(path.exists() for path in files):
+            return
+        
+        size = sum(path.stat().st_size for path in files)
+        if size > self.max_size:
+            return
+        
+        with self._lock:
+            self._load()
+            if key in self._entries:
+                return
+        
+        # Write to a hidden directory first so readers never see a partial entry
+        temp_dir = self.cache_dir / f".{key}.{uuid.uuid4().hex[:8]}"
+        try:
+            temp_dir.mkdir(parents=True)
+            names = []
+            for index, path in enumerate(files):
+                name = path.name if 'output_dir' in spec else f"output{index}{path.suffix}"
+                shutil.copyfile(path, temp_dir / name)
+                names.append(name)
+            
+            with open(temp_dir / _META_FILE, 'w') as f:
+                json.dump({'operation': operation, 'files': names, 'result': meta_result}, f)
+            
+            with self._lock:
+                if key in self._entries:
+                    return
+                temp_dir.rename(self.cache_dir / key)
+                self._entries[key] = size
+                self._size += size
+                self.stores += 1
+                self._evict()
+        
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error storing cache entry for {operation}: {e}")
+        
+        finally:
+            if temp_dir.exists():
+                shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    async def get(
+        self,
+        operation: str,
+        args: tuple,
+        kwargs: dict,
+        count_miss: bool = True
+    ) -> Tuple[bool, Any]:
+        """
+        Look up a call and, on a hit, restore its outputs to the requested paths.
+        
+        Args:
+            operation: PDFOperations method name
+            args: Positional arguments of the call
+            kwargs: Keyword arguments of the call
+            count_miss: Whether a miss counts towards the statistics
+        
+        Returns:
+            Tuple[bool, Any]: (Hit, result the operation returned originally)
+        """
+        if not self.enabled or operation not in CACHEABLE_OPERATIONS:
+            return False, None
+        
+        loop = asyncio.get_running_loop()
+        try:
+            hit, result = await loop.run_in_executor(None, self._fetch, operation, args, kwargs)
+        except OSError as e:
+            print(f"Error reading result cache: {e}")
+            hit, result = False, None
+        
+        if hit:
+            self.hits += 1
+        elif count_miss:
+            self.misses += 1
+        return hit, result
+    
+    async def put(self, operation: str, args: tuple, kwargs: dict, result: Any) -> None:
+        """
+        Store the outputs of a successful call.
+        
+        Args:
+            operation: PDFOperations method name
+            args: Positional arguments of the call
+            kwargs: Keyword arguments of the call
+            result: Value the operation returned
+        """
+        if not self.enabled or operation not in CACHEABLE_OPERATIONS:
+            return
+        
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._store, operation, args, kwargs, result)
+        except OSError as e:
+            print(f"Error writing result cache: {e}")
+    
+    def stats(self) -> dict:
+        """
+        Get cache statistics for monitoring.
+        
+        Returns:
+            dict: Hit/miss counts, entry count and size
+        """
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups * 100) if lookups else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'size_mb': self._size / (1024 * 1024),
+            'max_size_mb': self.max_size / (1024 * 1024)
+        }
+
+
+# Global result cache instance
+result_cache = ResultCache()
@@ -0,0 +1,326 @@
+"""
+Job scheduler for PDF Telegram Bot.
+Admits jobs into a bounded queue, enforces rate limits and hands out worker
+slots round-robin across users so one user's burst can't starve everyone else.
+"""
+
+import time
+import asyncio
+from collections import deque, OrderedDict
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+import config
+from .executor import pdf_executor
+from .result_cache import result_cache
+
+
+class SchedulerError(Exception):
+    """Base class for jobs the scheduler refuses. The message is user-facing Markdown."""
+
+
+class QueueFullError(SchedulerError):
+    """Raised when the global or per-operation queue is full."""
+
+
+class RateLimitError(SchedulerError):
+    """Raised when a user exceeds config.MAX_OPERATIONS_PER_MINUTE."""
+
+
+class _Job:
+    """A queued job waiting for a worker slot."""
+    
+    def __init__(self, user_id: int, operation: str):
+        self.user_id = user_id
+        self.operation = operation
+        self.started = asyncio.Event()
+
+
+class JobScheduler:
+    """Fair, bounded job queue in front of the PDF worker pool."""
+    
+    def __init__(
+        self,
+        max_running: int = config.WORKER_POOL_SIZE,
+        max_queued: int = config.MAX_QUEUED_JOBS
+    ):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            max_running: Maximum jobs holding a worker slot at once
+            max_queued: Maximum queued + running jobs across all users
+        """
+        self.max_running = max(1, max_running)
+        self.max_queued = max(1, max_queued)
+        self._pending: "OrderedDict[int, Deque[_Job]]" = OrderedDict()  # Round-robin order of users
+        self._pending_by_op: Dict[str, int] = {}
+        self._running = 0
+        self._running_by_op: Dict[str, int] = {}
+        self._recent: Dict[int, Deque[float]] = {}  # Admission timestamps per user
+    
+    def _check_rate_limit(self, user_id: int) -> None:
+        """
+        Enforce config.MAX_OPERATIONS_PER_MINUTE for a user.
+        
+        Args:
+            user_id: Telegram user ID
+        
+        Raises:
+            RateLimitError: If the user is over the limit
+        """
+        if not config.ENABLE_RATE_LIMITING:
+            return
+        
+        now = time.monotonic()
+        recent = self._recent.setdefault(user_id, deque())
+        
+        # Drop admissions older than one minute
+        while recent and now - recent[0] >= 60:
+            recent.popleft()
+        
+        if len(recent) >= config.MAX_OPERATIONS_PER_MINUTE:
+            retry_in = int(60 - (now - recent[0])) + 1
+            raise RateLimitError(
+                "⏳ **Slow down!**\n\n"
+                f"You can run up to {config.MAX_OPERATIONS_PER_MINUTE} operations per minute.\n"
+                f"Please try again in {retry_in} seconds.\n\n"
+                "💡 Your files are still saved."
+            )
+        
+        recent.append(now)
+    
+    def _check_capacity(self, operation: str) -> None:
+        """
+        Enforce global and per-operation queue limits.
+        
+        Args:
+            operation: PDFOperations method name
+        
+        Raises:
+            QueueFullError: If the queue is full
+        """
+        queued = sum(self._pending_by_op.values()) + self._running
+        op_queued = self._pending_by_op.get(operation, 0) + self._running_by_op.get(operation, 0)
+        op_limit = config.MAX_QUEUED_PER_OPERATION.get(operation, self.max_queued)
+        
+        if queued >= self.max_queued or op_queued >= op_limit:
+            raise QueueFullError(
+                "🚦 **The bot is very busy right now!**\n\n"
+                "Too many files are waiting to be processed.\n"
+                "Please try again in a minute.\n\n"
+                "💡 Your files are still saved."
+            )
+    
+    def _can_start(self, operation: str) -> bool:
+        """Check whether a job for this operation may take a worker slot now."""
+        op_limit = config.OPERATION_CONCURRENCY.get(operation, self.max_running)
+        return (
+            self._running < self.max_running
+            and self._running_by_op.get(operation, 0) < op_limit
+        )
+    
+    def _dispatch(self) -> None:
+        """Start queued jobs, visiting users round-robin."""
+        while self._pending and self._running < self.max_running:
+            started = False
+            
+            for user_id in list(self._pending):
+                queue = self._pending[user_id]
+                job = queue[0]
+                
+                if not self._can_start(job.operation):
+                    continue
+                
+                # Start job and move user to the back of the rotation
+                queue.popleft()
+                if queue:
+                    self._pending.move_to_end(user_id)
+                else:
+                    del self._pending[user_id]
+                
+                self._pending_by_op[job.operation] -= 1
+                self._running += 1
+                self._running_by_op[job.operation] = self._running_by_op.get(job.operation, 0) + 1
+                job.started.set()
+                started = True
+                break
+            
+            if not started:
+                # Every waiting job is blocked by a per-operation limit
+                return
+    
+    def _remove(self, job: _Job) -> None:
+        """Remove a job that was cancelled before it started."""
+        queue = self._pending.get(job.user_id)
+        if queue and job in queue:
+            queue.remove(job)
+            self._pending_by_op[job.operation] -= 1
+            if not queue:
+                del self._pending[job.user_id]
+    
+    def position(self, job: _Job) -> int:
+        """
+        Estimate how many jobs will start before this one under round-robin.
+        
+        Args:
+            job: Queued job
+        
+        Returns:
+            int: 1-based queue position (0 if already started)
+        """
+        if job.started.is_set():
+            return 0
+        
+        own_queue = self._pending.get(job.user_id)
+        if not own_queue or job not in own_queue:
+            return 0
+        
+        rounds = own_queue.index(job) + 1
+        ahead = sum(
+            min(len(queue), rounds)
+            for user_id, queue in self._pending.items()
+            if user_id != job.user_id
+        )
+        return ahead + rounds
+    
+    @asynccontextmanager
+    async def slot(
+        self,
+        user_id: int,
+        operation: str,
+        on_position: Optional[Callable[[int], Awaitable[None]]] = None
+    ):
+        """
+        Wait for a worker slot. Use as `async with job_scheduler.slot(...)`.
+        
+        Args:
+            user_id: Telegram user ID (fairness and rate limiting key)
+            operation: PDFOperations method name (capacity key)
+            on_position: Optional async callback receiving queue position updates,
+                         called with 0 once the job starts after having waited
+        
+        Raises:
+            RateLimitError: If the user is over the rate limit
+            QueueFullError: If the queue is full
+        """
+        self._check_capacity(operation)
+        self._check_rate_limit(user_id)
+        
+        job = _Job(user_id, operation)
+        self._pending.setdefault(user_id, deque()).append(job)
+        self._pending_by_op[operation] = self._pending_by_op.get(operation, 0) + 1
+        self._dispatch()
+        
+        try:
+            last_position = 0
+            while not job.started.is_set():
+                position = self.position(job)
+                if on_position and position != last_position:
+                    last_position = position
+                    await on_position(position)
+                
+                try:
+                    await asyncio.wait_for(
+                        job.started.wait(),
+                        timeout=config.QUEUE_POSITION_UPDATE_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    pass
+            
+            if on_position and last_position:
+                await on_position(0)
+        
+        except BaseException:
+            if job.started.is_set():
+                self._release(job)
+            else:
+                self._remove(job)
+            raise
+        
+        try:
+            yield
+        finally:
+            self._release(job)
+    
+    def _release(self, job: _Job) -> None:
+        """Free a worker slot and start the next job."""
+        self._running -= 1
+        self._running_by_op[job.operation] -= 1
+        self._dispatch()
+    
+    async def run(
+        self,
+        user_id: int,
+        operation: str,
+        *args,
+        on_position: Optional[Callable[[int], Awaitable[None]]] = None,
+        **kwargs
+    ):
+        """
+        Queue a PDFOperations call and run it on the worker pool.
+        Cache hits are returned right away, without queueing or counting
+        towards the rate limit.
+        
+        Args:
+            user_id: Telegram user ID
+            operation: PDFOperations method name
+            *args: Positional arguments for the method
+            on_position: Optional async callback for queue position updates
+            **kwargs: Keyword arguments for the method
+        
+        Returns:
+            Whatever the PDFOperations method returns
+        """
+        # Misses are counted once, by the executor
+        hit, result = await result_cache.get(operation, args, kwargs, count_miss=False)
+        if hit:
+            return result
+        
+        async with self.slot(user_id, operation, on_position):
+            return await pdf_executor.run(operation, *args, **kwargs)
+    
+    def stats(self) -> dict:
+        """
+        Get current queue statistics for monitoring.
+        
+        Returns:
+            dict: Queued/running counts and number of waiting users
+        """
+        return {
+            'queued': sum(self._pending_by_op.values()),
+            'running': self._running,
+            'waiting_users': len(self._pending),
+            'max_running': self.max_running,
+            'max_queued': self.max_queued
+        }
+
+
+def queue_position_updater(message) -> Callable[[int], Awaitable[None]]:
+    """
+    Build an on_position callback that shows the queue position under a status message.
+    
+    Args:
+        message: Telegram message to edit (e.g. the handler's processing_msg)
+    
+    Returns:
+        Callable: Async callback for JobScheduler.slot/run
+    """
+    base_text = message.text_markdown if message.text else ""
+    
+    async def update(position: int) -> None:
+        if position:
+            text = f"{base_text}\n\n🕒 Position in queue: {position}"
+        else:
+            text = base_text
+        
+        try:
+            await message.edit_text(text, parse_mode='Markdown')
+        except Exception:
+            pass  # Message may have been deleted or not changed
+    
+    return update
+
+
+# Global job scheduler instance
+job_scheduler = JobScheduler()
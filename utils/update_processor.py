@@ -0,0 +1,68 @@
+"""
+Update processor for PDF Telegram Bot.
+Handles updates from different users concurrently, but one at a time per user:
+a user's handlers share user_data and the temp directory, so their commands
+must not interleave (e.g. /cancel cleaning up under a running /merge).
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Dict
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class UserSerialUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates concurrently across users and in arrival order within a user."""
+    
+    def __init__(self, max_concurrent_updates: int):
+        """
+        Initialize the processor.
+        
+        Args:
+            max_concurrent_updates: Maximum updates handled at once across all users
+                                    (updates waiting for their user's turn count too)
+        """
+        super().__init__(max_concurrent_updates)
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._waiting: Dict[int, int] = {}  # Tasks holding or waiting for each user's lock
+    
+    @asynccontextmanager
+    async def user_turn(self, user_id: int) -> AsyncIterator[None]:
+        """
+        Wait until no other update of the user is being handled, and hold the turn.
+        Also used for work started outside update handling (e.g. collected albums).
+        
+        Args:
+            user_id: User's Telegram ID
+        """
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        self._waiting[user_id] = self._waiting.get(user_id, 0) + 1
+        
+        try:
+            async with lock:
+                yield
+        finally:
+            self._waiting[user_id] -= 1
+            if not self._waiting[user_id]:
+                del self._waiting[user_id]
+                del self._locks[user_id]
+    
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """Run the update's handlers once it is the user's turn."""
+        user = update.effective_user if isinstance(update, Update) else None
+        if user is None:
+            await coroutine
+            return
+        
+        async with self.user_turn(user.id):
+            await coroutine
+    
+    async def initialize(self) -> None:
+        """Nothing to set up."""
+    
+    async def shutdown(self) -> None:
+        """Nothing to release."""
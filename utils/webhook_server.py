@@ -0,0 +1,154 @@
+"""
+Webhook server for PDF Telegram Bot.
+Receives updates over HTTP (aiohttp) instead of polling and exposes a health endpoint for load balancers.
+"""
+
+import hmac
+import signal
+import asyncio
+import logging
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+import config
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Feeds updates posted by Telegram into a PTB Application."""
+    
+    def __init__(
+        self,
+        application: Application,
+        listen: str = config.WEBHOOK_LISTEN,
+        port: int = config.WEBHOOK_PORT,
+        path: str = config.WEBHOOK_PATH,
+        secret_token: str = config.WEBHOOK_SECRET_TOKEN
+    ):
+        """
+        Initialize the server.
+        
+        Args:
+            application: Built (not yet initialized) PTB application
+            listen: Address to bind
+            port: Port to bind
+            path: URL path Telegram posts updates to
+            secret_token: Expected X-Telegram-Bot-Api-Secret-Token header (empty = no check)
+        """
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self.path = path if path.startswith('/') else f"/{path}"
+        self.secret_token = secret_token
+        self.received = 0
+        self.rejected = 0
+    
+    def _make_app(self) -> web.Application:
+        """Create the aiohttp application with its routes."""
+        app = web.Application()
+        app.router.add_post(self.path, self._handle_update)
+        app.router.add_get("/health", self._handle_health)
+        return app
+    
+    async def _handle_update(self, request: web.Request) -> web.Response:
+        """Queue an update posted by Telegram and acknowledge it right away."""
+        if self.secret_token:
+            received_token = request.headers.get(SECRET_TOKEN_HEADER, "")
+            if not hmac.compare_digest(received_token, self.secret_token):
+                self.rejected += 1
+                return web.Response(status=403)
+        
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self.application.bot)
+        except Exception as e:
+            logger.warning(f"Ignoring malformed webhook payload: {e}")
+            return web.Response(status=400)
+        
+        # Handlers run from the application's queue, so Telegram isn't kept waiting
+        await self.application.update_queue.put(update)
+        self.received += 1
+        return web.Response()
+    
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        """Report whether this process is accepting updates."""
+        running = self.application.running
+        return web.json_response(
+            {
+                'status': 'ok' if running else 'starting',
+                'mode': 'webhook',
+                'updates_received': self.received,
+                'updates_rejected': self.rejected,
+                'update_queue': self.application.update_queue.qsize()
+            },
+            status=200 if running else 503
+        )
+    
+    async def _register_webhook(self) -> None:
+        """Point Telegram at this deployment's public URL."""
+        url = config.WEBHOOK_URL.rstrip('/') + self.path
+        await self.application.bot.set_webhook(
+            url=url,
+            secret_token=self.secret_token or None,
+            allowed_updates=Update.ALL_TYPES,
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            drop_pending_updates=False  # Updates queued during a restart are still delivered
+        )
+        logger.info(f"Webhook registered: {url}")
+    
+    async def serve(self) -> None:
+        """
+        Run the application and HTTP server until SIGINT/SIGTERM.
+        Calls the application's post_init/post_shutdown hooks like run_polling does.
+        """
+        application = self.application
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except NotImplementedError:
+                pass  # Not supported on Windows
+        
+        await application.initialize()
+        if application.post_init:
+            await application.post_init(application)
+        
+        if config.WEBHOOK_REGISTER:
+            await self._register_webhook()
+        
+        await application.start()
+        
+        runner = web.AppRunner(self._make_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(
+            runner,
+            self.listen,
+            self.port,
+            reuse_port=config.WEBHOOK_REUSE_PORT or None
+        )
+        await site.start()
+        logger.info(f"Webhook server listening on {self.listen}:{self.port}{self.path}")
+        
+        try:
+            await stop_event.wait()
+        finally:
+            logger.info("Stopping webhook server...")
+            await runner.cleanup()
+            await application.stop()
+            await application.shutdown()
+            if application.post_shutdown:
+                await application.post_shutdown(application)
+    
+    def run(self) -> None:
+        """
+        Blocking entry point, the webhook counterpart of Application.run_polling.
+        Runs on the default event loop, like run_polling: on Python 3.9 the application's
+        queue and locks are bound to that loop when it is built, so asyncio.run's new
+        loop can't use them.
+        """
+        asyncio.get_event_loop().run_until_complete(self.serve())